@@ -0,0 +1,52 @@
+"""Add StripeEvent table for idempotent webhook processing
+
+Revision ID: a5d9e1f7c230
+Revises: f3b8c5d2a104
+Create Date: 2026-10-19 16:48:12.551870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d9e1f7c230'
+down_revision: Union[str, Sequence[str], None] = 'f3b8c5d2a104'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stripeevent',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('stripe_created', sa.Integer(), nullable=False),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stripeevent_event_id'), 'stripeevent', ['event_id'], unique=True)
+    op.create_index(op.f('ix_stripeevent_stripe_created'), 'stripeevent', ['stripe_created'], unique=False)
+    op.create_index(op.f('ix_stripeevent_status'), 'stripeevent', ['status'], unique=False)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE public.stripeevent ENABLE ROW LEVEL SECURITY;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_stripeevent_status'), table_name='stripeevent')
+    op.drop_index(op.f('ix_stripeevent_stripe_created'), table_name='stripeevent')
+    op.drop_index(op.f('ix_stripeevent_event_id'), table_name='stripeevent')
+    op.drop_table('stripeevent')
@@ -0,0 +1,39 @@
+"""Add SystemCounterDelta
+
+Revision ID: a9d4e2f1b637
+Revises: f6c2d8e0a348
+Create Date: 2026-10-19 22:40:18.504127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e2f1b637'
+down_revision: Union[str, Sequence[str], None] = 'f6c2d8e0a348'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('systemcounterdelta',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE public.systemcounterdelta ENABLE ROW LEVEL SECURITY;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('systemcounterdelta')
@@ -0,0 +1,69 @@
+"""Add StripeEventKey (per-customer ordering lookup for Stripe events)
+
+Revision ID: b3e7f5a2c914
+Revises: a9d4e2f1b637
+Create Date: 2026-10-19 23:18:52.730461
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7f5a2c914'
+down_revision: Union[str, Sequence[str], None] = 'a9d4e2f1b637'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Frozen copy of ordering_keys in app/core/stripe_events.py at this revision
+def _ordering_keys(payload: dict) -> set:
+    data_object = ((payload or {}).get('data') or {}).get('object') or {}
+    keys = set()
+    if data_object.get('customer'):
+        keys.add(f"customer:{data_object['customer']}")
+    for email in (
+        (data_object.get('customer_details') or {}).get('email'),
+        (data_object.get('billing_details') or {}).get('email'),
+        data_object.get('receipt_email'),
+    ):
+        if email:
+            keys.add(f"email:{email.strip().lower()}")
+    user_id = (data_object.get('metadata') or {}).get('user_id')
+    if user_id:
+        keys.add(f"user:{user_id}")
+    return keys
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    key_table = op.create_table('stripeeventkey',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_pk', sa.Integer(), nullable=False),
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.ForeignKeyConstraint(['event_pk'], ['stripeevent.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stripeeventkey_event_pk'), 'stripeeventkey', ['event_pk'], unique=False)
+    op.create_index('ix_stripeeventkey_key_event_pk', 'stripeeventkey', ['key', 'event_pk'], unique=False)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE public.stripeeventkey ENABLE ROW LEVEL SECURITY;")
+
+    # Backfill the events the worker may still order (processed ones are never looked at again)
+    events = sa.table('stripeevent', sa.column('id', sa.Integer()), sa.column('payload', sa.JSON()), sa.column('status', sa.String()))
+    rows = []
+    for event_pk, payload in op.get_bind().execute(sa.select(events.c.id, events.c.payload).where(events.c.status != "processed")):
+        rows.extend({"event_pk": event_pk, "key": key} for key in sorted(_ordering_keys(payload)))
+    if rows:
+        op.bulk_insert(key_table, rows)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stripeeventkey_key_event_pk', table_name='stripeeventkey')
+    op.drop_index(op.f('ix_stripeeventkey_event_pk'), table_name='stripeeventkey')
+    op.drop_table('stripeeventkey')
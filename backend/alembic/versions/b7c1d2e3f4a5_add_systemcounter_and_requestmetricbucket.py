@@ -0,0 +1,53 @@
+"""Add SystemCounter and RequestMetricBucket
+
+Revision ID: b7c1d2e3f4a5
+Revises: 31e3a1eb5cb5
+Create Date: 2026-10-19 09:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1d2e3f4a5'
+down_revision: Union[str, Sequence[str], None] = '31e3a1eb5cb5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('systemcounter',
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('requestmetricbucket',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('request_count', sa.Integer(), nullable=False),
+    sa.Column('error_count', sa.Integer(), nullable=False),
+    sa.Column('total_latency_ms', sa.Float(), nullable=False),
+    sa.Column('max_latency_ms', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('granularity', 'bucket_start')
+    )
+    op.create_index(op.f('ix_requestmetricbucket_bucket_start'), 'requestmetricbucket', ['bucket_start'], unique=False)
+
+    if op.get_bind().dialect.name == "postgresql":
+        for table in ["systemcounter", "requestmetricbucket"]:
+            op.execute(f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_requestmetricbucket_bucket_start'), table_name='requestmetricbucket')
+    op.drop_table('requestmetricbucket')
+    op.drop_table('systemcounter')
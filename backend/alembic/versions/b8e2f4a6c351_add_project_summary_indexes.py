@@ -0,0 +1,30 @@
+"""Add (user_id, name) index on project and project_id index on scenario
+
+Revision ID: b8e2f4a6c351
+Revises: a5d9e1f7c230
+Create Date: 2026-10-19 17:20:37.904412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2f4a6c351'
+down_revision: Union[str, Sequence[str], None] = 'a5d9e1f7c230'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_project_user_id_name', 'project', ['user_id', 'name'], unique=False)
+    op.create_index(op.f('ix_scenario_project_id'), 'scenario', ['project_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scenario_project_id'), table_name='scenario')
+    op.drop_index('ix_project_user_id_name', table_name='project')
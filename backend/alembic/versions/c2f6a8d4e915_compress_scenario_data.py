@@ -0,0 +1,80 @@
+"""Store Scenario.data as brotli-compressed canonical JSON
+
+Revision ID: c2f6a8d4e915
+Revises: b8e2f4a6c351
+Create Date: 2026-10-19 18:02:55.318204
+
+"""
+import json
+from typing import Sequence, Union
+
+import brotli
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f6a8d4e915'
+down_revision: Union[str, Sequence[str], None] = 'b8e2f4a6c351'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of the format in app/core/codecs.py at the time of this migration
+MAGIC = b"BRJ1"
+BATCH_SIZE = 500
+
+
+def _encode(value) -> bytes:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return MAGIC + brotli.compress(canonical.encode("utf-8"), mode=brotli.MODE_TEXT, quality=6)
+
+
+def _decode(raw):
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    return json.loads(brotli.decompress(raw[len(MAGIC):]))
+
+
+def _copy_column(source: str, target: str, convert) -> None:
+    """Copies scenario.<source> into scenario.<target> in id-ordered batches."""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(f"SELECT id, {source} FROM scenario WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text(f"UPDATE scenario SET {target} = :value WHERE id = :id"),
+            [{"id": row[0], "value": convert(row[1])} for row in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scenario', sa.Column('data_compressed', sa.LargeBinary(), nullable=True))
+
+    def to_compressed(value):
+        if value is None:
+            return None
+        # psycopg2 already parses JSON columns; SQLite returns the text
+        return _encode(json.loads(value) if isinstance(value, (str, bytes)) else value)
+
+    _copy_column('data', 'data_compressed', to_compressed)
+
+    with op.batch_alter_table('scenario') as batch_op:
+        batch_op.drop_column('data')
+        batch_op.alter_column('data_compressed', new_column_name='data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('scenario', sa.Column('data_json', sa.JSON(), nullable=True))
+    _copy_column('data', 'data_json', lambda value: None if value is None else json.dumps(_decode(value)))
+
+    with op.batch_alter_table('scenario') as batch_op:
+        batch_op.drop_column('data')
+        batch_op.alter_column('data_json', new_column_name='data')
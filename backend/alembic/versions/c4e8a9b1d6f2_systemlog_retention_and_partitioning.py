@@ -0,0 +1,106 @@
+"""SystemLog retention: created_at index, rollup table and monthly partitioning
+
+Revision ID: c4e8a9b1d6f2
+Revises: b7c1d2e3f4a5
+Create Date: 2026-10-19 11:40:07.502913
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a9b1d6f2'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d2e3f4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partition_systemlog() -> None:
+    # Postgres only: rebuild systemlog as a table range-partitioned by month on created_at.
+    # Older rows land in the default partition and are drained by the retention job.
+    op.execute("ALTER TABLE systemlog RENAME TO systemlog_legacy;")
+    op.execute("""
+        CREATE TABLE systemlog (
+            id INTEGER NOT NULL DEFAULT nextval('systemlog_id_seq'),
+            endpoint VARCHAR NOT NULL,
+            response_time_ms FLOAT NOT NULL,
+            status_code INTEGER NOT NULL,
+            error_message VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+    """)
+    op.execute("ALTER SEQUENCE systemlog_id_seq OWNED BY systemlog.id;")
+    op.execute("CREATE TABLE systemlog_default PARTITION OF systemlog DEFAULT;")
+
+    month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(3):
+        upper = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        op.execute(
+            f"CREATE TABLE systemlog_p{month:%Y%m} PARTITION OF systemlog "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}');"
+        )
+        month = upper
+
+    op.execute("INSERT INTO systemlog SELECT id, endpoint, response_time_ms, status_code, error_message, created_at FROM systemlog_legacy;")
+    op.execute("DROP TABLE systemlog_legacy;")
+    op.execute("ALTER TABLE public.systemlog ENABLE ROW LEVEL SECURITY;")
+
+
+def _unpartition_systemlog() -> None:
+    op.execute("ALTER TABLE systemlog RENAME TO systemlog_partitioned;")
+    op.execute("""
+        CREATE TABLE systemlog (
+            id INTEGER NOT NULL DEFAULT nextval('systemlog_id_seq') PRIMARY KEY,
+            endpoint VARCHAR NOT NULL,
+            response_time_ms FLOAT NOT NULL,
+            status_code INTEGER NOT NULL,
+            error_message VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        );
+    """)
+    op.execute("ALTER SEQUENCE systemlog_id_seq OWNED BY systemlog.id;")
+    op.execute("INSERT INTO systemlog SELECT id, endpoint, response_time_ms, status_code, error_message, created_at FROM systemlog_partitioned;")
+    op.execute("DROP TABLE systemlog_partitioned CASCADE;")
+    op.execute("ALTER TABLE public.systemlog ENABLE ROW LEVEL SECURITY;")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+
+    if is_postgres:
+        _partition_systemlog()
+    # On a partitioned table this creates the index on every partition
+    op.create_index(op.f('ix_systemlog_created_at'), 'systemlog', ['created_at'], unique=False)
+
+    op.create_table('systemlogrollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('endpoint', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('request_count', sa.Integer(), nullable=False),
+    sa.Column('total_response_time_ms', sa.Float(), nullable=False),
+    sa.Column('max_response_time_ms', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('bucket_start', 'endpoint', 'status_code')
+    )
+    op.create_index(op.f('ix_systemlogrollup_bucket_start'), 'systemlogrollup', ['bucket_start'], unique=False)
+
+    if is_postgres:
+        op.execute("ALTER TABLE public.systemlogrollup ENABLE ROW LEVEL SECURITY;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_systemlogrollup_bucket_start'), table_name='systemlogrollup')
+    op.drop_table('systemlogrollup')
+    op.drop_index(op.f('ix_systemlog_created_at'), table_name='systemlog')
+    if op.get_bind().dialect.name == "postgresql":
+        _unpartition_systemlog()
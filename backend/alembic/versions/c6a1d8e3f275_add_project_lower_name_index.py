@@ -0,0 +1,30 @@
+"""Add project (user_id, lower(name)) index for the name prefix search
+
+Revision ID: c6a1d8e3f275
+Revises: b3e7f5a2c914
+Create Date: 2026-10-19 23:52:07.164839
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6a1d8e3f275'
+down_revision: Union[str, Sequence[str], None] = 'b3e7f5a2c914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # text_pattern_ops lets Postgres use the index for LIKE 'prefix%' whatever the database collation
+    name_expression = "lower(name) text_pattern_ops" if op.get_bind().dialect.name == "postgresql" else "lower(name)"
+    op.create_index('ix_project_user_id_lower_name', 'project', ['user_id', sa.text(name_expression)], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_project_user_id_lower_name', table_name='project')
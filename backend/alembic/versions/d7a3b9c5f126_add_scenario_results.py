@@ -0,0 +1,39 @@
+"""Add cached calculation results to scenario
+
+Revision ID: d7a3b9c5f126
+Revises: c2f6a8d4e915
+Create Date: 2026-10-19 18:44:09.716532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3b9c5f126'
+down_revision: Union[str, Sequence[str], None] = 'c2f6a8d4e915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scenario', sa.Column('results', sa.LargeBinary(), nullable=True))
+    op.add_column('scenario', sa.Column('input_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('scenario', sa.Column('solver_version', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('scenario', sa.Column('results_computed_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_scenario_solver_version'), 'scenario', ['solver_version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scenario_solver_version'), table_name='scenario')
+    with op.batch_alter_table('scenario') as batch_op:
+        batch_op.drop_column('results_computed_at')
+        batch_op.drop_column('solver_version')
+        batch_op.drop_column('input_hash')
+        batch_op.drop_column('results')
@@ -0,0 +1,38 @@
+"""Add MailboxState for incremental IMAP polling
+
+Revision ID: d91f3c5a7e20
+Revises: c4e8a9b1d6f2
+Create Date: 2026-10-19 14:05:52.316470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91f3c5a7e20'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a9b1d6f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('mailboxstate',
+    sa.Column('folder', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('uidvalidity', sa.Integer(), nullable=False),
+    sa.Column('last_uid', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('folder')
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE public.mailboxstate ENABLE ROW LEVEL SECURITY;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('mailboxstate')
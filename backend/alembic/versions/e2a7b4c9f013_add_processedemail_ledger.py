@@ -0,0 +1,40 @@
+"""Add ProcessedEmail ledger for inbound ticket email deduplication
+
+Revision ID: e2a7b4c9f013
+Revises: d91f3c5a7e20
+Create Date: 2026-10-19 15:22:10.874532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7b4c9f013'
+down_revision: Union[str, Sequence[str], None] = 'd91f3c5a7e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('processedemail',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('message_key', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_processedemail_message_key'), 'processedemail', ['message_key'], unique=True)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE public.processedemail ENABLE ROW LEVEL SECURITY;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_processedemail_message_key'), table_name='processedemail')
+    op.drop_table('processedemail')
@@ -0,0 +1,52 @@
+"""Add OutboundEmail queue
+
+Revision ID: f3b8c5d2a104
+Revises: e2a7b4c9f013
+Create Date: 2026-10-19 16:05:41.203118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8c5d2a104'
+down_revision: Union[str, Sequence[str], None] = 'e2a7b4c9f013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outboundemail',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email_to', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('subject', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('text_content', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('reply_to', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('from_address', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('headers', sa.JSON(), nullable=True),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outboundemail_status'), 'outboundemail', ['status'], unique=False)
+    op.create_index(op.f('ix_outboundemail_next_attempt_at'), 'outboundemail', ['next_attempt_at'], unique=False)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE public.outboundemail ENABLE ROW LEVEL SECURITY;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_outboundemail_next_attempt_at'), table_name='outboundemail')
+    op.drop_index(op.f('ix_outboundemail_status'), table_name='outboundemail')
+    op.drop_table('outboundemail')
@@ -0,0 +1,67 @@
+"""Add pump catalog search indexes (keyset btrees, pg_trgm / FTS5 trigram)
+
+Revision ID: f6c2d8e0a348
+Revises: e5b1c7d9a237
+Create Date: 2026-10-19 21:05:12.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c2d8e0a348'
+down_revision: Union[str, Sequence[str], None] = 'e5b1c7d9a237'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of the DDL in app/core/pump_search.py at this revision
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_pump_search_trgm ON pump USING gin ((manufacturer || ' ' || model) gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS pump_fts USING fts5(manufacturer, model, content='pump', content_rowid='id', tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS pump_fts_ai AFTER INSERT ON pump BEGIN
+        INSERT INTO pump_fts(rowid, manufacturer, model) VALUES (new.id, new.manufacturer, new.model);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS pump_fts_ad AFTER DELETE ON pump BEGIN
+        INSERT INTO pump_fts(pump_fts, rowid, manufacturer, model) VALUES ('delete', old.id, old.manufacturer, old.model);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS pump_fts_au AFTER UPDATE OF manufacturer, model ON pump BEGIN
+        INSERT INTO pump_fts(pump_fts, rowid, manufacturer, model) VALUES ('delete', old.id, old.manufacturer, old.model);
+        INSERT INTO pump_fts(rowid, manufacturer, model) VALUES (new.id, new.manufacturer, new.model);
+    END""",
+    "INSERT INTO pump_fts(pump_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_pump_user_id_manufacturer_model', 'pump', ['user_id', 'manufacturer', 'model', 'id'], unique=False)
+    op.create_index('ix_pump_is_global_manufacturer_model', 'pump', ['is_global', 'manufacturer', 'model', 'id'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_pump_search_trgm")
+    elif dialect == 'sqlite':
+        for trigger in ('pump_fts_ai', 'pump_fts_ad', 'pump_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS pump_fts")
+
+    op.drop_index('ix_pump_is_global_manufacturer_model', table_name='pump')
+    op.drop_index('ix_pump_user_id_manufacturer_model', table_name='pump')
@@ -1,51 +1,58 @@
 from typing import Generator
+from datetime import datetime
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlmodel import Session
-from app.core import db, security
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core import db, security, auth_cache
 from app.models import User, TokenPayload
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def get_session():
-    with Session(db.engine) as session:
-        yield session
+# Single session dependencies shared with app.core.db
+get_session = db.get_session
+get_async_session = db.get_async_session
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_async_session)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    email = auth_cache.get_token_subject(token)
+    if email is None:
+        try:
+            payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    user = session.query(User).filter(User.email == email).first()
+        auth_cache.cache_token_subject(token, email, payload.get("exp"))
+
+    # Cache hit avoids the DB round-trip; the session stays unused (no connection checkout)
+    user = auth_cache.get_cached_user(email)
     if user is None:
-        raise credentials_exception
+        user = (await session.exec(select(User).where(User.email == email))).first()
+        if user is None:
+            raise credentials_exception
+        auth_cache.cache_user(email, user)
+        # Detach like a cache hit, so in-memory changes (e.g. expiry) never flush with the endpoint's commit
+        session.expunge(user)
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)) -> User:
+async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-        
-    from datetime import datetime
+
+    # Read-only: the subscription sweeper (app/core/subscriptions.py) persists the expiry in bulk
     if current_user.subscription_end_date and current_user.subscription_end_date < datetime.utcnow():
-        if current_user.subscription_status != "expired":
-            current_user.subscription_status = "expired"
-            session.add(current_user)
-            session.commit()
-            session.refresh(current_user)
-            
+        current_user.subscription_status = "expired"
+
     return current_user
 
-def get_current_active_admin(current_user: User = Depends(get_current_active_user)) -> User:
+async def get_current_active_admin(current_user: User = Depends(get_current_active_user)) -> User:
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
@@ -1,17 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, func
-from typing import List, Any
+from typing import List, Any, Optional, Tuple, Literal
 from datetime import datetime, timedelta
 
 from app.api.deps import get_current_active_admin, get_session
-from app.models import User, Project, Scenario, SupportTicket, SupportTicketReadWithMessages, Pump, CustomFluid, SystemLog, Invite
+from app.models import User, Project, Scenario, SupportTicket, SupportTicketReadWithMessages, Pump, CustomFluid, SystemLog, Invite, RecalculationJob
 import secrets
+import json
 from sqlalchemy import text
 import os
 from app.core.config import settings
+from app.core.db import engine, get_pool_stats
+from app.core import metrics, recalculation
 
 router = APIRouter()
 
+# Rows fetched per round-trip when streaming the resources catalog
+NDJSON_CHUNK_SIZE = 500
+
 @router.get("/tickets", response_model=List[SupportTicketReadWithMessages])
 def get_all_tickets(
     session: Session = Depends(get_session),
@@ -88,40 +96,133 @@ def toggle_user_status(
     session.refresh(user)
     return {"message": "Status toggled", "is_active": user.is_active}
 
+def _contains(column, term: str):
+    """Case-insensitive substring match; % and _ in the term are literal (emails often contain _)."""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+def _pump_resources_statement(
+    owner: Optional[str],
+    manufacturer: Optional[str],
+    is_global: Optional[bool],
+    after_id: Optional[int],
+):
+    """
+    Builds the keyset-paginated pump listing with the owner email resolved in the same query.
+    """
+    statement = (
+        select(Pump.id, Pump.manufacturer, Pump.model, Pump.is_global, Pump.created_at, User.email)
+        .outerjoin(User, User.id == Pump.user_id)
+        .order_by(Pump.id)
+    )
+    if owner:
+        statement = statement.where(_contains(User.email, owner))
+    if manufacturer:
+        statement = statement.where(_contains(Pump.manufacturer, manufacturer))
+    if is_global is not None:
+        statement = statement.where(Pump.is_global == is_global)
+    if after_id is not None:
+        statement = statement.where(Pump.id > after_id)
+    return statement
+
+def _fluid_resources_statement(owner: Optional[str], after_id: Optional[int]):
+    """
+    Builds the keyset-paginated custom fluid listing with the owner email resolved in the same query.
+    """
+    statement = (
+        select(CustomFluid.id, CustomFluid.name, CustomFluid.created_at, User.email)
+        .outerjoin(User, User.id == CustomFluid.user_id)
+        .order_by(CustomFluid.id)
+    )
+    if owner:
+        statement = statement.where(_contains(User.email, owner))
+    if after_id is not None:
+        statement = statement.where(CustomFluid.id > after_id)
+    return statement
+
+def _pump_row(row) -> dict:
+    return {
+        "id": row[0],
+        "manufacturer": row[1],
+        "model": row[2],
+        "is_global": row[3],
+        "owner_email": row[5] or "Unknown",
+        "created_at": row[4]
+    }
+
+def _fluid_row(row) -> dict:
+    return {
+        "id": row[0],
+        "name": row[1],
+        "owner_email": row[3] or "Unknown",
+        "created_at": row[2]
+    }
+
+def _fetch_page(session: Session, statement, limit: int, to_dict) -> Tuple[List[dict], Optional[int]]:
+    """
+    Fetches limit + 1 rows to know whether another page exists without a COUNT query.
+    Returns (items, next_cursor).
+    """
+    rows = session.exec(statement.limit(limit + 1)).all()
+    items = [to_dict(r) for r in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return items, next_cursor
+
 @router.get("/resources")
 def get_global_resources(
     session: Session = Depends(get_session),
-    current_admin: User = Depends(get_current_active_admin)
+    current_admin: User = Depends(get_current_active_admin),
+    kind: Optional[Literal["pumps", "fluids"]] = None,
+    owner: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    is_global: Optional[bool] = None,
+    pump_cursor: Optional[int] = None,
+    fluid_cursor: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    format: Literal["json", "ndjson"] = "json",
 ) -> Any:
     """
-    Get all global pumps and fluids from all users.
+    Get pumps and fluids from all users, with their owner emails.
+    Keyset pagination: pass back `next_pump_cursor` / `next_fluid_cursor` as `pump_cursor` / `fluid_cursor`.
+    `manufacturer` and `is_global` only apply to pumps.
+    With `format=ndjson` the whole (filtered) catalog is streamed one JSON object per line.
     """
-    pumps = session.exec(select(Pump)).all()
-    fluids = session.exec(select(CustomFluid)).all()
-    
-    # We want to associate the email
-    pump_results = []
-    for p in pumps:
-        owner = session.get(User, p.user_id)
-        pump_results.append({
-            "id": p.id,
-            "manufacturer": p.manufacturer,
-            "model": p.model,
-            "owner_email": owner.email if owner else "Unknown",
-            "created_at": p.created_at
-        })
-        
-    fluid_results = []
-    for f in fluids:
-        owner = session.get(User, f.user_id)
-        fluid_results.append({
-            "id": f.id,
-            "name": f.name,
-            "owner_email": owner.email if owner else "Unknown",
-            "created_at": f.created_at
-        })
-        
-    return {"pumps": pump_results, "fluids": fluid_results}
+    include_pumps = kind in (None, "pumps")
+    include_fluids = kind in (None, "fluids") and manufacturer is None and is_global is None
+
+    if format == "ndjson":
+        def stream_resources():
+            # The request session may be closed before the body is fully sent, so use a dedicated one
+            with Session(engine) as stream_session:
+                if include_pumps:
+                    statement = _pump_resources_statement(owner, manufacturer, is_global, pump_cursor)
+                    for row in stream_session.exec(statement.execution_options(yield_per=NDJSON_CHUNK_SIZE)):
+                        yield json.dumps({"type": "pump", **jsonable_encoder(_pump_row(row))}) + "\n"
+                if include_fluids:
+                    statement = _fluid_resources_statement(owner, fluid_cursor)
+                    for row in stream_session.exec(statement.execution_options(yield_per=NDJSON_CHUNK_SIZE)):
+                        yield json.dumps({"type": "fluid", **jsonable_encoder(_fluid_row(row))}) + "\n"
+
+        return StreamingResponse(stream_resources(), media_type="application/x-ndjson")
+
+    pump_results, next_pump_cursor = [], None
+    if include_pumps:
+        pump_results, next_pump_cursor = _fetch_page(
+            session, _pump_resources_statement(owner, manufacturer, is_global, pump_cursor), limit, _pump_row
+        )
+
+    fluid_results, next_fluid_cursor = [], None
+    if include_fluids:
+        fluid_results, next_fluid_cursor = _fetch_page(
+            session, _fluid_resources_statement(owner, fluid_cursor), limit, _fluid_row
+        )
+
+    return {
+        "pumps": pump_results,
+        "fluids": fluid_results,
+        "next_pump_cursor": next_pump_cursor,
+        "next_fluid_cursor": next_fluid_cursor
+    }
 
 @router.post("/invites")
 def generate_invite(
@@ -149,52 +250,104 @@ def generate_invite(
     
     return {"message": "Invite generated", "new_invite": code, "all_invites": all_invites}
 
+@router.post("/recalculations")
+def start_recalculation(
+    session: Session = Depends(get_session),
+    current_admin: User = Depends(get_current_active_admin)
+) -> Any:
+    """
+    Queue a bulk recalculation of every scenario whose stored results come from another solver version.
+    """
+    job = recalculation.create_job(session, created_by_id=current_admin.id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="A recalculation job is already queued or running")
+    return recalculation.job_status(job)
+
+@router.get("/recalculations")
+def list_recalculations(
+    session: Session = Depends(get_session),
+    current_admin: User = Depends(get_current_active_admin),
+    limit: int = Query(20, ge=1, le=100),
+) -> Any:
+    """
+    Latest recalculation jobs with progress and throughput.
+    """
+    jobs = session.exec(select(RecalculationJob).order_by(RecalculationJob.id.desc()).limit(limit)).all()
+    return [recalculation.job_status(job) for job in jobs]
+
+@router.get("/recalculations/{job_id}")
+def get_recalculation(
+    job_id: int,
+    session: Session = Depends(get_session),
+    current_admin: User = Depends(get_current_active_admin)
+) -> Any:
+    job = session.get(RecalculationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return recalculation.job_status(job)
+
+@router.post("/recalculations/{job_id}/cancel")
+def cancel_recalculation(
+    job_id: int,
+    session: Session = Depends(get_session),
+    current_admin: User = Depends(get_current_active_admin)
+) -> Any:
+    """
+    Stop a job after its current chunk. Scenarios already refreshed keep their new results.
+    """
+    job = session.get(RecalculationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in recalculation.ACTIVE_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Job is already {job.status}")
+    job.status = "cancelled"
+    job.finished_at = datetime.utcnow()
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return recalculation.job_status(job)
+
 @router.get("/kpis")
 def get_system_kpis(
     session: Session = Depends(get_session),
-    current_admin: User = Depends(get_current_active_admin)
+    current_admin: User = Depends(get_current_active_admin),
+    trend: Literal["hour", "day"] = "hour",
+    trend_window: int = Query(24, ge=1, le=24 * 90),
 ) -> Any:
     """
-    Generate System KPIs like DB usage proxies, active users, avg response times, errors, etc.
+    System KPIs read from precomputed rows: incrementally maintained counters and
+    hourly/daily request buckets (see app/core/metrics.py).
+    `trend` / `trend_window` select the bucket size and how many buckets back to return.
     """
-    total_users = session.exec(select(func.count(User.id))).one()
-    active_users = session.exec(select(func.count(User.id)).where(User.is_active == True)).one()
-    
-    total_projects = session.exec(select(func.count(Project.id))).one()
-    total_scenarios = session.exec(select(func.count(Scenario.id))).one()
-    
-    # Analyze recent logs (e.g. last 1000 logs or everything for now if db is small)
-    logs = session.exec(select(SystemLog).order_by(SystemLog.created_at.desc()).limit(1000)).all()
-    
-    avg_response_time = 0.0
-    error_count = 0
-    if logs:
-        avg_response_time = sum(log.response_time_ms for log in logs) / len(logs)
-        error_count = sum(1 for log in logs if log.status_code >= 400)
-        
-    error_rate = (error_count / len(logs)) * 100 if logs else 0.0
-    
-    db_size_mb = 0.0
-    try:
-        from sqlalchemy import text
-        import os
-        from app.core.config import settings
-        if "postgres" in settings.DATABASE_URL:
-            db_size_bytes = session.exec(text("SELECT pg_database_size(current_database())")).one()[0]
-            db_size_mb = db_size_bytes / (1024 * 1024)
-        else:
-            path_file = settings.DATABASE_URL.replace("sqlite:///", "")
-            if os.path.exists(path_file):
-                db_size_mb = os.path.getsize(path_file) / (1024 * 1024)
-    except Exception:
-        pass
+    counters = metrics.read_counters(session)
+
+    now = datetime.utcnow()
+    last_24h = metrics.read_request_buckets(session, "hour", now - timedelta(hours=24))
+    performance = metrics.summarize_buckets(last_24h)
+
+    step = timedelta(hours=1) if trend == "hour" else timedelta(days=1)
+    trends = metrics.read_request_buckets(session, trend, now - step * trend_window)
+
+    recent_errors = session.exec(
+        select(SystemLog).where(SystemLog.status_code >= 400).order_by(SystemLog.created_at.desc()).limit(10)
+    ).all()
 
     return {
-        "users": {"total": total_users, "active": active_users},
-        "database": {"total_projects": total_projects, "total_scenarios": total_scenarios, "size_mb": round(db_size_mb, 2)},
-        "performance": {"avg_response_time_ms": round(avg_response_time, 2), "error_rate_percent": round(error_rate, 2)},
+        "users": {"total": counters.get(metrics.USERS_TOTAL, 0), "active": counters.get(metrics.USERS_ACTIVE, 0)},
+        "database": {
+            "total_projects": counters.get(metrics.PROJECTS_TOTAL, 0),
+            "total_scenarios": counters.get(metrics.SCENARIOS_TOTAL, 0),
+            "size_mb": round(counters.get(metrics.DB_SIZE_BYTES, 0) / (1024 * 1024), 2)
+        },
+        "performance": {
+            "avg_response_time_ms": performance["avg_response_time_ms"],
+            "error_rate_percent": performance["error_rate_percent"],
+            "requests_24h": performance["requests"]
+        },
+        "connection_pool": get_pool_stats(),
+        "trends": {"granularity": trend, "buckets": trends},
         "recent_errors": [
             {"endpoint": log.endpoint, "status": log.status_code, "error": log.error_message, "time": log.created_at}
-            for log in logs if log.status_code >= 400
-        ][:10] # Top 10 recent errors
+            for log in recent_errors
+        ]
     }
@@ -2,7 +2,9 @@ from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security, db
 from app.api import deps
@@ -22,15 +24,16 @@ class UserResponse(UserBase):
     id: int
 
 @router.post("/login", response_model=Token)
-def login_access_token(
+async def login_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    session: Session = Depends(deps.get_session)
+    session: AsyncSession = Depends(deps.get_async_session)
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests.
     """
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = (await session.exec(select(User).where(User.email == form_data.username))).first()
+    # Password hashing is CPU-bound: keep it off the event loop
+    if not user or not await run_in_threadpool(security.verify_password, form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -49,9 +52,9 @@ def login_access_token(
     }
 
 @router.post("/register", response_model=UserResponse)
-def register_user(
+async def register_user(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     user_in: UserCreate,
 ) -> Any:
     """
@@ -63,31 +66,31 @@ def register_user(
             detail="Registration requires an invite code. Please purchase a plan first."
         )
 
-    invite = session.get(Invite, user_in.invite_code)
+    invite = await session.get(Invite, user_in.invite_code)
     if not invite:
         raise HTTPException(status_code=400, detail="Invalid invite code")
     if invite.used_by_id:
         raise HTTPException(status_code=400, detail="Invite code already used")
         
     # Check if this invite belongs to a pre-created Stripe customer
-    pre_user = session.get(User, invite.created_by_id)
+    pre_user = await session.get(User, invite.created_by_id)
     if pre_user and pre_user.hashed_password == "TEMP_WAITING_REGISTRATION":
         if pre_user.email.lower() != user_in.email.lower():
             raise HTTPException(status_code=400, detail=f"Please use the email address associated with your purchase: {pre_user.email}")
             
         # Activate pre-created user
-        pre_user.hashed_password = security.get_password_hash(user_in.password)
+        pre_user.hashed_password = await run_in_threadpool(security.get_password_hash, user_in.password)
         pre_user.is_active = True
         session.add(pre_user)
         
         invite.used_by_id = pre_user.id
         session.add(invite)
-        session.commit()
-        session.refresh(pre_user)
+        await session.commit()
+        await session.refresh(pre_user)
         return pre_user
     
     # 2. Check Exists (Regular Registration via Admin Invite fallback)
-    user = session.exec(select(User).where(User.email == user_in.email)).first()
+    user = (await session.exec(select(User).where(User.email == user_in.email))).first()
     if user:
         raise HTTPException(
             status_code=400,
@@ -97,25 +100,25 @@ def register_user(
     # 3. Create User (Authorized by Invite)
     user = User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=await run_in_threadpool(security.get_password_hash, user_in.password),
         role="user",
         is_active=True,
         subscription_status="active",
         subscription_tier="basic"
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
 
     # 4. Mark Invite Used
     invite.used_by_id = user.id
     session.add(invite)
-    session.commit()
+    await session.commit()
 
     return user
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(deps.get_current_active_user)) -> Any:
+async def read_users_me(current_user: User = Depends(deps.get_current_active_user)) -> Any:
     """
     Get current user.
     """
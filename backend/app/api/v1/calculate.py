@@ -1,13 +1,28 @@
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Iterator, Literal
 import numpy as np
 
 from app.schemas.calculations import (
     PipeSection, FluidProperties, HeadLossResult, 
-    OperatingPointRequest, OperatingPointResponse, SystemHeadCurveRequest
+    OperatingPointRequest, OperatingPointResponse, SystemHeadCurveRequest, SystemCurveResponse,
+    DiameterOptimizationRequest, DiameterOptimizationResponse,
+    OperatingPointUncertaintyRequest, OperatingPointUncertaintyResponse
 )
-from app.services.fluid_mechanics import calculate_pipe_section_loss, calculate_series_loss
+from app.core.config import settings
+from app.core.constants import DIAMETROS_PADRAO
+from app.services.diameter_optimization import (
+    present_worth_factor, pipe_cost_per_m, section_loss_by_diameter, efficient_candidates, search_diameters
+)
+from app.services.fluid_mechanics import calculate_pipe_section_loss, calculate_series_loss, calculate_series_loss_array
 from app.services.optimization import calculate_parallel_loss, find_operating_point, find_natural_flow
+from app.services.sampling import adaptive_sample
+from app.services.uncertainty import sample_factors, sample_sections, solve_operating_points, percentile_band
 
 router = APIRouter()
 
@@ -26,63 +41,137 @@ def get_pipe_loss(section: PipeSection, flow_rate_m3h: float, fluid: FluidProper
     """
     return calculate_pipe_section_loss(section, flow_rate_m3h, fluid)
 
-@router.post("/system-curve")
-def get_system_curve(request: SystemHeadCurveRequest):
+def effective_pump_curve(points: List[Dict[str, float]], speed_ratio: float = 1.0, parallel_pumps: int = 1) -> List[Dict[str, float]]:
+    """Applies the Affinity Laws (VFD speed ratio) and parallel association to pump curve points."""
+    effective_pump_curve_points = []
+    for p in points:
+        new_p = dict(p)
+        # Affinity Laws
+        new_p['flow'] = p.get('flow', 0.0) * speed_ratio
+        new_p['head'] = p.get('head', 0.0) * (speed_ratio ** 2)
+        if new_p.get('npshr') is not None:
+            new_p['npshr'] = float(p.get('npshr')) * (speed_ratio ** 2)
+        
+        # Parallel Association
+        new_p['flow'] = new_p['flow'] * parallel_pumps
+        effective_pump_curve_points.append(new_p)
+    return effective_pump_curve_points
+
+def evaluate_system_curve(request: SystemHeadCurveRequest, flows) -> Dict[str, np.ndarray]:
     """
-    Generate System Head vs Flow curve points.
-    Considers geometric static head AND pressure differences.
+    Evaluates the system at every flow in one pass: head, NPSHa and, when pump data is supplied,
+    NPSHr and the cavitation margin (NPSHa - NPSHr).
+    Series losses are vectorized and the suction loss is computed once for both head and NPSHa.
+    Parallel branches still need a root solve per flow. Unsolvable flows get a NaN head.
     """
-    # Calculate Pressure Head Difference
-    head_pressure_suction = pressure_to_head(request.pressure_suction_bar_g, request.fluid)
-    head_pressure_discharge = pressure_to_head(request.pressure_discharge_bar_g, request.fluid)
-    
+    flows = np.asarray(flows, dtype=float)
+
     # Total Static Head = Delta Z + Delta P_head
     # If static_head_m is Geometric Elevation (Z2 - Z1)
+    head_pressure_suction = pressure_to_head(request.pressure_suction_bar_g, request.fluid)
+    head_pressure_discharge = pressure_to_head(request.pressure_discharge_bar_g, request.fluid)
     total_static_head_m = request.static_head_m + (head_pressure_discharge - head_pressure_suction)
 
-    flows = np.linspace(request.flow_min_m3h, request.flow_max_m3h, request.steps)
-    points = []
-    
-    for flow in flows:
-        if flow < 0: continue
-        
-        loss_suction = calculate_series_loss(request.suction_sections, flow, request.fluid)
-        loss_before = calculate_series_loss(request.discharge_sections_before, flow, request.fluid)
-        loss_parallel, _ = calculate_parallel_loss(request.discharge_parallel_sections, flow, request.fluid)
-        
-        if loss_parallel == -1.0:
-            continue # Skip invalid points
-            
-        loss_after = calculate_series_loss(request.discharge_sections_after, flow, request.fluid)
-        
-        total_dynamic_head = loss_suction + loss_before + loss_parallel + loss_after
-        total_head = total_static_head_m + total_dynamic_head
-        
-        
-        # Calculate NPSHa for this flow
-        # TODO: Refactor calculate_npsha to accept just loss_suction to avoid recalculating
-        # For now, let's just reuse logic: NPSHa = H_abs_suction - H_vapor - H_loss_suction
-        # Pre-calculated head_pressure_suction contains P_gauge effect converted to head.
-        # But calculate_npsha uses P_gauge directly. Let's use calculate_npsha function for consistency.
-        
-        npsha = calculate_npsha(
-            flow, 
-            request.suction_sections, 
-            request.fluid, 
-            request.atmospheric_pressure_bar, 
-            request.pressure_suction_bar_g
+    loss_suction = calculate_series_loss_array(request.suction_sections, flows, request.fluid)
+    loss_before = calculate_series_loss_array(request.discharge_sections_before, flows, request.fluid)
+    loss_after = calculate_series_loss_array(request.discharge_sections_after, flows, request.fluid)
+
+    loss_parallel = np.zeros_like(flows)
+    if len(request.discharge_parallel_sections) >= 2:
+        for i, flow in enumerate(flows):
+            loss, _ = calculate_parallel_loss(request.discharge_parallel_sections, float(flow), request.fluid)
+            loss_parallel[i] = np.nan if loss == -1.0 else loss # Invalid points are skipped
+
+    head = total_static_head_m + loss_suction + loss_before + loss_parallel + loss_after
+    head[flows < 0] = np.nan
+
+    curves = {
+        "flow": flows,
+        "head": head,
+        "npsh_available": calculate_npsha(
+            flows,
+            request.suction_sections,
+            request.fluid,
+            request.atmospheric_pressure_bar,
+            request.pressure_suction_bar_g,
+            h_loss_suction=loss_suction
         )
+    }
 
-        points.append({
-            "flow": float(flow), 
-            "head": float(total_head),
-            "npsh_available": float(npsha)
-        })
-        
-    return {"points": points}
+    if request.pump_curve_points:
+        pump_points = effective_pump_curve(request.pump_curve_points, request.speed_ratio, request.parallel_pumps)
+        npshr = interpolate_npshr(flows, pump_points)
+        if npshr is not None:
+            curves["npsh_required"] = npshr
+            curves["cavitation_margin_m"] = curves["npsh_available"] - npshr
+    return curves
+
+def _curve_points(curves: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    """Splits evaluate_system_curve arrays into per-flow point dicts, skipping unsolvable flows."""
+    keys = list(curves.keys())
+    columns = [curves[k].tolist() for k in keys]
+    head = keys.index("head")
+    return [dict(zip(keys, row)) for row in zip(*columns) if not np.isnan(row[head])]
+
+# Uniform curves are evaluated (and streamed) this many flows at a time
+CURVE_CHUNK_POINTS = 25
+
+def iter_system_curve_points(request: SystemHeadCurveRequest) -> Iterator[Dict[str, float]]:
+    """
+    Yields System Head vs Flow curve points ordered by flow. Uniform sampling evaluates and yields
+    them in chunks of CURVE_CHUNK_POINTS; adaptive sampling yields them once refinement is done.
+    Considers geometric static head AND pressure differences.
+    """
+    if request.sampling == "adaptive":
+        # Points come out once sampling is done, ordered by flow
+        solved = {}
+        def head_at(flow: float) -> Optional[float]:
+            points = _curve_points(evaluate_system_curve(request, [flow]))
+            solved[flow] = points[0] if points else None
+            return solved[flow]["head"] if solved[flow] else None
+        flows, _, _ = adaptive_sample(head_at, request.flow_min_m3h, request.flow_max_m3h, request.tolerance_m, request.steps)
+        for flow in flows:
+            yield solved[flow]
+        return
+
+    flows = np.linspace(request.flow_min_m3h, request.flow_max_m3h, request.steps)
+    for i in range(0, len(flows), CURVE_CHUNK_POINTS):
+        yield from _curve_points(evaluate_system_curve(request, flows[i:i + CURVE_CHUNK_POINTS]))
+
+# Typed response: serialized by pydantic-core instead of jsonable_encoder (much faster for long curves)
+@router.post("/system-curve", response_model=SystemCurveResponse, response_model_exclude_none=True)
+def get_system_curve(request: SystemHeadCurveRequest):
+    """
+    Generate System Head vs Flow curve points.
+    Considers geometric static head AND pressure differences.
+    """
+    return {"points": list(iter_system_curve_points(request))}
+
+@router.post("/system-curve/stream")
+def stream_system_curve(request: SystemHeadCurveRequest, format: Literal["ndjson", "sse"] = "ndjson"):
+    """
+    Same points as /system-curve, streamed as they are solved so charts can draw progressively.
+    ndjson: one JSON point per line. sse: one `data:` event per point, then an `end` event with the count.
+    Memory stays constant regardless of `steps`.
+    """
+    def stream_ndjson():
+        for point in iter_system_curve_points(request):
+            yield json.dumps(point) + "\n"
+
+    def stream_sse():
+        count = 0
+        for point in iter_system_curve_points(request):
+            count += 1
+            yield f"data: {json.dumps(point)}\n\n"
+        yield f"event: end\ndata: {json.dumps({'points': count})}\n\n"
+
+    # Sync generators are iterated in the threadpool, so solving never blocks the event loop
+    if format == "sse":
+        return StreamingResponse(stream_sse(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse(stream_ndjson(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
 
-def interpolate_npshr(flow: float, points: List[Any]) -> Optional[float]:
-    """Interpolates NPSH Required from pump curve points."""
+def interpolate_npshr(flow, points: List[Any]):
+    """Interpolates NPSH Required from pump curve points. flow may be a float or a NumPy array of flows."""
     # Handle dict or object
     def get_val(p, key):
         return p.get(key) if isinstance(p, dict) else getattr(p, key, None)
@@ -95,10 +184,11 @@ def interpolate_npshr(flow: float, points: List[Any]) -> Optional[float]:
     flows = [get_val(p, 'flow') for p in npshr_points]
     npshrs = [get_val(p, 'npshr') for p in npshr_points]
     # Simple linear interpolation for now
-    return float(np.interp(flow, flows, npshrs))
+    npshr = np.interp(flow, flows, npshrs)
+    return float(npshr) if np.ndim(npshr) == 0 else npshr
 
-def interpolate_efficiency(flow: float, points: List[Any]) -> Optional[float]:
-    """Interpolates efficiency from pump curve points."""
+def interpolate_efficiency(flow, points: List[Any]):
+    """Interpolates efficiency from pump curve points. flow may be a float or a NumPy array of flows."""
     def get_val(p, key):
         return p.get(key) if isinstance(p, dict) else getattr(p, key, None)
 
@@ -109,7 +199,8 @@ def interpolate_efficiency(flow: float, points: List[Any]) -> Optional[float]:
     eff_points.sort(key=lambda p: get_val(p, 'flow'))
     flows = [get_val(p, 'flow') for p in eff_points]
     effs = [get_val(p, 'efficiency') for p in eff_points]
-    return float(np.interp(flow, flows, effs))
+    efficiency = np.interp(flow, flows, effs)
+    return float(efficiency) if np.ndim(efficiency) == 0 else efficiency
 
 def calculate_npsha(
     flow_op: float, 
@@ -126,7 +217,9 @@ def calculate_npsha(
     # we will proceed with: NPSHa = (Patm + P_gauge - P_vapor)/gamma - H_loss_suction
     # This assumes the source level is at the pump centerline OR P_gauge accounts for Z.
     # TODO: Add Z_suction specifically in Phase 3b.
-) -> float:
+    h_loss_suction=None, # Pass the suction loss when the caller already has it
+):
+    """NPSH Available at flow_op. flow_op (and h_loss_suction) may be NumPy arrays for a whole curve."""
     # 1. Absolute Pressure at Suction Source
     p_abs_suction_bar = patm_bar + p_gauge_suction_bar
     
@@ -138,7 +231,8 @@ def calculate_npsha(
     head_vapor = pressure_to_head(pv_bar, fluid)
     
     # 4. Suction Friction Loss
-    h_loss_suction = calculate_series_loss(suction_sections, flow_op, fluid)
+    if h_loss_suction is None:
+        h_loss_suction = calculate_series_loss(suction_sections, flow_op, fluid)
     
     # NPSHa = H_abs_source - H_vapor - H_loss
     # (Ignoring Z_suction for now as noted)
@@ -154,18 +248,7 @@ def get_operating_point(request: OperatingPointRequest):
         raise HTTPException(status_code=400, detail="At least 3 pump curve points are required.")
     
     # Phase 1: Apply Affinity Laws (VFD) and Parallel Pumps
-    effective_pump_curve_points = []
-    for p in request.pump_curve_points:
-        new_p = dict(p)
-        # Affinity Laws
-        new_p['flow'] = p.get('flow', 0.0) * request.speed_ratio
-        new_p['head'] = p.get('head', 0.0) * (request.speed_ratio ** 2)
-        if new_p.get('npshr') is not None:
-            new_p['npshr'] = float(p.get('npshr')) * (request.speed_ratio ** 2)
-        
-        # Parallel Association
-        new_p['flow'] = new_p['flow'] * request.parallel_pumps
-        effective_pump_curve_points.append(new_p)
+    effective_pump_curve_points = effective_pump_curve(request.pump_curve_points, request.speed_ratio, request.parallel_pumps)
 
     flows = [p['flow'] for p in effective_pump_curve_points]
     heads = [p['head'] for p in effective_pump_curve_points]
@@ -263,7 +346,8 @@ def get_operating_point(request: OperatingPointRequest):
         request.suction_sections, 
         request.fluid, 
         request.atmospheric_pressure_bar, 
-        request.pressure_suction_bar_g
+        request.pressure_suction_bar_g,
+        h_loss_suction=loss_suction
     )
 
     # NPSHr Interpolation
@@ -297,3 +381,264 @@ def get_operating_point(request: OperatingPointRequest):
         },
         is_extrapolated=is_extrapolated
     )
+
+@router.post("/operating-point/uncertainty", response_model=OperatingPointUncertaintyResponse, response_model_exclude_none=True)
+def get_operating_point_uncertainty(request: OperatingPointUncertaintyRequest):
+    """
+    Monte Carlo operating point: solves `samples` perturbed copies of the system (aged roughness,
+    lengths, viscosity, pump curve tolerance) in one batched computation and returns percentile bands
+    for flow, head, power and NPSH margin, next to the nominal (unperturbed) result.
+    """
+    start = time.perf_counter()
+    if len(request.pump_curve_points) < 3:
+        raise HTTPException(status_code=400, detail="At least 3 pump curve points are required.")
+    if request.samples > settings.UNCERTAINTY_MAX_SAMPLES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.UNCERTAINTY_MAX_SAMPLES} samples are allowed.")
+    if request.roughness_factor_min > request.roughness_factor_max:
+        raise HTTPException(status_code=400, detail="roughness_factor_min cannot exceed roughness_factor_max.")
+
+    effective_pump_curve_points = effective_pump_curve(request.pump_curve_points, request.speed_ratio, request.parallel_pumps)
+    flows = [p['flow'] for p in effective_pump_curve_points]
+    heads = [p['head'] for p in effective_pump_curve_points]
+    coeffs = np.polyfit(flows, heads, 2)
+
+    head_pressure_suction = pressure_to_head(request.pressure_suction_bar_g, request.fluid)
+    head_pressure_discharge = pressure_to_head(request.pressure_discharge_bar_g, request.fluid)
+    total_static_head_m = request.static_head_m + (head_pressure_discharge - head_pressure_suction)
+
+    def simulate(n: int, rng: Optional[np.random.Generator]) -> Dict[str, np.ndarray]:
+        # rng=None gives the nominal system (every factor 1)
+        def sections(section_list: List[PipeSection]):
+            return sample_sections(
+                section_list, n, request.length_tolerance_pct / 100.0,
+                (request.roughness_factor_min, request.roughness_factor_max), rng
+            )
+
+        nu = request.fluid.nu * sample_factors(n, request.viscosity_tolerance_pct / 100.0, rng)
+        head_factor = sample_factors(n, request.pump_head_tolerance_pct / 100.0, rng)
+        flow_factor = sample_factors(n, request.pump_flow_tolerance_pct / 100.0, rng)
+        efficiency_factor = sample_factors(n, request.pump_efficiency_tolerance_pct / 100.0, rng)
+        result = solve_operating_points(
+            coeffs, head_factor, flow_factor, total_static_head_m,
+            sections(request.suction_sections),
+            sections(request.discharge_sections_before),
+            [sections(branch) for branch in request.discharge_parallel_sections.values()],
+            sections(request.discharge_sections_after),
+            nu, max(flows)
+        )
+
+        # Efficiency and NPSHr are read where each sampled pump's curve was measured
+        curve_flow = result["flow"] / flow_factor
+        efficiency = interpolate_efficiency(curve_flow, effective_pump_curve_points)
+        if efficiency is not None:
+            eta_pump = efficiency * efficiency_factor / 100.0
+            q_m3s = result["flow"] / 3600.0
+            power = (q_m3s * request.fluid.rho * 9.81 * result["head"]) / (eta_pump * request.efficiency_motor * 1000.0)
+            result["power"] = np.where(eta_pump > 0, power, np.nan)
+        npshr = interpolate_npshr(curve_flow, effective_pump_curve_points)
+        if npshr is not None:
+            npsha = calculate_npsha(
+                result["flow"], request.suction_sections, request.fluid,
+                request.atmospheric_pressure_bar, request.pressure_suction_bar_g,
+                h_loss_suction=result["suction_loss"]
+            )
+            result["npsh_margin"] = npsha - npshr
+        return result
+
+    nominal = simulate(1, None)
+    sampled = simulate(request.samples, np.random.default_rng(request.seed))
+    solved = int(np.count_nonzero(np.isfinite(sampled["flow"])))
+    if solved == 0:
+        raise HTTPException(status_code=400, detail="No sampled system has an operating point: the pump cannot overcome the static head.")
+
+    def band(key: str):
+        if key not in sampled:
+            return None
+        values = percentile_band(sampled[key], request.percentiles)
+        if values is not None and np.isfinite(nominal[key][0]):
+            values["nominal"] = float(nominal[key][0])
+        return values
+
+    margins = sampled.get("npsh_margin")
+    return {
+        "samples": request.samples,
+        "solved": solved,
+        "flow_m3h": band("flow"),
+        "head_m": band("head"),
+        "power_kw": band("power"),
+        "npsh_margin_m": band("npsh_margin"),
+        "cavitation_probability": float(np.count_nonzero(margins < 0) / solved) if margins is not None else None,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 1),
+    }
+
+_diameter_pool: Optional[ProcessPoolExecutor] = None
+_diameter_pool_lock = threading.Lock()
+
+def _diameter_search_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool shared by large diameter searches, started on first use. None with a single worker."""
+    global _diameter_pool
+    if settings.DIAMETER_OPT_WORKERS < 2:
+        return None
+    with _diameter_pool_lock:
+        if _diameter_pool is None:
+            # spawn: children must not inherit the parent's threads, event loop or DB connections
+            _diameter_pool = ProcessPoolExecutor(max_workers=settings.DIAMETER_OPT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _diameter_pool
+
+@router.post("/optimize-diameters", response_model=DiameterOptimizationResponse)
+def optimize_diameters(request: DiameterOptimizationRequest):
+    """
+    Picks a diameter per series section (suction, before and after the parallel branches) from the
+    candidates, minimizing pipe capital plus the present value of the pumping energy at the design flow.
+    With a pump curve, the total head must stay within the pump head and suction losses within the
+    NPSH margin. Parallel branches keep their current diameters.
+    """
+    fluid = request.fluid
+    head_pressure_suction = pressure_to_head(request.pressure_suction_bar_g, fluid)
+    head_pressure_discharge = pressure_to_head(request.pressure_discharge_bar_g, fluid)
+    total_static_head_m = request.static_head_m + (head_pressure_discharge - head_pressure_suction)
+
+    pump_points = None
+    pump_curve_func = None
+    if request.pump_curve_points:
+        if len(request.pump_curve_points) < 3:
+            raise HTTPException(status_code=400, detail="At least 3 pump curve points are required.")
+        pump_points = effective_pump_curve(request.pump_curve_points, request.speed_ratio, request.parallel_pumps)
+        pump_curve_func = np.poly1d(np.polyfit([p['flow'] for p in pump_points], [p['head'] for p in pump_points], 2))
+
+    flow = request.flow_m3h
+    if flow is None:
+        if pump_curve_func is None:
+            raise HTTPException(status_code=400, detail="flow_m3h is required when no pump curve is given.")
+        flow, _, _ = find_operating_point(
+            request.suction_sections,
+            request.discharge_sections_before,
+            request.discharge_parallel_sections,
+            request.discharge_sections_after,
+            total_static_head_m,
+            fluid,
+            pump_curve_func
+        )
+        if flow is None:
+            raise HTTPException(status_code=400, detail="No operating point with the current diameters: give flow_m3h.")
+    flow = float(flow)
+    parallel_loss, _ = calculate_parallel_loss(request.discharge_parallel_sections, flow, fluid)
+
+    efficiency_pump = request.efficiency_pump
+    if pump_points is not None:
+        curve_efficiency = interpolate_efficiency(flow, pump_points)
+        if curve_efficiency:
+            efficiency_pump = curve_efficiency / 100.0
+    # Cost of one meter of head at the design flow: kW, per year, and present value over the lifetime
+    kw_per_m = (flow / 3600.0 * fluid.rho * 9.81) / (efficiency_pump * request.efficiency_motor * 1000.0)
+    cost_per_year_per_m = kw_per_m * request.hours_per_day * request.days_per_year * request.energy_cost_per_kwh
+    lifetime_factor = present_worth_factor(request.discount_rate, request.lifetime_years)
+    energy_cost_per_m = cost_per_year_per_m * lifetime_factor
+
+    # Head limits coupling the sections: [total series loss] and [suction loss] when a pump is given
+    npsha_no_loss = calculate_npsha(flow, [], fluid, request.atmospheric_pressure_bar, request.pressure_suction_bar_g, h_loss_suction=0.0)
+    limits = []
+    limit_groups = []
+    if pump_curve_func is not None:
+        limits.append(float(pump_curve_func(flow)) - total_static_head_m - parallel_loss)
+        limit_groups.append(("suction", "discharge_before", "discharge_after"))
+        npshr = interpolate_npshr(flow, pump_points)
+        if npshr is not None:
+            limits.append(npsha_no_loss - npshr - request.npsh_margin_m)
+            limit_groups.append(("suction",))
+
+    candidates = np.unique(request.candidate_diameters_mm or list(DIAMETROS_PADRAO.values()))
+    if candidates.size == 0 or candidates[0] <= 0:
+        raise HTTPException(status_code=400, detail="Candidate diameters must be positive.")
+    labels = {mm: label for label, mm in DIAMETROS_PADRAO.items()}
+    candidate_cost_per_m = pipe_cost_per_m(candidates, request.pipe_cost_per_m, request.pipe_cost_exponent)
+
+    groups = [
+        ("suction", request.suction_sections),
+        ("discharge_before", request.discharge_sections_before),
+        ("discharge_after", request.discharge_sections_after),
+    ]
+    tables = [] # (group, index, section, candidate indices, losses, velocities)
+    costs, usages = [], []
+    for group, sections in groups:
+        for index, section in enumerate(sections):
+            losses, velocities = section_loss_by_diameter(section, flow, fluid, candidates)
+            total = candidate_cost_per_m * section.length_m + energy_cost_per_m * losses
+            allowed = np.flatnonzero((velocities >= request.min_velocity_m_s) & (velocities <= request.max_velocity_m_s))
+            if allowed.size == 0:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"No candidate diameter keeps {section.name or group} between {request.min_velocity_m_s} and {request.max_velocity_m_s} m/s."
+                )
+            kept = allowed[efficient_candidates(total[allowed], losses[allowed])]
+            tables.append((group, index, section, kept, losses, velocities))
+            costs.append(total[kept])
+            usages.append(np.array([[losses[k] if group in applies else 0.0 for applies in limit_groups] for k in kept]).reshape(kept.size, len(limits)))
+
+    try:
+        search = search_diameters(
+            costs,
+            usages,
+            limits,
+            executor=_diameter_search_pool(),
+            pool_min_combinations=settings.DIAMETER_OPT_POOL_MIN_COMBINATIONS,
+            workers=settings.DIAMETER_OPT_WORKERS
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def design_cost(series_loss: float, suction_loss: float, capital: float) -> Dict[str, float]:
+        total_head = total_static_head_m + series_loss + parallel_loss
+        cost_per_year = cost_per_year_per_m * total_head
+        energy_cost = cost_per_year * lifetime_factor
+        return {
+            "total_head_m": total_head,
+            "power_kw": kw_per_m * total_head,
+            "cost_per_year": cost_per_year,
+            "capital_cost": capital,
+            "energy_cost": energy_cost,
+            "total_cost": capital + energy_cost,
+            "npsh_available": npsha_no_loss - suction_loss,
+        }
+
+    choices = []
+    for (group, index, section, kept, losses, velocities), j in zip(tables, search["choice"]):
+        k = kept[j]
+        diameter = float(candidates[k])
+        choices.append({
+            "group": group,
+            "index": index,
+            "section_id": section.id,
+            "name": section.name,
+            "current_diameter_mm": section.diameter_mm,
+            "diameter_mm": diameter,
+            "diameter_label": labels.get(diameter),
+            "velocity_m_s": float(velocities[k]),
+            "loss_m": float(losses[k]),
+            "capital_cost": float(candidate_cost_per_m[k] * section.length_m),
+            "energy_cost": float(energy_cost_per_m * losses[k]),
+        })
+    optimized = design_cost(
+        sum(c["loss_m"] for c in choices),
+        sum(c["loss_m"] for c in choices if c["group"] == "suction"),
+        sum(c["capital_cost"] for c in choices)
+    )
+
+    current_suction_loss = calculate_series_loss(request.suction_sections, flow, fluid)
+    current_loss = current_suction_loss + sum(calculate_series_loss(sections, flow, fluid) for group, sections in groups[1:])
+    current_capital = sum(
+        float(pipe_cost_per_m(section.diameter_mm, request.pipe_cost_per_m, request.pipe_cost_exponent)) * section.length_m
+        for _, sections in groups for section in sections
+    )
+    current = design_cost(current_loss, current_suction_loss, current_capital)
+
+    return {
+        "flow_m3h": flow,
+        "sections": choices,
+        "optimized": optimized,
+        "current": current,
+        "savings": current["total_cost"] - optimized["total_cost"],
+        "combinations": search["combinations"],
+        "evaluated": search["evaluated"],
+        "used_process_pool": search["used_process_pool"],
+    }
@@ -1,45 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, List, Any
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from typing import Dict, List, Any, Optional
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import db
+from app.core.config import settings
 from app.api import deps
 from app.models import User, CustomFluid, CustomFluidCreate, CustomFluidRead
 from app.core.constants import FLUIDOS_PADRAO, MATERIAIS_PADRAO, K_FACTORS, DIAMETROS_PADRAO
+from app.core.etag import make_etag
+from app.core.precompressed import PrecompressedJSON, PrecompressedCache, not_modified_response
 from app.schemas.calculations import FluidProperties
 
 router = APIRouter()
 
+# Reference data only changes with a deploy: serialized and compressed once, at import
+STANDARDS = PrecompressedJSON({
+    "fluids": FLUIDOS_PADRAO,
+    "materials": MATERIAIS_PADRAO,
+    "fittings": K_FACTORS,
+    "diameters": DIAMETROS_PADRAO
+})
+
+# Custom fluid lists by version (see read_custom_fluids); compressed with cheaper settings
+custom_fluid_lists = PrecompressedCache(settings.PRECOMPRESSED_CACHE_MAX_ENTRIES)
+
 @router.get("/standards", response_model=Dict[str, Any])
-def get_standards():
+def get_standards(
+    v: Optional[str] = Query(None, description="Content version (from the ETag); versioned URLs are cached as immutable"),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Get all standard definitions: Fluids, Materials, Fittings (K Factors).
+    Served from precompressed bytes with a strong ETag; revalidations get a 304.
     """
-    return {
-        "fluids": FLUIDOS_PADRAO,
-        "materials": MATERIAIS_PADRAO,
-        "fittings": K_FACTORS,
-        "diameters": DIAMETROS_PADRAO
-    }
+    cache_control = "public, max-age=31536000, immutable" if v == STANDARDS.version else "public, no-cache"
+    return STANDARDS.response(accept_encoding, if_none_match, cache_control)
 
 @router.get("/custom", response_model=List[CustomFluidRead])
-def read_custom_fluids(
-    session: Session = Depends(deps.get_session),
+async def read_custom_fluids(
+    session: AsyncSession = Depends(deps.get_async_session),
     current_user: User = Depends(deps.get_current_active_user),
     skip: int = 0,
     limit: int = 100,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Retrieve user's custom fluids.
+    The list version is its row count, newest id and newest created_at (custom fluids are only
+    created or deleted, and either changes it), so an unchanged list gets a 304 or the cached
+    precompressed bytes without loading the rows.
     """
-    statement = select(CustomFluid).where(CustomFluid.user_id == current_user.id).offset(skip).limit(limit)
-    fluids = session.exec(statement).all()
-    return fluids
+    count, last_id, last_created_at = (await session.exec(
+        select(func.count(CustomFluid.id), func.max(CustomFluid.id), func.max(CustomFluid.created_at))
+        .where(CustomFluid.user_id == current_user.id)
+    )).one()
+    version = make_etag("custom-fluids", current_user.id, skip, limit, count, last_id, last_created_at).strip('"')
+    cache_control = "private, no-cache"
+
+    not_modified = not_modified_response(if_none_match, version, cache_control)
+    if not_modified is not None:
+        return not_modified
+
+    cached = custom_fluid_lists.get(version)
+    if cached is None:
+        statement = select(CustomFluid).where(CustomFluid.user_id == current_user.id).offset(skip).limit(limit)
+        fluids = (await session.exec(statement)).all()
+        payload = [CustomFluidRead.model_validate(fluid).model_dump(mode="json") for fluid in fluids]
+        cached = custom_fluid_lists.put(version, PrecompressedJSON(payload, version=version, brotli_quality=5, gzip_level=6))
+    return cached.response(accept_encoding, if_none_match, cache_control)
 
 @router.post("/custom", response_model=CustomFluidRead)
-def create_custom_fluid(
+async def create_custom_fluid(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     fluid_in: CustomFluidCreate,
     current_user: User = Depends(deps.get_current_active_user),
 ):
@@ -48,14 +84,14 @@ def create_custom_fluid(
     """
     fluid = CustomFluid(**fluid_in.dict(), user_id=current_user.id)
     session.add(fluid)
-    session.commit()
-    session.refresh(fluid)
+    await session.commit()
+    await session.refresh(fluid)
     return fluid
 
 @router.delete("/custom/{fluid_id}", response_model=CustomFluidRead)
-def delete_custom_fluid(
+async def delete_custom_fluid(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     fluid_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ):
@@ -63,10 +99,10 @@ def delete_custom_fluid(
     Delete a custom fluid.
     """
     statement = select(CustomFluid).where(CustomFluid.id == fluid_id, CustomFluid.user_id == current_user.id)
-    fluid = session.exec(statement).first()
+    fluid = (await session.exec(statement)).first()
     if not fluid:
         raise HTTPException(status_code=404, detail="Fluid not found")
     
-    session.delete(fluid)
-    session.commit()
+    await session.delete(fluid)
+    await session.commit()
     return fluid
@@ -1,9 +1,15 @@
+import json
+from datetime import datetime
 import stripe
+from sqlalchemy import insert
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.api import deps
 from app.core.config import settings
-from app.models import User
+from app.core.db import dialect_insert
+from app.core.stripe_events import notify_stripe_worker, event_key_rows
+from app.models import User, StripeEvent, StripeEventKey
 
 router = APIRouter()
 
@@ -90,7 +96,7 @@ async def create_checkout_session_public(plan: str, interval: str = "year"):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(deps.get_session)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(deps.get_async_session)):
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
 
@@ -103,138 +109,31 @@ async def stripe_webhook(request: Request, db: Session = Depends(deps.get_sessio
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        
-        user_id = session.get('metadata', {}).get('user_id')
-        plan = session.get('metadata', {}).get('plan')
-        interval = session.get('metadata', {}).get('interval', 'year')
-        customer_id = session.get('customer')
-        
-        from datetime import datetime, timedelta
-        end_date = datetime.utcnow() + timedelta(days=30) if interval == 'month' else None
-        
-        frontend_url = settings.FRONTEND_URL or "https://pumps-saas.com"
-        customer_email_to_notify = None
-        is_new_user = False
-        invite_link = None
-        
-        if user_id:
-            # Logged-in user purchase
-            user = db.get(User, int(user_id))
-            if user:
-                user.stripe_customer_id = customer_id
-                user.subscription_status = "active"
-                user.subscription_tier = plan or "basic"
-                user.subscription_end_date = end_date
-                db.add(user)
-                db.commit()
-                customer_email_to_notify = user.email
-        else:
-            # Public Checkout Flow handling
-            customer_email = session.get('customer_details', {}).get('email')
-            if customer_email:
-                customer_email_to_notify = customer_email
-                user = db.exec(select(User).where(User.email == customer_email)).first()
-                if not user:
-                    # Pre-create user waiting for registration
-                    is_new_user = True
-                    user = User(
-                        email=customer_email,
-                        hashed_password="TEMP_WAITING_REGISTRATION",
-                        role="user",
-                        is_active=False,
-                        subscription_status="active",
-                        subscription_tier=plan or "basic",
-                        subscription_end_date=end_date,
-                        stripe_customer_id=customer_id
-                    )
-                    db.add(user)
-                    db.commit()
-                    db.refresh(user)
-                    
-                    import secrets
-                    from app.models import Invite
-                    invite_code = secrets.token_urlsafe(8)
-                    invite = Invite(
-                        code=invite_code,
-                        created_by_id=user.id
-                    )
-                    db.add(invite)
-                    db.commit()
-                    invite_link = f"{frontend_url}/register?invite_code={invite_code}&email={customer_email}"
-                else:
-                    # User already existed (Reactivating / Upgrading without logging in)
-                    user.subscription_status = "active"
-                    user.subscription_tier = plan or "basic"
-                    user.subscription_end_date = end_date
-                    if not user.stripe_customer_id:
-                        user.stripe_customer_id = customer_id
-                    db.add(user)
-                    db.commit()
-        
-        # Now send the emails based on the flags
-        if customer_email_to_notify:
-            from app.core.email import send_email
-            
-            # 1) ALWAYS send internal Notification Email to Vendas
-            await send_email(
-                email_to="vendas@pumps-saas.com",
-                subject="💸 Nova Venda Realizada - Ação Automática",
-                text_content=f"O cliente {customer_email_to_notify} comprou o plano {plan}. O sistema processou a liberação."
-            )
-            
-            # 2) Send correct email to customer
-            if is_new_user:
-                await send_email(
-                    email_to=customer_email_to_notify,
-                    subject="Seu Acesso ao Pumps SaaS Foi Liberado!",
-                    text_content=f"Bem vindo ao Pumps SaaS!\n\nSeu pagamento foi aprovado e sua assinatura {plan.capitalize()} está ativa.\n\nPara criar sua senha e entrar no aplicativo de forma segura, acesse o link de Convite exclusivo abaixo:\n{invite_link}\n\nAtenciosamente,\nEquipe Pumps SaaS"
-                )
-            else:
-                login_url = f"{frontend_url}/login"
-                await send_email(
-                    email_to=customer_email_to_notify,
-                    subject="Assinatura Pumps SaaS Atualizada",
-                    text_content=f"Sua compra foi confirmada e sua assinatura {plan.capitalize()} está ativa!\n\nVocê já pode fazer login na plataforma para utilizar seus recursos. Acesse sua conta diretamente pelo link abaixo para entrar:\n{login_url}\n\nAtenciosamente,\nEquipe Pumps SaaS"
-                )
-
-    elif event['type'] in ['charge.refunded', 'customer.subscription.deleted', 'customer.subscription.canceled']:
-        data_object = event['data']['object']
-        customer_id = data_object.get('customer')
-        customer_email = data_object.get('billing_details', {}).get('email') or data_object.get('receipt_email')
-        
-        from sqlmodel import select
-        user = None
-        
-        if customer_id:
-            user = db.exec(select(User).where(User.stripe_customer_id == customer_id)).first()
-            
-        if not user and customer_email:
-            # Fallback for one-time payments where customer_id might be null
-            user = db.exec(select(User).where(User.email == customer_email)).first()
-            
-        if user:
-            from datetime import datetime
-            user.subscription_status = "expired"
-            user.subscription_end_date = datetime.utcnow()
-            user.is_active = False
-            db.add(user)
-            db.commit()
-                
-            from app.core.email import send_email
-            await send_email(
-                email_to="vendas@pumps-saas.com",
-                subject="⚠️ Assinatura Cancelada / Reembolsada",
-                text_content=f"Atenção: O sistema identificou um reembolso ou cancelamento no Stripe.\n\nO cliente {user.email} teve sua assinatura bloqueada e o acesso foi revogado automaticamente."
-            )
+    # Store and acknowledge right away; app/core/stripe_events.py applies it in the background.
+    # A retried delivery hits the unique event_id and is ignored.
+    event_data = json.loads(payload)
+    statement = dialect_insert(StripeEvent).values(
+        event_id=event_data['id'],
+        type=event_data['type'],
+        payload=event_data,
+        stripe_created=event_data.get('created') or 0,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        received_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=["event_id"]).returning(StripeEvent.id)
+    event_pk = (await db.exec(statement)).scalar()
+    if event_pk is not None:
+        key_rows = event_key_rows(event_pk, event_data)
+        if key_rows:
+            await db.exec(insert(StripeEventKey).values(key_rows))
+    await db.commit()
+    notify_stripe_worker()
 
     return {"status": "success"}
 
-import smtplib
-from email.message import EmailMessage
 from pydantic import BaseModel
-from sqlmodel import select
+from app.core.email import enqueue_email
 
 class ContactForm(BaseModel):
     first_name: str
@@ -243,30 +142,23 @@ class ContactForm(BaseModel):
     message: str
 
 @router.post("/contact")
-async def process_contact_form(contact: ContactForm):
+def process_contact_form(contact: ContactForm):
     try:
-        msg = EmailMessage()
-        msg.set_content(f"""Nova mensagem de contato recebida pela Landing Page:
+        # Queued for the background sender (app/core/email.py) instead of a blocking SMTP session per request
+        enqueue_email(
+            email_to="vendas@pumps-saas.com",
+            subject="Nova mensagem via Formulário de Vendas",
+            text_content=f"""Nova mensagem de contato recebida pela Landing Page:
 
 Nome: {contact.first_name} {contact.last_name}
 Email: {contact.email}
 
 Mensagem:
 {contact.message}
-""")
-        msg["Subject"] = "Nova mensagem via Formulário de Vendas"
-        msg["From"] = "Pumps SaaS Sales <vendas@pumps-saas.com>"
-        msg["To"] = "vendas@pumps-saas.com"
-        msg["Reply-To"] = contact.email
-
-        if settings.SMTP_PASSWORD:
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.starttls()
-                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                server.send_message(msg)
-        else:
-            print("SIMULATING EMAIL SEND (No SMTP_PASSWORD):", msg.as_string())
-            
+""",
+            reply_to=contact.email,
+            from_address="Pumps SaaS Sales <vendas@pumps-saas.com>"
+        )
         return {"status": "success"}
     except Exception as e:
         print("Error sending email:", e)
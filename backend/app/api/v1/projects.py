@@ -1,21 +1,43 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+import base64
+import json
+from typing import List, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import selectinload, load_only
 
 from app.api import deps
+from app.core.etag import make_etag, etag_matches
+from app.services.scenario_results import SOLVER_VERSION, refresh_scenario_results
 from app.models import (
-    User, Project, ProjectCreate, ProjectRead, ProjectReadWithScenarios,
+    User, Project, ProjectCreate, ProjectRead, ProjectReadWithScenarios, ProjectSummary, ProjectSummaryPage,
     Scenario, ScenarioCreate, ScenarioRead
 )
 
+# Scenario columns needed for listings; Scenario.data is only loaded by read_scenario
+SCENARIO_SUMMARY_COLUMNS = (Scenario.id, Scenario.project_id, Scenario.name, Scenario.created_at)
+SCENARIO_VERSION_COLUMNS = (Scenario.input_hash, Scenario.solver_version, Scenario.results_computed_at)
+
 router = APIRouter()
 
+def _encode_cursor(name: str, project_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name, project_id]).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        name, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(name), int(project_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 # --- Projects ---
 
 @router.post("/", response_model=ProjectRead)
-def create_project(
+async def create_project(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     project_in: ProjectCreate,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -23,19 +45,19 @@ def create_project(
     Create new project.
     """
     # Check for duplicate name
-    existing_project = session.exec(select(Project).where(Project.user_id == current_user.id, Project.name == project_in.name)).first()
+    existing_project = (await session.exec(select(Project).where(Project.user_id == current_user.id, Project.name == project_in.name))).first()
     if existing_project:
         raise HTTPException(status_code=400, detail="A project with this name already exists.")
 
     project = Project(**project_in.dict(), user_id=current_user.id)
     session.add(project)
-    session.commit()
-    session.refresh(project)
+    await session.commit()
+    await session.refresh(project)
     return project
 
 @router.get("/", response_model=List[ProjectRead])
-def read_projects(
-    session: Session = Depends(deps.get_session),
+async def read_projects(
+    session: AsyncSession = Depends(deps.get_async_session),
     current_user: User = Depends(deps.get_current_active_user),
     skip: int = 0,
     limit: int = 100,
@@ -45,29 +67,87 @@ def read_projects(
     """
     # Filter by current_user
     statement = select(Project).where(Project.user_id == current_user.id).offset(skip).limit(limit)
-    projects = session.exec(statement).all()
+    projects = (await session.exec(statement)).all()
     return projects
 
+@router.get("/summary", response_model=ProjectSummaryPage)
+async def read_project_summaries(
+    session: AsyncSession = Depends(deps.get_async_session),
+    current_user: User = Depends(deps.get_current_active_user),
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+) -> Any:
+    """
+    Projects with scenario count, latest scenario timestamp and stored payload size, in one aggregated query.
+    Ordered by name; `q` filters by name prefix (case-insensitive). Keyset pagination: pass back `next_cursor` as `cursor`.
+    """
+    # Aggregate per project first so the scenario payloads are never sent to the app
+    scenario_stats = (
+        select(
+            Scenario.project_id.label("project_id"),
+            func.count(Scenario.id).label("scenario_count"),
+            func.max(Scenario.created_at).label("last_scenario_at"),
+            func.coalesce(func.sum(func.length(Scenario.data)), 0).label("data_size_bytes"), # compressed blob bytes
+        )
+        .join(Project, Project.id == Scenario.project_id)
+        .where(Project.user_id == current_user.id)
+        .group_by(Scenario.project_id)
+        .subquery()
+    )
+
+    # Filtering on user_id and ordering by name walk ix_project_user_id_name
+    statement = (
+        select(Project, scenario_stats.c.scenario_count, scenario_stats.c.last_scenario_at, scenario_stats.c.data_size_bytes)
+        .outerjoin(scenario_stats, scenario_stats.c.project_id == Project.id)
+        .where(Project.user_id == current_user.id)
+    )
+    if q:
+        escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        # lower(name) LIKE 'prefix%' is a range scan of ix_project_user_id_lower_name (ILIKE cannot use a btree)
+        statement = statement.where(func.lower(Project.name).like(f"{escaped.lower()}%", escape="\\"))
+    if cursor:
+        after_name, after_id = _decode_cursor(cursor)
+        statement = statement.where(or_(Project.name > after_name, and_(Project.name == after_name, Project.id > after_id)))
+    statement = statement.order_by(Project.name, Project.id).limit(limit + 1)
+
+    rows = (await session.exec(statement)).all()
+    items = [
+        ProjectSummary(
+            **ProjectRead.model_validate(project).model_dump(),
+            scenario_count=scenario_count or 0,
+            last_scenario_at=last_scenario_at,
+            data_size_bytes=data_size_bytes or 0,
+        )
+        for project, scenario_count, last_scenario_at, data_size_bytes in rows[:limit]
+    ]
+    next_cursor = _encode_cursor(items[-1].name, items[-1].id) if len(rows) > limit else None
+    return ProjectSummaryPage(items=items, next_cursor=next_cursor)
+
 @router.get("/{project_id}", response_model=ProjectReadWithScenarios)
-def read_project(
+async def read_project(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     project_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get project by ID.
+    Get project by ID, with scenario metadata only (no data payloads).
     """
-    statement = select(Project).where(Project.id == project_id, Project.user_id == current_user.id)
-    project = session.exec(statement).first()
+    statement = (
+        select(Project)
+        .where(Project.id == project_id, Project.user_id == current_user.id)
+        .options(selectinload(Project.scenarios).load_only(*SCENARIO_SUMMARY_COLUMNS))
+    )
+    project = (await session.exec(statement)).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
 @router.delete("/{project_id}", response_model=ProjectRead)
-def delete_project(
+async def delete_project(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     project_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -75,20 +155,20 @@ def delete_project(
     Delete a project.
     """
     statement = select(Project).where(Project.id == project_id, Project.user_id == current_user.id)
-    project = session.exec(statement).first()
+    project = (await session.exec(statement)).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    session.delete(project)
-    session.commit()
+    await session.delete(project)
+    await session.commit()
     return project
 
 # --- Scenarios ---
 
 @router.post("/{project_id}/scenarios", response_model=ScenarioRead)
-def create_scenario(
+async def create_scenario(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     project_id: int,
     scenario_in: ScenarioCreate,
     current_user: User = Depends(deps.get_current_active_user),
@@ -97,20 +177,79 @@ def create_scenario(
     Create new scenario in a project.
     """
     # Verify Project Ownership
-    project = session.exec(select(Project).where(Project.id == project_id, Project.user_id == current_user.id)).first()
+    project = (await session.exec(select(Project).where(Project.id == project_id, Project.user_id == current_user.id))).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
     scenario = Scenario(**scenario_in.dict(), project_id=project_id)
+    # Results are stored with the scenario so reopening it needs no recalculation
+    await run_in_threadpool(refresh_scenario_results, scenario)
     session.add(scenario)
-    session.commit()
-    session.refresh(scenario)
+    await session.commit()
+    await session.refresh(scenario)
     return scenario
 
+@router.get("/scenarios/{scenario_id}", response_model=ScenarioRead)
+async def read_scenario(
+    *,
+    session: AsyncSession = Depends(deps.get_async_session),
+    scenario_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated top-level keys of `data` to return"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get a scenario with its full data payload (or the `fields` subset of it) and its stored results.
+    Saved scenarios are immutable, so while the results are current the ETag is checked before
+    the payload is loaded. Results from an older SOLVER_VERSION are recomputed here first.
+    """
+    statement = (
+        select(Scenario)
+        .join(Project)
+        .where(Scenario.id == scenario_id, Project.user_id == current_user.id)
+        .options(load_only(*SCENARIO_SUMMARY_COLUMNS, *SCENARIO_VERSION_COLUMNS))
+    )
+    scenario = (await session.exec(statement)).first()
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+
+    field_list = sorted({f.strip() for f in fields.split(",") if f.strip()}) if fields else None
+
+    def scenario_etag() -> str:
+        return make_etag(
+            "scenario", scenario.id, scenario.created_at.isoformat(), ",".join(field_list or []),
+            scenario.solver_version, scenario.input_hash, scenario.results_computed_at
+        )
+
+    if scenario.solver_version == SOLVER_VERSION and etag_matches(if_none_match, scenario_etag()):
+        return Response(status_code=304, headers={"ETag": scenario_etag(), "Cache-Control": "private, no-cache"})
+
+    await session.refresh(scenario, ["data", "results"])
+    if await run_in_threadpool(refresh_scenario_results, scenario):
+        session.add(scenario)
+        await session.commit()
+
+    data = scenario.data or {}
+    if field_list is not None:
+        data = {key: data[key] for key in field_list if key in data}
+
+    response.headers.update({"ETag": scenario_etag(), "Cache-Control": "private, no-cache"})
+    return ScenarioRead(
+        id=scenario.id,
+        project_id=scenario.project_id,
+        name=scenario.name,
+        created_at=scenario.created_at,
+        data=data,
+        results=scenario.results,
+        solver_version=scenario.solver_version,
+        results_computed_at=scenario.results_computed_at
+    )
+
 @router.delete("/scenarios/{scenario_id}", response_model=ScenarioRead)
-def delete_scenario(
+async def delete_scenario(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     scenario_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -119,10 +258,10 @@ def delete_scenario(
     """
     # Join with Project to verify ownership
     statement = select(Scenario).join(Project).where(Scenario.id == scenario_id, Project.user_id == current_user.id)
-    scenario = session.exec(statement).first()
+    scenario = (await session.exec(statement)).first()
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
-    session.delete(scenario)
-    session.commit()
+    await session.delete(scenario)
+    await session.commit()
     return scenario
@@ -1,17 +1,43 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, or_
+import base64
+import io
+import json
+import tempfile
+from typing import List, Any, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select, or_, and_
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api import deps
-from app.models import User, Pump, PumpCreate, PumpRead, PumpReadBasic
+from app.core.config import settings
+from app.core.db import engine
+from app.core.pump_import import import_catalog
+from app.core.pump_search import search_condition
+from app.models import User, Pump, PumpCreate, PumpRead, PumpReadBasic, PumpSearchResult, PumpSearchPage
 import numpy as np
 
 router = APIRouter()
 
+def _encode_cursor(manufacturer: str, model: str, pump_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([manufacturer, model, pump_id]).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        manufacturer, model, pump_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(manufacturer), str(model), int(pump_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _visible_pumps(current_user: User):
+    """Own pumps, plus the global catalog for paid tiers."""
+    if current_user.subscription_tier in ["pro", "premium", "enterprise"]:
+        return or_(Pump.user_id == current_user.id, Pump.is_global == True)
+    return Pump.user_id == current_user.id
+
 @router.post("/", response_model=PumpRead)
-def create_pump(
+async def create_pump(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     pump_in: PumpCreate,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -35,13 +61,39 @@ def create_pump(
             pass # Invalid curve, let it pass without pre-calc
 
     session.add(pump)
-    session.commit()
-    session.refresh(pump)
+    await session.commit()
+    await session.refresh(pump)
     return pump
 
+@router.post("/import")
+async def import_pumps(
+    request: Request,
+    format: Literal["csv", "json", "ndjson"] = Query(..., description="Body format (see app/core/pump_import.py)"),
+    is_global: bool = Query(False, description="Import into the global catalog (admins only)"),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Bulk import a pump catalog sent as the raw request body.
+    Invalid records are skipped and reported by record number; valid ones are fitted and inserted in chunks.
+    """
+    if is_global and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can import into the global catalog")
+
+    # Spooled to disk past 8 MB, then parsed line by line in a worker thread
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.PUMP_IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Catalog too large")
+            upload.write(chunk)
+        upload.seek(0)
+        lines = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+        return await run_in_threadpool(import_catalog, lines, format, current_user.id, is_global)
+
 @router.get("/", response_model=List[PumpReadBasic])
-def read_pumps(
-    session: Session = Depends(deps.get_session),
+async def read_pumps(
+    session: AsyncSession = Depends(deps.get_async_session),
     current_user: User = Depends(deps.get_current_active_user),
     skip: int = 0,
     limit: int = 1000,
@@ -49,19 +101,75 @@ def read_pumps(
     """
     Retrieve pumps from the user's catalog. Premium users also see global pumps.
     """
-    if current_user.subscription_tier in ["pro", "premium", "enterprise"]:
-        statement = select(Pump).where(
-            or_(Pump.user_id == current_user.id, Pump.is_global == True)
-        ).offset(skip).limit(limit)
-    else:
-        statement = select(Pump).where(Pump.user_id == current_user.id).offset(skip).limit(limit)
-    pumps = session.exec(statement).all()
+    statement = select(Pump).where(_visible_pumps(current_user)).offset(skip).limit(limit)
+    pumps = (await session.exec(statement)).all()
     return pumps
 
+@router.get("/search", response_model=PumpSearchPage)
+async def search_pumps(
+    session: AsyncSession = Depends(deps.get_async_session),
+    current_user: User = Depends(deps.get_current_active_user),
+    q: Optional[str] = Query(None, description="Words that must all appear in manufacturer or model (case-insensitive)"),
+    manufacturer: Optional[str] = Query(None, description="Exact manufacturer"),
+    flow_m3h: Optional[float] = Query(None, ge=0, description="Duty flow the pump must reach"),
+    head_m: Optional[float] = Query(None, ge=0, description="Duty head the pump must deliver at flow_m3h"),
+    head_tolerance_pct: float = Query(25.0, ge=0, description="Max excess head over head_m at flow_m3h, in %"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+) -> Any:
+    """
+    Search the pumps visible to the user (same scope as GET /pumps/), ordered by manufacturer and model.
+    `q` uses the trigram search index (see app/core/pump_search.py). With flow_m3h (and head_m), only
+    pumps whose fitted curve reaches the duty point are returned, and at most head_tolerance_pct above it.
+    Keyset pagination: pass back `next_cursor` as `cursor`.
+    """
+    # Only the listing columns: curve_points is fetched by GET /pumps/{id} once a pump is picked
+    columns = [Pump.id, Pump.manufacturer, Pump.model, Pump.is_global, Pump.max_flow_m3h, Pump.max_head_m]
+    head_at_flow = None
+    if flow_m3h is not None:
+        head_at_flow = Pump.coeff_a * flow_m3h * flow_m3h + Pump.coeff_b * flow_m3h + Pump.coeff_c
+        columns.append(head_at_flow.label("head_at_flow"))
+
+    statement = select(*columns).where(_visible_pumps(current_user))
+    if q:
+        condition = search_condition(q, engine.dialect.name)
+        if condition is not None:
+            statement = statement.where(condition)
+    if manufacturer:
+        statement = statement.where(Pump.manufacturer == manufacturer)
+    if head_at_flow is not None:
+        statement = statement.where(Pump.max_flow_m3h >= flow_m3h)
+        if head_m is not None:
+            statement = statement.where(head_at_flow >= head_m, head_at_flow <= head_m * (1 + head_tolerance_pct / 100.0))
+    if cursor:
+        after_manufacturer, after_model, after_id = _decode_cursor(cursor)
+        statement = statement.where(or_(
+            Pump.manufacturer > after_manufacturer,
+            and_(Pump.manufacturer == after_manufacturer, Pump.model > after_model),
+            and_(Pump.manufacturer == after_manufacturer, Pump.model == after_model, Pump.id > after_id),
+        ))
+    statement = statement.order_by(Pump.manufacturer, Pump.model, Pump.id).limit(limit + 1)
+
+    rows = (await session.exec(statement)).all()
+    items = [
+        PumpSearchResult(
+            id=row.id,
+            manufacturer=row.manufacturer,
+            model=row.model,
+            is_global=row.is_global,
+            max_flow_m3h=row.max_flow_m3h,
+            max_head_m=row.max_head_m,
+            head_at_flow_m=getattr(row, "head_at_flow", None),
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = _encode_cursor(items[-1].manufacturer, items[-1].model, items[-1].id) if len(rows) > limit else None
+    return PumpSearchPage(items=items, next_cursor=next_cursor)
+
 @router.get("/{pump_id}", response_model=PumpRead)
-def read_pump(
+async def read_pump(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     pump_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -72,15 +180,15 @@ def read_pump(
         Pump.id == pump_id,
         or_(Pump.user_id == current_user.id, Pump.is_global == True)
     )
-    pump = session.exec(statement).first()
+    pump = (await session.exec(statement)).first()
     if not pump:
         raise HTTPException(status_code=404, detail="Pump not found")
     return pump
 
 @router.delete("/{pump_id}", response_model=PumpRead)
-def delete_pump(
+async def delete_pump(
     *,
-    session: Session = Depends(deps.get_session),
+    session: AsyncSession = Depends(deps.get_async_session),
     pump_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -88,10 +196,10 @@ def delete_pump(
     Delete a pump from the catalog.
     """
     statement = select(Pump).where(Pump.id == pump_id, Pump.user_id == current_user.id)
-    pump = session.exec(statement).first()
+    pump = (await session.exec(statement)).first()
     if not pump:
         raise HTTPException(status_code=404, detail="Pump not found")
     
-    session.delete(pump)
-    session.commit()
+    await session.delete(pump)
+    await session.commit()
     return pump
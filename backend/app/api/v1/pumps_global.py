@@ -1,4 +1,4 @@
-from typing import List, Any
+from typing import List, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 import numpy as np
@@ -8,10 +8,21 @@ from app.models import User, Pump
 from app.schemas.calculations import SystemHeadCurveRequest
 from app.services.optimization import find_operating_point, calculate_parallel_loss
 from app.services.fluid_mechanics import calculate_series_loss
+from app.services.sampling import adaptive_sample
 from app.api.v1.calculate import interpolate_efficiency, pressure_to_head
 
 router = APIRouter()
 
+def _intersection_flows(pump_coeffs, sys_coeffs, flow_low: float, flow_high: float) -> List[float]:
+    """Positive real flows in [flow_low, flow_high] where the pump and system polynomials meet, ascending."""
+    roots = np.roots(np.polysub(pump_coeffs, sys_coeffs))
+    return sorted(r.real for r in roots if abs(r.imag) < 1e-5 and r.real > 0 and flow_low <= r.real <= flow_high)
+
+# System curve fit used by auto-select: max head error (m), sample budget and max polynomial degree
+SYSTEM_FIT_TOLERANCE_M = 0.1
+SYSTEM_SAMPLE_BUDGET = 25
+SYSTEM_FIT_MAX_DEGREE = 4
+
 @router.post("/auto-select", response_model=List[dict])
 def auto_select_pump(
     *,
@@ -41,20 +52,34 @@ def auto_select_pump(
     results = []
 
     # [PERFORMANCE FIX] Pre-calculate the system curve polynomial ONCE
-    # instead of running the nested-root physics engine for every pump in the database
-    test_flows = np.linspace(request.flow_min_m3h or 0.0, request.flow_max_m3h or 100.0, 15)
-    test_heads = []
-    for q in test_flows:
+    # instead of running the nested-root physics engine for every pump in the database.
+    # Adaptive sampling puts the points where the curve bends (e.g. parallel branches opening).
+    def system_head(q: float) -> Optional[float]:
         if q <= 0:
-            test_heads.append(total_static_head_m)
-            continue
+            return total_static_head_m
         loss_suc = calculate_series_loss(request.suction_sections, q, request.fluid)
         loss_bef = calculate_series_loss(request.discharge_sections_before, q, request.fluid)
         loss_par, _ = calculate_parallel_loss(request.discharge_parallel_sections, q, request.fluid)
+        if loss_par == -1.0:
+            return None
         loss_aft = calculate_series_loss(request.discharge_sections_after, q, request.fluid)
-        test_heads.append(total_static_head_m + loss_suc + loss_bef + loss_par + loss_aft)
-    
-    sys_coeffs = np.polyfit(test_flows, test_heads, 2)
+        return total_static_head_m + loss_suc + loss_bef + loss_par + loss_aft
+
+    flow_min = request.flow_min_m3h or 0.0
+    flow_max = request.flow_max_m3h or 100.0
+    test_flows, test_heads, _ = adaptive_sample(system_head, flow_min, flow_max, SYSTEM_FIT_TOLERANCE_M / 2, SYSTEM_SAMPLE_BUDGET)
+
+    if len(test_flows) < 3:
+        return results # No solvable system curve in the flow range
+
+    # Lowest polynomial degree whose worst residual on the samples is within tolerance
+    for degree in range(2, min(SYSTEM_FIT_MAX_DEGREE, len(test_flows) - 1) + 1):
+        sys_coeffs = np.polyfit(test_flows, test_heads, degree)
+        system_fit_error_m = float(np.max(np.abs(np.polyval(sys_coeffs, test_flows) - test_heads)))
+        if degree == 2:
+            quadratic_coeffs, quadratic_fit_error_m = sys_coeffs, system_fit_error_m
+        if system_fit_error_m <= SYSTEM_FIT_TOLERANCE_M:
+            break
 
     for pump in global_pumps:
         points = pump.curve_points
@@ -76,17 +101,26 @@ def auto_select_pump(
             if shut_off_head < total_static_head_m:
                 continue # Pump is too weak
 
-            # O(1) mathematical intersection of two 2nd degree polynomials
-            diff_coeffs = np.array(pump_coeffs) - np.array(sys_coeffs)
-            roots = np.roots(diff_coeffs)
-            
-            # Find positive real roots
-            real_roots = [r.real for r in roots if abs(r.imag) < 1e-5 and r.real > 0]
-            
+            # O(1) mathematical intersection of the pump and system polynomials.
+            # A cubic/quartic fit only describes the system over the sampled range (its extrapolation
+            # roots are not physical); outside it, fall back to the quadratic fit.
+            real_roots = _intersection_flows(pump_coeffs, sys_coeffs, flow_min, flow_max)
+            fallback = not real_roots
+            if fallback:
+                real_roots = _intersection_flows(pump_coeffs, quadratic_coeffs, 0.0, np.inf)
+
             if not real_roots:
                 continue # Does not intersect
 
-            flow_op = min(real_roots)
+            flow_op = real_roots[0]
+            # The sampled residual only bounds a fit inside the sampled range: an extrapolated
+            # quadratic operating point has no known error bound
+            if not fallback:
+                fit_error_m = system_fit_error_m
+            elif flow_min <= flow_op <= flow_max:
+                fit_error_m = quadratic_fit_error_m
+            else:
+                fit_error_m = None
             head_op = float(pump_curve_func(flow_op))
 
             if flow_op > (pump.max_flow_m3h * 1.25):
@@ -102,7 +136,8 @@ def auto_select_pump(
                     "curve_points": points,
                     "flow_op": float(flow_op),
                     "head_op": float(head_op),
-                    "efficiency_op": float(efficiency_op)
+                    "efficiency_op": float(efficiency_op),
+                    "system_fit_error_m": fit_error_m
                 })
 
         except Exception as e:
@@ -1,7 +1,9 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.api.deps import get_session, get_current_active_user
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.api.deps import get_async_session, get_current_active_user
 from app.models import (
     User,
     SupportTicket,
@@ -11,14 +13,14 @@ from app.models import (
     TicketMessage,
     TicketMessageCreate
 )
-from app.core.email import send_email
+from app.core.email import build_outbound_email, notify_email_sender
 from app.core.config import settings
 
 router = APIRouter()
 
 @router.get("/tickets", response_model=List[SupportTicketReadWithMessages])
-def read_tickets(
-    db: Session = Depends(get_session),
+async def read_tickets(
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user),
     skip: int = 0,
     limit: int = 100,
@@ -26,14 +28,14 @@ def read_tickets(
     """
     Retrieve user tickets.
     """
-    statement = select(SupportTicket).where(SupportTicket.user_id == current_user.id).offset(skip).limit(limit)
-    tickets = db.exec(statement).all()
+    statement = select(SupportTicket).where(SupportTicket.user_id == current_user.id).options(selectinload(SupportTicket.messages)).offset(skip).limit(limit)
+    tickets = (await db.exec(statement)).all()
     return tickets
 
 @router.post("/tickets", response_model=SupportTicketRead)
 async def create_ticket(
     *,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_async_session),
     ticket_in: SupportTicketCreate,
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
@@ -47,8 +49,8 @@ async def create_ticket(
         status="open"
     )
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     
     # 2. Add the initial message
     internal_message = f"[Reported by {current_user.email} -> {current_user.role}]\n\n{ticket_in.message}"
@@ -60,18 +62,18 @@ async def create_ticket(
         attachment_url=ticket_in.attachment_url
     )
     db.add(first_msg)
-    db.commit()
-    db.refresh(first_msg)
-    
-    # 3. Trigger email to Support team
+
+    # 3. Queue the email to the Support team in the same transaction as the message
     email_subject = f"[Ticket #{ticket.id}] {ticket.subject}"
-    
-    await send_email(
+
+    db.add(build_outbound_email(
         email_to=settings.EMAILS_FROM_EMAIL,
         subject=email_subject,
         text_content=internal_message,
         reply_to=settings.EMAILS_FROM_EMAIL,  # Force reply to the system so DB records it
         headers={"X-Pumps-Notification": "Original"}
-    )
-    
+    ))
+    await db.commit()
+    notify_email_sender()
+
     return ticket
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as SASession, make_transient_to_detached
+
+from app.core.config import settings
+from app.models import User
+
+# --- Authenticated Principal Cache ---
+# Short-TTL, in-process caches used by app/api/deps.py:
+#   token -> (subject, exp): skips re-verifying the same JWT on every request
+#   subject (email) -> user column values: skips the User SELECT on every request
+# User rows are invalidated by the flush listener below whenever a User is updated or deleted
+# (webhooks, admin toggles, registration...). The TTL bounds staleness across worker processes.
+
+_lock = threading.Lock()
+_tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_users: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+def get_token_subject(token: str) -> Optional[str]:
+    with _lock:
+        entry = _tokens.get(token)
+        if entry is None:
+            return None
+        subject, exp = entry
+        if exp <= time.time():
+            del _tokens[token]
+            return None
+        _tokens.move_to_end(token)
+        return subject
+
+def cache_token_subject(token: str, subject: str, exp: Optional[float]) -> None:
+    if exp is None:
+        return
+    with _lock:
+        _tokens[token] = (subject, float(exp))
+        _tokens.move_to_end(token)
+        while len(_tokens) > settings.AUTH_CACHE_MAX_ENTRIES:
+            _tokens.popitem(last=False)
+
+def get_cached_user(subject: str) -> Optional[User]:
+    """
+    Returns a fresh detached User built from the cached columns (never shared between requests),
+    or None on a miss. Relationships are not loaded; session.add() on it issues an UPDATE.
+    """
+    with _lock:
+        entry = _users.get(subject)
+        if entry is None:
+            return None
+        cached_at, values = entry
+        if time.monotonic() - cached_at > settings.AUTH_CACHE_TTL_SECONDS:
+            del _users[subject]
+            return None
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+def cache_user(subject: str, user: User) -> None:
+    values = {column.key: getattr(user, column.key) for column in inspect(User).column_attrs}
+    with _lock:
+        _users[subject] = (time.monotonic(), values)
+        _users.move_to_end(subject)
+        while len(_users) > settings.AUTH_CACHE_MAX_ENTRIES:
+            _users.popitem(last=False)
+
+def invalidate_user(subject: Optional[str]) -> None:
+    if not subject:
+        return
+    with _lock:
+        _users.pop(subject, None)
+
+def clear() -> None:
+    with _lock:
+        _tokens.clear()
+        _users.clear()
+
+@event.listens_for(SASession, "after_flush")
+def _invalidate_changed_users(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            history = inspect(obj).attrs.email.history
+            emails = list(history.deleted) + list(history.unchanged) + list(history.added)
+            if not emails:
+                # Email attribute expired (object modified after a commit): drop every cached user
+                with _lock:
+                    _users.clear()
+            for email in emails:
+                invalidate_user(email)
@@ -0,0 +1,38 @@
+import json
+import brotli
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+# --- Compressed JSON Column ---
+# Scenario payloads repeat the same keys and material/fluid strings many times, so canonical
+# JSON compresses very well. Stored as: MAGIC + brotli(canonical JSON), decoded transparently on read.
+
+MAGIC = b"BRJ1"
+BROTLI_QUALITY = 6 # good ratio while keeping scenario saves fast (11 is several times slower)
+
+def encode_json(value) -> bytes:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return MAGIC + brotli.compress(canonical.encode("utf-8"), mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+
+def decode_json(raw):
+    if raw is None:
+        return None
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    if isinstance(raw, bytes) and raw.startswith(MAGIC):
+        return json.loads(brotli.decompress(raw[len(MAGIC):]))
+    # Plain JSON text (rows written before the backfill migration ran)
+    return json.loads(raw)
+
+class CompressedJSON(TypeDecorator):
+    """JSON value stored as brotli-compressed canonical JSON in a binary column."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_json(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_json(value)
@@ -0,0 +1,66 @@
+import gzip
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.precompressed import negotiate_encoding
+
+# --- Response Compression ---
+# Content-negotiated brotli/gzip for complete (non-streamed) responses above a size threshold.
+# Streamed responses (NDJSON / SSE system curves, file downloads) pass through untouched so they
+# keep arriving progressively, as do responses that are already encoded (app/core/precompressed.py).
+
+COMPRESSIBLE_TYPES = ("application/json", "application/problem+json", "text/", "application/javascript", "image/svg+xml")
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), ("br", "gzip"))
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message # Held until the first body chunk shows whether it streams
+                return
+            if message["type"] != "http.response.body" or not start_message:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            compress = (
+                not message.get("more_body", False)
+                and len(body) >= settings.COMPRESSION_MIN_BYTES
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            )
+            if compress:
+                if encoding == "br":
+                    body = brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+                else:
+                    body = gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # The encoded bytes differ from what the strong validator describes (as nginx does)
+                    headers["ETag"] = "W/" + etag
+                message = {**message, "body": body}
+            await send(start_message)
+            start_message = {}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -18,6 +18,12 @@ class Settings(BaseSettings):
     EMAILS_FROM_EMAIL: str = os.getenv("EMAILS_FROM_EMAIL", "suporte@pumps-saas.com")
     EMAILS_FROM_NAME: str = "Pumps SaaS Support"
     IMAP_FOLDER: str = os.getenv("IMAP_FOLDER", "inbox")
+
+    # Outbound email queue (see app/core/email.py)
+    EMAIL_QUEUE_BATCH_SIZE: int = int(os.getenv("EMAIL_QUEUE_BATCH_SIZE", 20))
+    EMAIL_QUEUE_POLL_SECONDS: int = int(os.getenv("EMAIL_QUEUE_POLL_SECONDS", 15))
+    EMAIL_QUEUE_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_QUEUE_MAX_ATTEMPTS", 8))
+    EMAIL_QUEUE_RETRY_BASE_SECONDS: int = int(os.getenv("EMAIL_QUEUE_RETRY_BASE_SECONDS", 30))
     
     # Supabase PostgreSQL URI (IPv4 Transaction Pooler) or Local SQLite fallback
     DATABASE_URL: str = os.getenv(
@@ -25,9 +31,69 @@ class Settings(BaseSettings):
         "sqlite:///./pumps.db" # Default safely to local sqlite
     ).strip()
 
+    # Connection Pool (see app/core/db.py)
+    # Per-process budget shared by the sync and async engines: each worker opens at most
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW connections in total (at least one pooled connection per engine)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    # Share of that budget given to the async engine (CRUD routers); the sync engine keeps the rest
+    DB_ASYNC_POOL_SHARE: float = float(os.getenv("DB_ASYNC_POOL_SHARE", 0.5))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Set when DATABASE_URL points at pgbouncer in transaction mode (auto-detected for Supabase port 6543)
+    DB_PGBOUNCER_TRANSACTION_MODE: bool = os.getenv("DB_PGBOUNCER_TRANSACTION_MODE", "false").lower() == "true"
+    # Skip the app-side pool entirely and open one connection per checkout through the external pooler
+    DB_DISABLE_POOL: bool = os.getenv("DB_DISABLE_POOL", "false").lower() == "true"
+
     # Stripe Configuration
     STRIPE_API_KEY: str = os.getenv("STRIPE_API_KEY", "")
     STRIPE_WEBHOOK_SECRET: str = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+    # Stripe event processing worker (see app/core/stripe_events.py)
+    STRIPE_EVENT_POLL_SECONDS: int = int(os.getenv("STRIPE_EVENT_POLL_SECONDS", 30))
+    STRIPE_EVENT_MAX_ATTEMPTS: int = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", 5))
+    STRIPE_EVENT_RETRY_BASE_SECONDS: int = int(os.getenv("STRIPE_EVENT_RETRY_BASE_SECONDS", 30))
+
+    # Admin KPI metrics (see app/core/metrics.py)
+    METRICS_FLUSH_INTERVAL_SECONDS: int = int(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", 30))
+    COUNTERS_RECONCILE_INTERVAL_MINUTES: int = int(os.getenv("COUNTERS_RECONCILE_INTERVAL_MINUTES", 60))
+
+    # Authenticated principal cache (see app/core/auth_cache.py)
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+    # Precompressed per-user responses, e.g. CustomFluid lists (see app/core/precompressed.py)
+    PRECOMPRESSED_CACHE_MAX_ENTRIES: int = int(os.getenv("PRECOMPRESSED_CACHE_MAX_ENTRIES", 2000))
+
+    # Bulk pump catalog import (see app/core/pump_import.py)
+    PUMP_IMPORT_CHUNK_SIZE: int = int(os.getenv("PUMP_IMPORT_CHUNK_SIZE", 1000))
+    PUMP_IMPORT_MAX_ERRORS: int = int(os.getenv("PUMP_IMPORT_MAX_ERRORS", 1000))
+    PUMP_IMPORT_MAX_BYTES: int = int(os.getenv("PUMP_IMPORT_MAX_BYTES", 50 * 1024 * 1024))
+
+    # Response compression (see app/core/compression.py)
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+
+    # Subscription expiry sweeper (see app/core/subscriptions.py)
+    SUBSCRIPTION_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("SUBSCRIPTION_SWEEP_INTERVAL_SECONDS", 300))
+
+    # SystemLog retention (see app/core/log_retention.py)
+    LOG_RETENTION_DAYS: int = int(os.getenv("LOG_RETENTION_DAYS", 30))
+    LOG_RETENTION_BATCH_SIZE: int = int(os.getenv("LOG_RETENTION_BATCH_SIZE", 5000))
+    LOG_RETENTION_INTERVAL_MINUTES: int = int(os.getenv("LOG_RETENTION_INTERVAL_MINUTES", 60))
+
+    # Bulk scenario recalculation (see app/core/recalculation.py)
+    RECALC_CHUNK_SIZE: int = int(os.getenv("RECALC_CHUNK_SIZE", 200))
+    RECALC_WORKERS: int = int(os.getenv("RECALC_WORKERS", max((os.cpu_count() or 2) - 1, 1)))
+    RECALC_POLL_SECONDS: int = int(os.getenv("RECALC_POLL_SECONDS", 30))
+
+    # Pipe diameter optimization (see app/api/v1/calculate.py /optimize-diameters)
+    DIAMETER_OPT_WORKERS: int = int(os.getenv("DIAMETER_OPT_WORKERS", max((os.cpu_count() or 2) - 1, 1)))
+    DIAMETER_OPT_POOL_MIN_COMBINATIONS: int = int(os.getenv("DIAMETER_OPT_POOL_MIN_COMBINATIONS", 1_000_000))
+
+    # Monte Carlo operating point analysis (see app/api/v1/calculate.py /operating-point/uncertainty)
+    UNCERTAINTY_MAX_SAMPLES: int = int(os.getenv("UNCERTAINTY_MAX_SAMPLES", 100_000))
 
     @field_validator("DATABASE_URL", mode="before")
     @classmethod
@@ -1,12 +1,191 @@
+import threading
+import time
+import uuid
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app.models import User, Invite, Project, Scenario, CustomFluid, Pump # Import models to register with SQLModel
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+# --- Connection Pool Metrics ---
+# Time spent waiting for a pooled connection, per engine, exposed on the admin KPIs (see get_pool_stats)
+
+_pool_stats_lock = threading.Lock()
+_pool_stats = {
+    name: {"checkouts": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0, "timeouts": 0}
+    for name in ("sync", "async")
+}
+
+def _record_checkout(engine_name: str, wait_ms: float, timed_out: bool) -> None:
+    with _pool_stats_lock:
+        stats = _pool_stats[engine_name]
+        if timed_out:
+            stats["timeouts"] += 1
+            return
+        stats["checkouts"] += 1
+        stats["total_wait_ms"] += wait_ms
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+class _TimedCheckout:
+    """Pool mixin that measures how long each checkout waits for a free connection."""
+    engine_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            _record_checkout(self.engine_name, (time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        _record_checkout(self.engine_name, (time.perf_counter() - start) * 1000, timed_out=False)
+        return connection
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    engine_name = "sync"
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    # The async queue waits through the event loop, so wall time still measures the wait
+    engine_name = "async"
+
+def _is_sqlite_memory(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+def _is_pgbouncer_transaction_mode(url: str) -> bool:
+    # Supabase exposes the transaction pooler on port 6543
+    return settings.DB_PGBOUNCER_TRANSACTION_MODE or ":6543/" in url
+
+def _pool_budget(is_async: bool) -> tuple:
+    """
+    (pool_size, max_overflow) of one engine: DB_POOL_SIZE / DB_MAX_OVERFLOW are split between the
+    sync and async engines by DB_ASYNC_POOL_SHARE, so together they stay within the configured budget.
+    """
+    share = min(max(settings.DB_ASYNC_POOL_SHARE, 0.0), 1.0)
+    async_size = min(max(round(settings.DB_POOL_SIZE * share), 1), max(settings.DB_POOL_SIZE - 1, 1))
+    async_overflow = round(settings.DB_MAX_OVERFLOW * share)
+    if is_async:
+        return async_size, async_overflow
+    return max(settings.DB_POOL_SIZE - async_size, 1), settings.DB_MAX_OVERFLOW - async_overflow
+
+def _engine_kwargs(url: str, is_async: bool = False) -> dict:
+    pool_size, max_overflow = _pool_budget(is_async)
+    pool_class = TimedAsyncQueuePool if is_async else TimedQueuePool
+    if url.startswith("sqlite"):
+        if _is_sqlite_memory(url):
+            return {"connect_args": {"check_same_thread": False}}
+        return {
+            "connect_args": {"check_same_thread": False, "timeout": settings.DB_POOL_TIMEOUT},
+            "poolclass": pool_class,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+
+    if settings.DB_DISABLE_POOL:
+        # Let an external pooler (pgbouncer / Supabase pooler) own every connection
+        return {"poolclass": NullPool, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+
+    kwargs = {
+        "poolclass": pool_class,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if _is_pgbouncer_transaction_mode(url):
+        # The pooler closes idle client connections on its own: recycle ours before it does.
+        # (psycopg2 uses no server-side prepared statements, so nothing else breaks in transaction mode.)
+        kwargs["pool_recycle"] = min(settings.DB_POOL_RECYCLE_SECONDS, 300)
+    return kwargs
+
+def _configure_sqlite(engine) -> None:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")   # readers don't block the writer
+        cursor.execute("PRAGMA synchronous=NORMAL") # safe with WAL, far fewer fsyncs
+        cursor.execute(f"PRAGMA busy_timeout={settings.DB_POOL_TIMEOUT * 1000}")
+        cursor.close()
+
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
+if settings.DATABASE_URL.startswith("sqlite") and not _is_sqlite_memory(settings.DATABASE_URL):
+    _configure_sqlite(engine)
+
+# --- Async Engine ---
+# Used by the I/O-bound CRUD routers so they wait on the database from the event loop
+# instead of holding a threadpool slot (shared with the CPU-bound /calculate endpoints).
+
+def _async_url(url: str):
+    async_url = make_url(url)
+    if async_url.drivername.startswith("sqlite"):
+        return async_url.set(drivername="sqlite+aiosqlite"), {}
+    # asyncpg takes "ssl" instead of libpq's "sslmode"
+    query = dict(async_url.query)
+    connect_args = {}
+    sslmode = query.pop("sslmode", None)
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode
+    return async_url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+def _async_engine_kwargs(url: str) -> dict:
+    kwargs = _engine_kwargs(url, is_async=True)
+    _, connect_args = _async_url(url)
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {k: v for k, v in kwargs.get("connect_args", {}).items() if k != "check_same_thread"}
+        return kwargs
+    if _is_pgbouncer_transaction_mode(url):
+        # pgbouncer in transaction mode cannot keep named prepared statements between transactions
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        })
+    kwargs["connect_args"] = connect_args
+    return kwargs
+
+async_engine = create_async_engine(_async_url(settings.DATABASE_URL)[0], **_async_engine_kwargs(settings.DATABASE_URL))
+if settings.DATABASE_URL.startswith("sqlite") and not _is_sqlite_memory(settings.DATABASE_URL):
+    _configure_sqlite(async_engine.sync_engine)
+
+def get_pool_stats() -> dict:
+    """Checkout waits and current pool usage of the sync and async engines."""
+    result = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        with _pool_stats_lock:
+            stats = dict(_pool_stats[name])
+        stats["avg_wait_ms"] = round(stats["total_wait_ms"] / stats["checkouts"], 3) if stats["checkouts"] else 0.0
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "idle": pool.checkedin(),
+            })
+        result[name] = stats
+    return result
 
 def create_db_and_tables():
+    from app.core.pump_search import ensure_pump_search_index
     SQLModel.metadata.create_all(engine)
+    ensure_pump_search_index(engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+def dialect_insert(table):
+    """INSERT construct with on_conflict_do_update() support for the configured database (Postgres or SQLite)."""
+    if engine.dialect.name == "postgresql":
+        return pg_insert(table)
+    return sqlite_insert(table)
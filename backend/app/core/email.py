@@ -1,56 +1,232 @@
-import os
-from pathlib import Path
+import asyncio
+from datetime import datetime, timedelta
 from email.message import EmailMessage
+from typing import List, Optional
 import aiosmtplib
+from sqlmodel import Session, select, update
 from app.core.config import settings
+from app.core.db import engine
+from app.models import OutboundEmail
 
-async def send_email(
+# --- Outbound Email Queue ---
+# Request handlers only add an OutboundEmail row (ideally in the same transaction as the change
+# that triggered it). email_sender_task delivers the queue over one reused SMTP connection,
+# retrying failures with exponential backoff.
+
+# Rows stuck in "sending" longer than this (worker crashed mid-batch) are retried
+STALE_CLAIM_AFTER = timedelta(minutes=10)
+
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def build_outbound_email(
     email_to: str,
     subject: str,
     text_content: str,
     reply_to: str | None = None,
-    headers: dict | None = None
+    headers: dict | None = None,
+    from_address: str | None = None
+) -> OutboundEmail:
+    """
+    Creates the queue row without saving it, so the caller can add it to its own session/transaction.
+    """
+    return OutboundEmail(
+        email_to=email_to,
+        subject=subject,
+        text_content=text_content,
+        reply_to=reply_to,
+        headers=headers or {},
+        from_address=from_address
+    )
+
+def enqueue_email(
+    email_to: str,
+    subject: str,
+    text_content: str,
+    reply_to: str | None = None,
+    headers: dict | None = None,
+    from_address: str | None = None,
+    session: Session | None = None
 ) -> None:
     """
-    Asynchronously sends an email using SMTP.
-    If reply_to is provided, it sets the Reply-To header.
+    Queues an email for the background sender. With `session`, the row is only added
+    (committed together with the caller's changes); otherwise it is committed right away.
     """
-    if not settings.SMTP_PASSWORD:
-        print("SMTP_PASSWORD not set. Email not sent.")
-        print(f"Subject: {subject}")
-        print(f"To: {email_to}")
-        print(text_content)
+    outbound = build_outbound_email(email_to, subject, text_content, reply_to, headers, from_address)
+    if session is not None:
+        session.add(outbound)
+        return
+    with Session(engine) as db:
+        db.add(outbound)
+        db.commit()
+    notify_email_sender()
+
+def notify_email_sender() -> None:
+    """Wakes the sender up so queued emails go out now instead of at the next poll. Safe from any thread."""
+    if _loop is None or _wakeup is None:
         return
+    try:
+        _loop.call_soon_threadsafe(_wakeup.set)
+    except RuntimeError:
+        pass # loop already closed
 
+def _build_message(outbound: OutboundEmail) -> EmailMessage:
     message = EmailMessage()
-    message["From"] = f"{settings.EMAILS_FROM_NAME} <{settings.EMAILS_FROM_EMAIL}>"
-    message["To"] = email_to
-    message["Subject"] = subject
-    
-    if headers:
-        for k, v in headers.items():
-            message[k] = v
-    
-    if reply_to:
-        message["Reply-To"] = reply_to
-        
-    message.set_content(text_content)
-
-    print(f"Connecting to SMTP {settings.SMTP_HOST}:{settings.SMTP_PORT} as {settings.SMTP_USER}")
+    message["From"] = outbound.from_address or f"{settings.EMAILS_FROM_NAME} <{settings.EMAILS_FROM_EMAIL}>"
+    message["To"] = outbound.email_to
+    message["Subject"] = outbound.subject
 
-    try:
-        use_tls_flag = getattr(settings, "SMTP_PORT", 587) == 465
-        start_tls_flag = not use_tls_flag
+    for k, v in (outbound.headers or {}).items():
+        message[k] = v
+
+    if outbound.reply_to:
+        message["Reply-To"] = outbound.reply_to
+
+    message.set_content(outbound.text_content)
+    return message
 
-        await aiosmtplib.send(
-            message,
+def _claim_batch(limit: int) -> List[OutboundEmail]:
+    """
+    Marks up to `limit` due emails as "sending" and returns them. The conditional UPDATE per row
+    means two sender processes never claim the same email.
+    """
+    now = datetime.utcnow()
+    claimed = []
+    with Session(engine, expire_on_commit=False) as db:
+        db.exec(
+            update(OutboundEmail)
+            .where(OutboundEmail.status == "sending", OutboundEmail.claimed_at < now - STALE_CLAIM_AFTER)
+            .values(status="pending")
+        )
+        candidates = db.exec(
+            select(OutboundEmail.id)
+            .where(OutboundEmail.status == "pending", OutboundEmail.next_attempt_at <= now)
+            .order_by(OutboundEmail.id)
+            .limit(limit)
+        ).all()
+        for email_id in candidates:
+            result = db.exec(
+                update(OutboundEmail)
+                .where(OutboundEmail.id == email_id, OutboundEmail.status == "pending")
+                .values(status="sending", claimed_at=now)
+            )
+            if result.rowcount == 1:
+                claimed.append(email_id)
+        db.commit()
+        if not claimed:
+            return []
+        return db.exec(select(OutboundEmail).where(OutboundEmail.id.in_(claimed)).order_by(OutboundEmail.id)).all()
+
+def _record_results(sent_ids: List[int], failures: List[tuple]) -> None:
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        if sent_ids:
+            db.exec(
+                update(OutboundEmail)
+                .where(OutboundEmail.id.in_(sent_ids))
+                .values(status="sent", sent_at=now, last_error=None)
+            )
+        for email_id, attempts, error in failures:
+            if attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+                values = {"status": "failed", "attempts": attempts, "last_error": error}
+            else:
+                delay = settings.EMAIL_QUEUE_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+                values = {
+                    "status": "pending",
+                    "attempts": attempts,
+                    "last_error": error,
+                    "next_attempt_at": now + timedelta(seconds=min(delay, 6 * 3600))
+                }
+            db.exec(update(OutboundEmail).where(OutboundEmail.id == email_id).values(**values))
+        db.commit()
+
+class SMTPConnection:
+    """Keeps one authenticated SMTP connection open between batches and reconnects when it drops."""
+
+    def __init__(self):
+        self.client: Optional[aiosmtplib.SMTP] = None
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        use_tls_flag = getattr(settings, "SMTP_PORT", 587) == 465
+        print(f"Connecting to SMTP {settings.SMTP_HOST}:{settings.SMTP_PORT} as {settings.SMTP_USER}")
+        client = aiosmtplib.SMTP(
             hostname=settings.SMTP_HOST,
             port=settings.SMTP_PORT,
-            username=settings.SMTP_USER,
-            password=settings.SMTP_PASSWORD,
             use_tls=use_tls_flag,
-            start_tls=start_tls_flag,
+            start_tls=not use_tls_flag,
         )
-        print(f"Email sent successfully to {email_to}")
-    except Exception as e:
-        print(f"Error sending email: {e}")
+        await client.connect()
+        await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return client
+
+    async def send(self, message: EmailMessage) -> None:
+        if self.client is None or not self.client.is_connected:
+            self.client = await self._connect()
+        try:
+            await self.client.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError):
+            # Server closed the idle connection: reconnect once and retry
+            await self.close()
+            self.client = await self._connect()
+            await self.client.send_message(message)
+
+    async def close(self) -> None:
+        if self.client is not None:
+            try:
+                await self.client.quit()
+            except Exception:
+                pass
+            self.client = None
+
+async def deliver_batch(connection: SMTPConnection) -> int:
+    """Sends one batch of due emails. Returns how many were claimed."""
+    batch = await asyncio.to_thread(_claim_batch, settings.EMAIL_QUEUE_BATCH_SIZE)
+    if not batch:
+        return 0
+
+    sent_ids, failures = [], []
+    for outbound in batch:
+        if not settings.SMTP_PASSWORD:
+            print("SMTP_PASSWORD not set. Email not sent.")
+            print(f"Subject: {outbound.subject}")
+            print(f"To: {outbound.email_to}")
+            print(outbound.text_content)
+            sent_ids.append(outbound.id)
+            continue
+        try:
+            await connection.send(_build_message(outbound))
+            print(f"Email sent successfully to {outbound.email_to}")
+            sent_ids.append(outbound.id)
+        except Exception as e:
+            print(f"Error sending email: {e}")
+            await connection.close()
+            failures.append((outbound.id, outbound.attempts + 1, str(e)[:500]))
+
+    await asyncio.to_thread(_record_results, sent_ids, failures)
+    return len(batch)
+
+async def email_sender_task():
+    """Background task that drains the outbound email queue"""
+    global _wakeup, _loop
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    print("Starting Email Sender Background Task...")
+
+    connection = SMTPConnection()
+    while True:
+        try:
+            claimed = await deliver_batch(connection)
+            if claimed >= settings.EMAIL_QUEUE_BATCH_SIZE:
+                continue # more emails are probably due
+        except Exception as e:
+            print(f"Error in Email Sender iteration: {e}")
+            await connection.close()
+
+        # Idle: close the connection rather than let the server time it out, then wait for new work
+        if connection.client is not None and not _wakeup.is_set():
+            await connection.close()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.EMAIL_QUEUE_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
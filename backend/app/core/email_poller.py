@@ -1,17 +1,24 @@
 import imaplib
 import email
+import hashlib
 from email.header import decode_header
 import re
 import asyncio
 from datetime import datetime, timedelta
+from typing import List, Optional
 from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from app.core.config import settings
 from app.core.db import engine
-from app.models import SupportTicket, TicketMessage
-from app.core.email import send_email
+from app.models import SupportTicket, TicketMessage, MailboxState, ProcessedEmail
+from app.core.email import build_outbound_email, notify_email_sender
 
 IMAP_SERVER = "imap.gmail.com"
 
+# Only these headers are downloaded for every new message; bodies are fetched for ticket replies only
+HEADER_FIELDS = "(BODY.PEEK[HEADER.FIELDS (SUBJECT FROM MESSAGE-ID X-PUMPS-NOTIFICATION)])"
+
 def connect_to_imap():
     if not settings.SMTP_PASSWORD:
         return None
@@ -23,133 +30,231 @@ def connect_to_imap():
         print(f"Failed to connect to IMAP: {e}")
         return None
 
-async def poll_support_emails():
+def _decode_subject(raw_subject) -> str:
+    if not raw_subject:
+        return ""
+    subject, encoding = decode_header(raw_subject)[0]
+    if isinstance(subject, bytes):
+        subject = subject.decode(encoding if encoding else "utf-8")
+    return subject
+
+def _extract_reply_text(msg) -> str:
+    # Extract text body
+    body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition"))
+            try:
+                if content_type == "text/plain" and "attachment" not in content_disposition:
+                    body = part.get_payload(decode=True).decode()
+                    break
+            except:
+                pass
+    else:
+        body = msg.get_payload(decode=True).decode()
+
+    # Clean up body to remove previous quoted emails
+    reply_text = body.split("\r\n\r\n> ")[0]
+    reply_text = reply_text.split("Em ")[0] # Basic Portuguese Gmail quote detection
+    reply_text = reply_text.split("On ")[0] # English quote detection
+    return reply_text.strip()
+
+def _fetch_parts(mail, uids: List[bytes], query: str) -> dict:
+    """UID FETCH for a batch of messages. Returns {uid: raw bytes}."""
+    if not uids:
+        return {}
+    status, data = mail.uid("fetch", b",".join(uids), query)
+    if status != "OK":
+        return {}
+    parts = {}
+    for response_part in data:
+        if isinstance(response_part, tuple):
+            match = re.search(rb"UID (\d+)", response_part[0])
+            if match:
+                parts[match.group(1)] = response_part[1]
+    return parts
+
+def _load_state(db: Session, uidvalidity: int) -> Optional[MailboxState]:
+    state = db.get(MailboxState, settings.IMAP_FOLDER)
+    if state and state.uidvalidity != uidvalidity:
+        # The mailbox was rebuilt: previous UIDs mean nothing anymore
+        return None
+    return state
+
+def _message_key(message_id: str, ticket_id: int, sender: str, reply_text: str) -> str:
+    if message_id:
+        return message_id.strip()
+    digest = hashlib.sha256(f"{ticket_id}\n{sender}\n{reply_text}".encode("utf-8")).hexdigest()
+    return f"sha256:{digest}"
+
+def _save_replies(replies: List[dict], check_legacy_duplicates: bool) -> int:
+    """
+    Stores a poll cycle's ticket replies in one session. Deduplication goes through the
+    ProcessedEmail ledger (unique message_key), one savepoint per reply so a key inserted
+    concurrently by another worker only skips that reply. Admin replies queue their
+    forward to the user in the same savepoint. Returns how many emails were queued.
+    """
+    if not replies:
+        return 0
+
+    queued = 0
+    with Session(engine) as db:
+        keys = [r["message_key"] for r in replies]
+        processed = set(db.exec(select(ProcessedEmail.message_key).where(ProcessedEmail.message_key.in_(keys))).all())
+
+        ticket_ids = {r["ticket_id"] for r in replies}
+        tickets = {
+            t.id: t for t in db.exec(
+                select(SupportTicket).where(SupportTicket.id.in_(ticket_ids)).options(selectinload(SupportTicket.user))
+            ).all()
+        }
+
+        for reply in replies:
+            if reply["message_key"] in processed:
+                continue
+            ticket = tickets.get(reply["ticket_id"])
+            if not ticket:
+                continue
+            # Determine if reply is from user or admin
+            # If user's email is in the From header, it's the user
+            sender_type = "user" if ticket.user.email in reply["sender"] else "admin"
+
+            # Emails saved before the ledger existed can come back once while bootstrapping the UID tracking
+            if check_legacy_duplicates and db.exec(
+                select(TicketMessage.id).where(
+                    TicketMessage.ticket_id == ticket.id,
+                    TicketMessage.message == reply["reply_text"],
+                    TicketMessage.sender_type == sender_type
+                )
+            ).first():
+                continue
+
+            try:
+                with db.begin_nested():
+                    db.add(ProcessedEmail(message_key=reply["message_key"], ticket_id=ticket.id))
+                    db.add(TicketMessage(ticket_id=ticket.id, sender_type=sender_type, message=reply["reply_text"]))
+                    if sender_type == "admin":
+                        ticket.status = "closed"
+                        db.add(ticket)
+                        # If the reply was sent by the Admin, forward it back to the User's email!
+                        db.add(build_outbound_email(
+                            email_to=ticket.user.email,
+                            subject=f"Re: [Ticket #{ticket.id}] {ticket.subject}",
+                            text_content=f"Você recebeu uma resposta da equipe de suporte:\n\n{reply['reply_text']}\n\n--\nPumps SaaS",
+                            reply_to=settings.EMAILS_FROM_EMAIL,
+                            headers={"X-Pumps-Notification": "System-Reply"}
+                        ))
+            except IntegrityError:
+                # Already processed by another worker
+                continue
+            processed.add(reply["message_key"])
+            if sender_type == "admin":
+                queued += 1
+        db.commit()
+    return queued
+
+def poll_support_emails() -> int:
     """
-    Connects to the support inbox, looks for unread emails 
-    matching the Support Reply pattern, extracts the reply, 
-    and saves it to the database as an Admin message.
+    Connects to the support inbox, fetches only the messages that arrived since the last
+    processed UID, and saves replies matching the Support Reply pattern as ticket messages.
+    Blocking (imaplib): run it in a worker thread. Returns how many notification emails were queued.
     """
     mail = connect_to_imap()
     if not mail:
-        return
-
-    mail.select(settings.IMAP_FOLDER)
-    
-    # Due to Gmail's auto-read behavior when replying from an alias, 
-    # we search for recent emails rather than solely 'UNSEEN' and deduplicate them in the DB.
-    date_since = (datetime.now() - timedelta(days=2)).strftime("%d-%b-%Y")
-    status, messages = mail.search(None, f'(SINCE "{date_since}")')
-    
-    if status != "OK":
-        mail.logout()
-        return
-
-    email_ids = messages[0].split()
-    
-    for email_id in email_ids:
-        res, msg_data = mail.fetch(email_id, '(RFC822)')
-        mark_as_read = True
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-                
-                if msg.get("X-Pumps-Notification"):
-                    if msg.get("X-Pumps-Notification") == "Original":
-                        # Leave the original ticket notification UNREAD for the Admin to see
-                        mark_as_read = False
-                    continue
-                
-                subject, encoding = decode_header(msg["Subject"])[0]
-                if isinstance(subject, bytes):
-                    subject = subject.decode(encoding if encoding else "utf-8")
-                
-                # Check if subject matches [Ticket #X]
-                match = re.search(r'\[Ticket #(\d+)\]', subject)
-                if not match:
-                    # Ignore non-ticket emails
-                    continue
-                    
-                ticket_id = int(match.group(1))
-                
-                # Extract text body
-                body = ""
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        content_type = part.get_content_type()
-                        content_disposition = str(part.get("Content-Disposition"))
-                        try:
-                            if content_type == "text/plain" and "attachment" not in content_disposition:
-                                body = part.get_payload(decode=True).decode()
-                                break
-                        except:
-                            pass
-                else:
-                    body = msg.get_payload(decode=True).decode()
-                    
-                # Clean up body to remove previous quoted emails
-                reply_text = body.split("\r\n\r\n> ")[0]
-                reply_text = reply_text.split("Em ")[0] # Basic Portuguese Gmail quote detection
-                reply_text = reply_text.split("On ")[0] # English quote detection
-                reply_text = reply_text.strip()
-                
-                # Identify sender
-                sender = str(msg.get("From", ""))
-                
-                # Save to database
-                with Session(engine) as db:
-                    ticket = db.get(SupportTicket, ticket_id)
-                    if ticket:
-                        # Determine if reply is from user or admin
-                        # If user's email is in the From header, it's the user
-                        sender_type = "user" if ticket.user.email in sender else "admin"
-
-                        # Deduplication check: Has this exact message been saved already?
-                        existing_msg = db.exec(
-                            select(TicketMessage).where(
-                                TicketMessage.ticket_id == ticket.id,
-                                TicketMessage.message == reply_text,
-                                TicketMessage.sender_type == sender_type
-                            )
-                        ).first()
-
-                        if existing_msg:
-                            # We already processed this email previously. Skip it safely.
-                            continue
-
-                        new_msg = TicketMessage(
-                            ticket_id=ticket.id,
-                            sender_type=sender_type,
-                            message=reply_text
-                        )
-                        db.add(new_msg)
-                        
-                        if sender_type == "admin":
-                            ticket.status = "closed"
-                            db.add(ticket)
-                            
-                        db.commit()
-                        
-                        # If the reply was sent by the Admin, forward it back to the User's email!
-                        if sender_type == "admin":
-                            asyncio.create_task(send_email(
-                                email_to=ticket.user.email,
-                                subject=f"Re: [Ticket #{ticket.id}] {ticket.subject}",
-                                text_content=f"Você recebeu uma resposta da equipe de suporte:\n\n{reply_text}\n\n--\nPumps SaaS",
-                                reply_to=settings.EMAILS_FROM_EMAIL,
-                                headers={"X-Pumps-Notification": "System-Reply"}
-                            ))
-        
+        return 0
+
+    queued = 0
+    try:
+        status, _ = mail.select(settings.IMAP_FOLDER)
+        if status != "OK":
+            return 0
+        _, uidvalidity_data = mail.response("UIDVALIDITY")
+        uidvalidity = int(uidvalidity_data[0])
+
+        with Session(engine) as db:
+            state = _load_state(db, uidvalidity)
+            last_uid = state.last_uid if state else 0
+
+        if state:
+            # "UID n:*" always returns the newest message, even when it is older than n
+            status, messages = mail.uid("search", None, f"UID {last_uid + 1}:*")
+        else:
+            # First run (or UIDVALIDITY changed): bootstrap from recent emails and rely on DB deduplication.
+            # Due to Gmail's auto-read behavior when replying from an alias, we don't rely on 'UNSEEN'.
+            date_since = (datetime.now() - timedelta(days=2)).strftime("%d-%b-%Y")
+            status, messages = mail.uid("search", None, f'(SINCE "{date_since}")')
+
+        if status != "OK":
+            return 0
+
+        uids = [uid for uid in messages[0].split() if int(uid) > last_uid]
+        if not uids:
+            return 0
+
+        # 1) Headers only, for every new message
+        headers = _fetch_parts(mail, uids, HEADER_FIELDS)
+        ticket_uids = {}
+        mark_as_read = []
+        for uid in uids:
+            raw = headers.get(uid)
+            if raw is None:
+                continue
+            msg = email.message_from_bytes(raw)
+            notification_header = msg.get("X-Pumps-Notification")
+            if notification_header:
+                if notification_header != "Original":
+                    mark_as_read.append(uid)
+                # Leave the original ticket notification UNREAD for the Admin to see
+                continue
+            mark_as_read.append(uid)
+
+            # Check if subject matches [Ticket #X]
+            match = re.search(r'\[Ticket #(\d+)\]', _decode_subject(msg["Subject"]))
+            if match:
+                ticket_uids[uid] = (int(match.group(1)), str(msg.get("From", "")), str(msg.get("Message-ID", "")))
+
+        # 2) Full bodies only for ticket replies, all saved in one session
+        bodies = _fetch_parts(mail, list(ticket_uids.keys()), "(BODY.PEEK[])")
+        replies = []
+        for uid, (ticket_id, sender, message_id) in ticket_uids.items():
+            raw = bodies.get(uid)
+            if raw is None:
+                continue
+            reply_text = _extract_reply_text(email.message_from_bytes(raw))
+            replies.append({
+                "ticket_id": ticket_id,
+                "sender": sender,
+                "reply_text": reply_text,
+                "message_key": _message_key(message_id, ticket_id, sender, reply_text),
+            })
+        queued = _save_replies(replies, check_legacy_duplicates=state is None)
+
         if mark_as_read:
-            mail.store(email_id, '+FLAGS', '\Seen')
+            mail.uid("store", b",".join(mark_as_read), "+FLAGS", "(\\Seen)")
+
+        with Session(engine) as db:
+            state = _load_state(db, uidvalidity) or MailboxState(folder=settings.IMAP_FOLDER, uidvalidity=uidvalidity)
+            state.uidvalidity = uidvalidity
+            state.last_uid = max(int(uid) for uid in uids)
+            state.updated_at = datetime.utcnow()
+            db.merge(state)
+            db.commit()
+    finally:
+        try:
+            mail.logout()
+        except Exception:
+            pass
 
-    mail.logout()
+    return queued
 
 async def email_poller_task():
-    """Background task string that loops infinitely"""
+    """Background task that loops infinitely; the blocking IMAP work runs in a worker thread"""
     print("Starting IMAP Poller Background Task...")
     while True:
         try:
-            await poll_support_emails()
+            if await asyncio.to_thread(poll_support_emails):
+                notify_email_sender()
         except Exception as e:
             print(f"Error in IMAP Polling iteration: {e}")
         await asyncio.sleep(60) # Poll every 60 seconds
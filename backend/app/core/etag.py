@@ -0,0 +1,24 @@
+import hashlib
+from typing import Optional
+
+# --- HTTP Conditional Requests ---
+# Strong ETags for read endpoints whose payload only changes with a known version
+# (e.g. an immutable row), so a 304 can be answered without loading the payload.
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if the If-None-Match header lists `etag` (weak comparison, as RFC 9110 requires for GET)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
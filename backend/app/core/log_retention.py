@@ -0,0 +1,153 @@
+import asyncio
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import case, delete
+from sqlmodel import Session, select, text
+
+from app.core.config import settings
+from app.core.db import engine, dialect_insert
+from app.models import SystemLog, SystemLogRollup
+
+# --- SystemLog Retention ---
+# Raw SystemLog rows older than LOG_RETENTION_DAYS are folded into daily SystemLogRollup rows
+# (per endpoint and status code) and deleted in batches, so the raw table stays bounded.
+# On Postgres the table is range-partitioned by month (see the Alembic migration); the job also
+# creates upcoming partitions and drops partitions that fall entirely before the retention window.
+
+PARTITION_NAME_RE = re.compile(r"^systemlog_p(\d{4})(\d{2})$")
+
+def _rollup_key(log_row) -> Tuple[datetime, str, int]:
+    bucket_start = log_row.created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return bucket_start, log_row.endpoint, log_row.status_code
+
+def _upsert_rollups(session: Session, rollups: Dict[Tuple[datetime, str, int], List[float]]) -> None:
+    table = SystemLogRollup.__table__
+    for (bucket_start, endpoint, status_code), values in rollups.items():
+        stmt = dialect_insert(table).values(
+            bucket_start=bucket_start,
+            endpoint=endpoint,
+            status_code=status_code,
+            request_count=int(values[0]),
+            total_response_time_ms=values[1],
+            max_response_time_ms=values[2],
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["bucket_start", "endpoint", "status_code"],
+            set_={
+                "request_count": table.c.request_count + stmt.excluded.request_count,
+                "total_response_time_ms": table.c.total_response_time_ms + stmt.excluded.total_response_time_ms,
+                "max_response_time_ms": case(
+                    (stmt.excluded.max_response_time_ms > table.c.max_response_time_ms, stmt.excluded.max_response_time_ms),
+                    else_=table.c.max_response_time_ms,
+                ),
+            },
+        )
+        session.exec(stmt)
+
+def rollup_and_purge_logs(session: Session, retention_days: int, batch_size: int) -> int:
+    """
+    Aggregates and deletes SystemLog rows older than the retention window, one batch per transaction.
+    Rollup upsert and delete commit together, so an interrupted run never double counts.
+    Returns the number of raw rows removed.
+    """
+    cutoff = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=retention_days)
+    removed = 0
+    while True:
+        batch = session.exec(
+            select(SystemLog.id, SystemLog.endpoint, SystemLog.status_code, SystemLog.response_time_ms, SystemLog.created_at)
+            .where(SystemLog.created_at < cutoff)
+            .order_by(SystemLog.created_at)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+
+        rollups: Dict[Tuple[datetime, str, int], List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+        for row in batch:
+            values = rollups[_rollup_key(row)]
+            values[0] += 1
+            values[1] += row.response_time_ms
+            values[2] = max(values[2], row.response_time_ms)
+
+        _upsert_rollups(session, rollups)
+        session.exec(delete(SystemLog).where(SystemLog.id.in_([row.id for row in batch])))
+        session.commit()
+        removed += len(batch)
+
+        if len(batch) < batch_size:
+            break
+    return removed
+
+def _is_partitioned(session: Session) -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    return session.exec(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'systemlog'"
+    )).first() is not None
+
+def _month_start(d: datetime) -> datetime:
+    return d.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _next_month(d: datetime) -> datetime:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def maintain_partitions(session: Session, retention_days: int, months_ahead: int = 2) -> None:
+    """
+    Postgres only: creates the monthly partitions for the coming months and drops the ones
+    that end before the retention cutoff (already rolled up and emptied by rollup_and_purge_logs).
+    """
+    if not _is_partitioned(session):
+        return
+
+    month = _month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        name = f"systemlog_p{month:%Y%m}"
+        try:
+            session.exec(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF systemlog "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            ))
+            session.exec(text(f"ALTER TABLE {name} ENABLE ROW LEVEL SECURITY"))
+            session.commit()
+        except Exception as e:
+            # e.g. rows for that month already sit in the default partition
+            session.rollback()
+            print(f"Could not create partition {name}: {e}")
+        month = upper
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    partitions = session.exec(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'systemlog'"
+    )).all()
+    for (name,) in partitions:
+        match = PARTITION_NAME_RE.match(name)
+        if not match:
+            continue
+        upper = _next_month(datetime(int(match.group(1)), int(match.group(2)), 1))
+        if upper <= cutoff:
+            session.exec(text(f"DROP TABLE IF EXISTS {name}"))
+            session.commit()
+
+def run_log_retention() -> int:
+    with Session(engine) as session:
+        removed = rollup_and_purge_logs(session, settings.LOG_RETENTION_DAYS, settings.LOG_RETENTION_BATCH_SIZE)
+        maintain_partitions(session, settings.LOG_RETENTION_DAYS)
+    return removed
+
+async def log_retention_task():
+    """Background task that keeps SystemLog inside the retention window"""
+    print("Starting SystemLog Retention Background Task...")
+    while True:
+        try:
+            removed = await asyncio.to_thread(run_log_retention)
+            if removed:
+                print(f"SystemLog retention: rolled up and removed {removed} rows")
+        except Exception as e:
+            print(f"Error in SystemLog Retention iteration: {e}")
+        await asyncio.sleep(settings.LOG_RETENTION_INTERVAL_MINUTES * 60)
@@ -0,0 +1,289 @@
+import asyncio
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, inspect, insert, update, delete, case
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select, func, text
+
+from app.core.config import settings
+from app.core.db import engine, dialect_insert
+from app.models import User, Project, Scenario, SystemCounter, SystemCounterDelta, RequestMetricBucket
+
+# --- Incremental Counters ---
+# Totals shown on the admin dashboard. The ORM flush listener below appends each transaction's changes
+# to systemcounterdelta (an INSERT, so concurrent writers never wait on a shared counter row); the
+# background task folds those rows into systemcounter and periodically reconciles everything with a
+# real COUNT (covers bulk deletes, scripts and raw SQL).
+
+USERS_TOTAL = "users_total"
+USERS_ACTIVE = "users_active"
+PROJECTS_TOTAL = "projects_total"
+SCENARIOS_TOTAL = "scenarios_total"
+DB_SIZE_BYTES = "db_size_bytes"
+
+# Set when a committed transaction changed some user's is_active; the next fold recounts active users
+_active_recount = threading.Event()
+_RECOUNT_ACTIVE_KEY = "metrics_recount_active"
+
+def _add(deltas: Dict[str, int], obj, sign: int) -> None:
+    if isinstance(obj, User):
+        deltas[USERS_TOTAL] += sign
+        if obj.is_active:
+            deltas[USERS_ACTIVE] += sign
+    elif isinstance(obj, Project):
+        deltas[PROJECTS_TOTAL] += sign
+    elif isinstance(obj, Scenario):
+        deltas[SCENARIOS_TOTAL] += sign
+
+@event.listens_for(SASession, "after_flush")
+def _track_counter_deltas(session, flush_context):
+    # new/deleted/dirty still show the pre-flush state here, so the deltas match what was just written
+    deltas: Dict[str, int] = defaultdict(int)
+    for obj in session.new:
+        _add(deltas, obj, 1)
+    for obj in session.deleted:
+        _add(deltas, obj, -1)
+    # The previous is_active value is often unknown (expired after commit), so toggles recount active users
+    # on the next fold. Blocking/unblocking is rare enough for this to be cheaper than loading the old value.
+    recount_active = any(
+        isinstance(obj, User) and inspect(obj).attrs.is_active.history.added
+        for obj in session.dirty
+    )
+
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if recount_active:
+        deltas.pop(USERS_ACTIVE, None)
+        session.info[_RECOUNT_ACTIVE_KEY] = True
+    if not deltas:
+        return
+
+    # Same connection/transaction as the flush: the deltas only exist if the rows are committed
+    now = datetime.utcnow()
+    session.connection().execute(
+        insert(SystemCounterDelta.__table__),
+        [{"name": name, "delta": delta, "created_at": now} for name, delta in deltas.items()]
+    )
+
+@event.listens_for(SASession, "after_commit")
+def _request_active_recount(session):
+    if session.info.pop(_RECOUNT_ACTIVE_KEY, False):
+        _active_recount.set()
+
+@event.listens_for(SASession, "after_rollback")
+def _drop_active_recount(session):
+    session.info.pop(_RECOUNT_ACTIVE_KEY, None)
+
+def fold_counter_deltas() -> int:
+    """
+    Adds the pending delta rows to their counters and removes them. Returns the number of rows folded.
+    """
+    recount_active = _active_recount.is_set()
+    _active_recount.clear()
+    deltas_table = SystemCounterDelta.__table__
+    table = SystemCounter.__table__
+    try:
+        with Session(engine) as session:
+            # DELETE ... RETURNING folds exactly the rows it removed, even while new ones are being inserted
+            folded = session.exec(delete(deltas_table).returning(deltas_table.c.name, deltas_table.c.delta)).all()
+            totals: Dict[str, int] = defaultdict(int)
+            for name, delta in folded:
+                totals[name] += delta
+            now = datetime.utcnow()
+            for name, delta in totals.items():
+                if delta:
+                    session.exec(
+                        update(table).where(table.c.name == name).values(value=table.c.value + delta, updated_at=now)
+                    )
+            if recount_active:
+                active_count = select(func.count(User.id)).where(User.is_active == True).scalar_subquery()
+                session.exec(update(table).where(table.c.name == USERS_ACTIVE).values(value=active_count, updated_at=now))
+            session.commit()
+    except Exception:
+        if recount_active:
+            _active_recount.set()
+        raise
+    return len(folded)
+
+def _database_size_bytes(session: Session) -> int:
+    if "postgres" in settings.DATABASE_URL:
+        return int(session.exec(text("SELECT pg_database_size(current_database())")).one()[0])
+    path_file = settings.DATABASE_URL.replace("sqlite:///", "")
+    # WAL mode keeps recent writes in the -wal file until the next checkpoint
+    return sum(os.path.getsize(p) for p in (path_file, f"{path_file}-wal") if os.path.exists(p))
+
+def _snapshot_engine():
+    # One snapshot for the whole transaction. Postgres READ COMMITTED takes a new one per statement;
+    # SQLite transactions are already serializable.
+    if engine.dialect.name == "postgresql":
+        return engine.execution_options(isolation_level="REPEATABLE READ")
+    return engine
+
+def reconcile_counters() -> Dict[str, int]:
+    """
+    Recomputes every counter with a real COUNT and stores it. Runs at startup and on a slow interval.
+    """
+    with Session(_snapshot_engine()) as session:
+        return _reconcile_counters(session)
+
+def _reconcile_counters(session: Session) -> Dict[str, int]:
+    # The counts include exactly the deltas this delete removes: both see the same snapshot. A delta
+    # committed later is neither deleted nor counted, and a concurrent fold makes one of the two
+    # transactions fail with a serialization error, so it is retried on the next cycle.
+    session.exec(delete(SystemCounterDelta.__table__))
+    _active_recount.clear()
+    values = {
+        USERS_TOTAL: session.exec(select(func.count(User.id))).one(),
+        USERS_ACTIVE: session.exec(select(func.count(User.id)).where(User.is_active == True)).one(),
+        PROJECTS_TOTAL: session.exec(select(func.count(Project.id))).one(),
+        SCENARIOS_TOTAL: session.exec(select(func.count(Scenario.id))).one(),
+    }
+    try:
+        values[DB_SIZE_BYTES] = _database_size_bytes(session)
+    except Exception as e:
+        print(f"Error reading database size: {e}")
+
+    now = datetime.utcnow()
+    for name, value in values.items():
+        counter = session.get(SystemCounter, name)
+        if counter is None:
+            counter = SystemCounter(name=name)
+        counter.value = value
+        counter.updated_at = now
+        session.add(counter)
+    session.commit()
+    return values
+
+def read_counters(session: Session) -> Dict[str, int]:
+    counters = {c.name: c.value for c in session.exec(select(SystemCounter)).all()}
+    if not counters:
+        return reconcile_counters()
+    # Add the deltas not folded yet (at most one flush interval's worth of rows)
+    pending = session.exec(
+        select(SystemCounterDelta.name, func.sum(SystemCounterDelta.delta)).group_by(SystemCounterDelta.name)
+    ).all()
+    for name, delta in pending:
+        counters[name] = counters.get(name, 0) + int(delta)
+    return counters
+
+# --- Request Metric Buckets ---
+# The middleware records every request in memory; a background task adds the totals to
+# hourly and daily rows, so the request path never writes to the DB for metrics.
+
+_pending_lock = threading.Lock()
+_pending: Dict[datetime, List[float]] = {} # hour_start -> [requests, errors, total_latency_ms, max_latency_ms]
+
+def record_request(latency_ms: float, is_error: bool) -> None:
+    hour_start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    with _pending_lock:
+        bucket = _pending.setdefault(hour_start, [0, 0, 0.0, 0.0])
+        bucket[0] += 1
+        bucket[1] += 1 if is_error else 0
+        bucket[2] += latency_ms
+        bucket[3] = max(bucket[3], latency_ms)
+
+def _upsert_bucket(session: Session, granularity: str, bucket_start: datetime, values: List[float]) -> None:
+    table = RequestMetricBucket.__table__
+    stmt = dialect_insert(table).values(
+        granularity=granularity,
+        bucket_start=bucket_start,
+        request_count=int(values[0]),
+        error_count=int(values[1]),
+        total_latency_ms=values[2],
+        max_latency_ms=values[3],
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket_start"],
+        set_={
+            "request_count": table.c.request_count + stmt.excluded.request_count,
+            "error_count": table.c.error_count + stmt.excluded.error_count,
+            "total_latency_ms": table.c.total_latency_ms + stmt.excluded.total_latency_ms,
+            "max_latency_ms": case(
+                (stmt.excluded.max_latency_ms > table.c.max_latency_ms, stmt.excluded.max_latency_ms),
+                else_=table.c.max_latency_ms,
+            ),
+        },
+    )
+    session.exec(stmt)
+
+def flush_request_metrics() -> int:
+    """
+    Moves the in-memory request totals into the hourly/daily bucket rows. Returns the number of hours flushed.
+    """
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return 0
+
+    daily: Dict[datetime, List[float]] = {}
+    for hour_start, values in pending.items():
+        day = daily.setdefault(hour_start.replace(hour=0), [0, 0, 0.0, 0.0])
+        day[0] += values[0]
+        day[1] += values[1]
+        day[2] += values[2]
+        day[3] = max(day[3], values[3])
+
+    try:
+        with Session(engine) as session:
+            for hour_start, values in pending.items():
+                _upsert_bucket(session, "hour", hour_start, values)
+            for day_start, values in daily.items():
+                _upsert_bucket(session, "day", day_start, values)
+            session.commit()
+    except Exception:
+        # Put the totals back so they are retried on the next cycle
+        with _pending_lock:
+            for hour_start, values in pending.items():
+                bucket = _pending.setdefault(hour_start, [0, 0, 0.0, 0.0])
+                bucket[0] += values[0]
+                bucket[1] += values[1]
+                bucket[2] += values[2]
+                bucket[3] = max(bucket[3], values[3])
+        raise
+    return len(pending)
+
+def read_request_buckets(session: Session, granularity: str, since: datetime) -> List[dict]:
+    statement = select(RequestMetricBucket).where(
+        RequestMetricBucket.granularity == granularity,
+        RequestMetricBucket.bucket_start >= since
+    ).order_by(RequestMetricBucket.bucket_start)
+    return [
+        {
+            "bucket_start": b.bucket_start,
+            "requests": b.request_count,
+            "errors": b.error_count,
+            "avg_response_time_ms": round(b.total_latency_ms / b.request_count, 2) if b.request_count else 0.0,
+            "max_response_time_ms": round(b.max_latency_ms, 2),
+        }
+        for b in session.exec(statement).all()
+    ]
+
+def summarize_buckets(buckets: List[dict]) -> dict:
+    requests = sum(b["requests"] for b in buckets)
+    errors = sum(b["errors"] for b in buckets)
+    total_latency = sum(b["avg_response_time_ms"] * b["requests"] for b in buckets)
+    return {
+        "requests": requests,
+        "avg_response_time_ms": round(total_latency / requests, 2) if requests else 0.0,
+        "error_rate_percent": round((errors / requests) * 100, 2) if requests else 0.0,
+    }
+
+async def metrics_rollup_task():
+    """Background task that flushes request metrics, folds counter deltas and periodically reconciles the counters"""
+    print("Starting Metrics Rollup Background Task...")
+    last_reconcile: Optional[datetime] = None
+    reconcile_every = timedelta(minutes=settings.COUNTERS_RECONCILE_INTERVAL_MINUTES)
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(flush_request_metrics)
+            await asyncio.to_thread(fold_counter_deltas)
+            if last_reconcile is None or datetime.utcnow() - last_reconcile >= reconcile_every:
+                await asyncio.to_thread(reconcile_counters)
+                last_reconcile = datetime.utcnow()
+        except Exception as e:
+            print(f"Error in Metrics Rollup iteration: {e}")
@@ -0,0 +1,109 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Set
+
+import brotli
+from fastapi import Response
+
+from app.core.etag import make_etag, etag_matches
+
+# --- Precompressed JSON Responses ---
+# For payloads that only change with a known version: serialize once, compress once (gzip and
+# brotli), and from then on every request is a dict lookup + If-None-Match check.
+# Each encoding gets its own strong ETag (RFC 9110: different bytes, different strong validator);
+# a 304 is answered if the client holds any encoding of the current version.
+# Used for the reference data in app/core/constants.py and the per-user CustomFluid lists.
+
+# Responses smaller than this are not worth compressing (headers dominate)
+MIN_COMPRESS_BYTES = 512
+
+ENCODINGS = ("identity", "br", "gzip")
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Set[str]:
+    """Content codings listed in an Accept-Encoding header (q=0 excludes one)."""
+    accepted = set()
+    for item in (accept_encoding or "").lower().split(","):
+        name, *params = item.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip())
+    return accepted
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Sequence[str]) -> str:
+    """First of `available` (in preference order) the client accepts, else "identity"."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in available:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return "identity"
+
+def variant_etag(version: str, encoding: str) -> str:
+    return f'"{version}-{encoding}"'
+
+def not_modified_response(if_none_match: Optional[str], version: str, cache_control: str) -> Optional[Response]:
+    """
+    304 if the client holds any encoding of `version`, else None.
+    Needs only the version, so callers can answer it before loading or serializing anything.
+    """
+    for encoding in ENCODINGS:
+        etag = variant_etag(version, encoding)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+    return None
+
+class PrecompressedJSON:
+    def __init__(self, payload: Any, version: Optional[str] = None, brotli_quality: int = 11, gzip_level: int = 9):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # Content-addressed unless the caller already has a version for the payload
+        self.version = version or make_etag(self.body.decode("utf-8")).strip('"')
+        self.variants: Dict[str, bytes] = {"identity": self.body}
+        if len(self.body) >= MIN_COMPRESS_BYTES:
+            self.variants["br"] = brotli.compress(self.body, mode=brotli.MODE_TEXT, quality=brotli_quality)
+            self.variants["gzip"] = gzip.compress(self.body, compresslevel=gzip_level, mtime=0)
+        self.etags = {encoding: variant_etag(self.version, encoding) for encoding in self.variants}
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Smallest available encoding the client accepts."""
+        return negotiate_encoding(accept_encoding, [encoding for encoding in ("br", "gzip") if encoding in self.variants])
+
+    def response(self, accept_encoding: Optional[str], if_none_match: Optional[str], cache_control: str) -> Response:
+        not_modified = not_modified_response(if_none_match, self.version, cache_control)
+        if not_modified is not None:
+            return not_modified
+        encoding = self.negotiate(accept_encoding)
+        headers = {"ETag": self.etags[encoding], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type="application/json", headers=headers)
+
+class PrecompressedCache:
+    """Bounded LRU of PrecompressedJSON by key (e.g. user id + list version), shared across requests."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Any, PrecompressedJSON]" = OrderedDict()
+
+    def get(self, key) -> Optional[PrecompressedJSON]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: PrecompressedJSON) -> PrecompressedJSON:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,227 @@
+import argparse
+import csv
+import io
+import json
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Pump, User
+from app.services.curve_fitting import fit_quadratic_batch
+
+# --- Bulk Pump Catalog Import ---
+# Imports manufacturer catalogs (thousands of models) in chunks:
+#   parse (CSV / JSON / NDJSON) -> validate each record -> fit every quadratic H(Q) of the chunk
+#   in one batched least-squares solve -> one multi-row INSERT (COPY on Postgres) per chunk.
+# Bad records are reported by number and skipped; they never abort the import.
+# Used by POST /pumps/import and standalone: python -m app.core.pump_import catalog.ndjson --user-email ...
+#
+# Formats:
+#   ndjson: one {"manufacturer", "model", "curve_points": [{"flow", "head", "efficiency"?, "npshr"?}]} per line
+#   json:   an array of those records
+#   csv:    one curve point per row, columns manufacturer,model,flow,head[,efficiency][,npshr];
+#           consecutive rows with the same manufacturer and model form one pump
+
+FORMATS = ("csv", "json", "ndjson")
+POINT_KEYS = ("flow", "head", "efficiency", "npshr")
+REQUIRED_POINT_KEYS = ("flow", "head")
+
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]] # (record number, record, parse error)
+
+def _iter_ndjson(lines: Iterable[str]) -> Iterator[Record]:
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+
+def _iter_json(lines: Iterable[str]) -> Iterator[Record]:
+    try:
+        records = json.loads("".join(lines))
+    except ValueError as e:
+        yield 1, None, f"Invalid JSON: {e}"
+        return
+    if not isinstance(records, list):
+        yield 1, None, "Expected a JSON array of pumps"
+        return
+    for number, record in enumerate(records, start=1):
+        yield number, record, None
+
+def _iter_csv(lines: Iterable[str]) -> Iterator[Record]:
+    reader = csv.DictReader(lines)
+    missing = {"manufacturer", "model", *REQUIRED_POINT_KEYS} - set(reader.fieldnames or [])
+    if missing:
+        yield 1, None, f"Missing CSV columns: {', '.join(sorted(missing))}"
+        return
+    current_key, current = None, None
+    for row in reader:
+        key = ((row.get("manufacturer") or "").strip(), (row.get("model") or "").strip())
+        if key != current_key:
+            if current is not None:
+                yield current
+            current_key = key
+            current = (reader.line_num, {"manufacturer": key[0], "model": key[1], "curve_points": []}, None)
+        current[1]["curve_points"].append({k: row[k] for k in POINT_KEYS if row.get(k) not in (None, "")})
+    if current is not None:
+        yield current
+
+def iter_catalog_records(lines: Iterable[str], format: str) -> Iterator[Record]:
+    """Yields (record number, record, parse error). NDJSON and CSV are read line by line."""
+    if format == "ndjson":
+        return _iter_ndjson(lines)
+    if format == "json":
+        return _iter_json(lines)
+    if format == "csv":
+        return _iter_csv(lines)
+    raise ValueError(f"Unknown catalog format: {format}")
+
+def validate_record(record: Any) -> Tuple[str, str, List[Dict[str, float]]]:
+    """Returns (manufacturer, model, curve points as floats) or raises ValueError."""
+    if not isinstance(record, dict):
+        raise ValueError("Record must be an object")
+    manufacturer = str(record.get("manufacturer") or "").strip()
+    model = str(record.get("model") or "").strip()
+    if not manufacturer or not model:
+        raise ValueError("manufacturer and model are required")
+    raw_points = record.get("curve_points")
+    if not isinstance(raw_points, list):
+        raise ValueError("curve_points must be a list")
+
+    points = []
+    for i, raw in enumerate(raw_points, start=1):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Point {i} must be an object")
+        point = {}
+        for key in POINT_KEYS:
+            if raw.get(key) is None:
+                if key in REQUIRED_POINT_KEYS:
+                    raise ValueError(f"Point {i}: {key} is required")
+                continue
+            try:
+                value = float(raw[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"Point {i}: {key} is not a number")
+            if not math.isfinite(value):
+                raise ValueError(f"Point {i}: {key} is not finite")
+            point[key] = value
+        if point["flow"] < 0:
+            raise ValueError(f"Point {i}: flow cannot be negative")
+        points.append(point)
+
+    if len({p["flow"] for p in points}) < 3:
+        raise ValueError("At least 3 curve points with distinct flows are required")
+    return manufacturer, model, points
+
+def _copy_rows(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """Postgres COPY ... FROM STDIN (psycopg2): much faster than INSERT for large chunks."""
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([json.dumps(row[c]) if c == "curve_points" else row[c] for c in columns])
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {Pump.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def _insert_rows(session: Session, rows: List[Dict[str, Any]]) -> None:
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+        _copy_rows(session, rows)
+    else:
+        session.exec(insert(Pump.__table__), params=rows)
+
+def import_catalog(lines: Iterable[str], format: str, user_id: int, is_global: bool = False) -> Dict[str, Any]:
+    """Imports a catalog into user_id's pumps (or the global catalog). Blocking: run it in a worker thread."""
+    start = time.perf_counter()
+    report: Dict[str, Any] = {"imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def record_error(number: int, error: str, manufacturer: Optional[str] = None, model: Optional[str] = None) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < settings.PUMP_IMPORT_MAX_ERRORS:
+            report["errors"].append({"record": number, "manufacturer": manufacturer, "model": model, "error": error})
+        else:
+            report["errors_truncated"] = True
+
+    def flush(session: Session, chunk: List[Tuple[int, str, str, List[Dict[str, float]]]]) -> None:
+        coeffs, max_head, max_flow = fit_quadratic_batch([points for _, _, _, points in chunk])
+        now = datetime.utcnow()
+        rows = [
+            {
+                "manufacturer": manufacturer,
+                "model": model,
+                "curve_points": points,
+                "is_global": is_global,
+                "user_id": user_id,
+                "created_at": now,
+                "coeff_a": float(coeffs[i, 0]),
+                "coeff_b": float(coeffs[i, 1]),
+                "coeff_c": float(coeffs[i, 2]),
+                "max_head_m": float(max_head[i]),
+                "max_flow_m3h": float(max_flow[i]),
+            }
+            for i, (_, manufacturer, model, points) in enumerate(chunk)
+        ]
+        try:
+            _insert_rows(session, rows)
+            session.commit()
+            report["imported"] += len(rows)
+            return
+        except Exception:
+            session.rollback()
+        # Chunk rejected by the database: retry row by row to report only the offending records
+        for (number, manufacturer, model, _), row in zip(chunk, rows):
+            try:
+                session.exec(insert(Pump.__table__), params=[row])
+                session.commit()
+                report["imported"] += 1
+            except Exception as e:
+                session.rollback()
+                record_error(number, str(e).splitlines()[0][:300], manufacturer, model)
+
+    with Session(engine) as session:
+        chunk = []
+        for number, record, error in iter_catalog_records(lines, format):
+            if error is not None:
+                record_error(number, error)
+                continue
+            try:
+                manufacturer, model, points = validate_record(record)
+            except ValueError as e:
+                name = record if isinstance(record, dict) else {}
+                record_error(number, str(e), name.get("manufacturer"), name.get("model"))
+                continue
+            chunk.append((number, manufacturer, model, points))
+            if len(chunk) >= settings.PUMP_IMPORT_CHUNK_SIZE:
+                flush(session, chunk)
+                chunk = []
+        if chunk:
+            flush(session, chunk)
+
+    report["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import a pump catalog")
+    parser.add_argument("path", help="Catalog file (.csv, .json or .ndjson)")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--user-email", required=True, help="Owner of the imported pumps")
+    parser.add_argument("--global", dest="is_global", action="store_true", help="Import into the global catalog")
+    args = parser.parse_args()
+
+    catalog_format = args.format or args.path.rsplit(".", 1)[-1].lower()
+    with Session(engine) as session:
+        owner = session.exec(select(User).where(User.email == args.user_email)).first()
+    if owner is None:
+        raise SystemExit(f"User not found: {args.user_email}")
+    with open(args.path, encoding="utf-8-sig", newline="") as catalog:
+        print(json.dumps(import_catalog(catalog, catalog_format, owner.id, args.is_global), indent=2))
@@ -0,0 +1,72 @@
+from typing import Optional
+
+from sqlalchemy import literal_column, text, and_, column
+from sqlalchemy.engine import Engine
+
+from app.models import Pump
+
+# --- Pump Catalog Search Indexes ---
+# Substring search over "manufacturer model":
+#   Postgres: pg_trgm GIN index on the concatenated expression, used by ILIKE '%term%'
+#   SQLite:   FTS5 table with the trigram tokenizer, kept in sync with `pump` by triggers
+# Trigram indexes only help terms of 3+ characters; shorter terms are matched with LIKE
+# within whatever the other filters selected. Created by migration f6c2d8e0a348 and, for
+# databases built with create_all, by ensure_pump_search_index at startup.
+
+SEARCH_EXPRESSION = Pump.manufacturer + literal_column("' '") + Pump.model # literal so it matches the index expression
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_pump_search_trgm ON pump USING gin ((manufacturer || ' ' || model) gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS pump_fts USING fts5(manufacturer, model, content='pump', content_rowid='id', tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS pump_fts_ai AFTER INSERT ON pump BEGIN
+        INSERT INTO pump_fts(rowid, manufacturer, model) VALUES (new.id, new.manufacturer, new.model);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS pump_fts_ad AFTER DELETE ON pump BEGIN
+        INSERT INTO pump_fts(pump_fts, rowid, manufacturer, model) VALUES ('delete', old.id, old.manufacturer, old.model);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS pump_fts_au AFTER UPDATE OF manufacturer, model ON pump BEGIN
+        INSERT INTO pump_fts(pump_fts, rowid, manufacturer, model) VALUES ('delete', old.id, old.manufacturer, old.model);
+        INSERT INTO pump_fts(rowid, manufacturer, model) VALUES (new.id, new.manufacturer, new.model);
+    END""",
+]
+
+# At most this many search words are used
+MAX_TERMS = 8
+
+def ensure_pump_search_index(engine: Engine) -> None:
+    """Creates the search index if missing (idempotent). A new SQLite FTS table is filled from `pump`."""
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            for statement in POSTGRES_DDL:
+                connection.execute(text(statement))
+        elif engine.dialect.name == "sqlite":
+            exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'pump_fts'")).first()
+            for statement in SQLITE_DDL:
+                connection.execute(text(statement))
+            if not exists:
+                connection.execute(text("INSERT INTO pump_fts(pump_fts) VALUES ('rebuild')"))
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_condition(q: str, dialect_name: str) -> Optional[object]:
+    """
+    WHERE clause matching pumps whose "manufacturer model" contains every word of q (case-insensitive).
+    None if q has no words.
+    """
+    terms = q.split()[:MAX_TERMS]
+    if not terms:
+        return None
+    conditions = [SEARCH_EXPRESSION.ilike(f"%{_escape_like(term)}%", escape="\\") for term in terms]
+
+    fts_terms = [term for term in terms if len(term) >= 3]
+    if dialect_name == "sqlite" and fts_terms:
+        # Narrow to the FTS5 trigram matches first; each quoted term is a substring match
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in fts_terms)
+        fts_ids = text("SELECT rowid FROM pump_fts WHERE pump_fts MATCH :pump_match").bindparams(pump_match=match).columns(column("rowid"))
+        conditions.insert(0, Pump.id.in_(fts_ids))
+    return and_(*conditions)
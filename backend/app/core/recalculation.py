@@ -0,0 +1,217 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlmodel import Session, select, update, func, or_
+from app.core.config import settings
+from app.core.db import engine
+from app.models import RecalculationJob, Scenario
+from app.services.scenario_results import SOLVER_VERSION, compute_scenario_results, hydraulic_input_hash
+
+# --- Bulk Scenario Recalculation ---
+# Refreshes the stored results of every scenario computed with another SOLVER_VERSION.
+# Scenarios are streamed by id in chunks, solved in a process pool (outside the web workers'
+# threads and GIL), and written back with one batched UPDATE per chunk. The job row's
+# last_scenario_id advances in the same transaction, so an interrupted job resumes where it stopped.
+# Runs in the API process (recalculation_worker_task) or standalone: python -m app.core.recalculation
+
+# A running job whose heartbeat is older than this was interrupted and can be resumed
+STALE_HEARTBEAT_AFTER = timedelta(minutes=5)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _stale_scenarios(solver_version: str):
+    return or_(Scenario.solver_version == None, Scenario.solver_version != solver_version)
+
+def _recalculate(item) -> tuple:
+    """Runs in a pool process: returns (scenario_id, input_hash, results, error)."""
+    scenario_id, data = item
+    try:
+        data = data or {}
+        return scenario_id, hydraulic_input_hash(data), compute_scenario_results(data), None
+    except Exception as e:
+        return scenario_id, None, None, str(e)[:500]
+
+def job_status(job: RecalculationJob) -> dict:
+    rate = job.processed / job.elapsed_seconds if job.elapsed_seconds else 0.0
+    remaining = max(job.total - job.processed - job.failed, 0)
+    return {
+        "id": job.id,
+        "status": job.status,
+        "solver_version": job.solver_version,
+        "total": job.total,
+        "processed": job.processed,
+        "failed": job.failed,
+        "progress_pct": round(100.0 * (job.processed + job.failed) / job.total, 1) if job.total else 100.0,
+        "scenarios_per_second": round(rate, 2),
+        "eta_seconds": round(remaining / rate) if rate else None,
+        "last_scenario_id": job.last_scenario_id,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "heartbeat_at": job.heartbeat_at,
+        "finished_at": job.finished_at,
+    }
+
+def create_job(session: Session, created_by_id: Optional[int] = None) -> Optional[RecalculationJob]:
+    """Queues a job for the current SOLVER_VERSION. Returns None if one is already queued or running."""
+    active = session.exec(select(RecalculationJob).where(RecalculationJob.status.in_(ACTIVE_STATUSES))).first()
+    if active:
+        return None
+    total = session.exec(select(func.count(Scenario.id)).where(_stale_scenarios(SOLVER_VERSION))).one()
+    job = RecalculationJob(solver_version=SOLVER_VERSION, total=total, created_by_id=created_by_id)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    notify_recalculation_worker()
+    return job
+
+def claim_job() -> Optional[int]:
+    """Takes the queued job, or an interrupted running one. The conditional UPDATE keeps two workers off the same job."""
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        job = db.exec(
+            select(RecalculationJob)
+            .where(or_(
+                RecalculationJob.status == "queued",
+                (RecalculationJob.status == "running") & (RecalculationJob.heartbeat_at < now - STALE_HEARTBEAT_AFTER)
+            ))
+            .order_by(RecalculationJob.id)
+        ).first()
+        if job is None:
+            return None
+        values = {"status": "running", "heartbeat_at": now, "started_at": job.started_at or now}
+        if job.solver_version != SOLVER_VERSION:
+            # Deployed a newer solver since the job was queued: start over for this version
+            values.update({
+                "solver_version": SOLVER_VERSION,
+                "last_scenario_id": 0,
+                "processed": 0,
+                "failed": 0,
+                "elapsed_seconds": 0.0,
+                "total": db.exec(select(func.count(Scenario.id)).where(_stale_scenarios(SOLVER_VERSION))).one(),
+            })
+        result = db.exec(
+            update(RecalculationJob)
+            .where(RecalculationJob.id == job.id, RecalculationJob.status == job.status, RecalculationJob.heartbeat_at == job.heartbeat_at)
+            .values(**values)
+        )
+        db.commit()
+        return job.id if result.rowcount == 1 else None
+
+def run_job(job_id: int) -> None:
+    """Processes a claimed job chunk by chunk until done or cancelled. Blocking: run it in a worker thread."""
+    workers = max(settings.RECALC_WORKERS, 1)
+    # spawn: children must not inherit the parent's threads, event loop or DB connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        while True:
+            with Session(engine) as db:
+                job = db.get(RecalculationJob, job_id)
+                if job is None or job.status != "running":
+                    return # cancelled
+                rows = db.exec(
+                    select(Scenario.id, Scenario.data)
+                    .where(Scenario.id > job.last_scenario_id, _stale_scenarios(job.solver_version))
+                    .order_by(Scenario.id)
+                    .limit(settings.RECALC_CHUNK_SIZE)
+                ).all()
+                solver_version = job.solver_version
+
+            if not rows:
+                with Session(engine) as db:
+                    db.exec(
+                        update(RecalculationJob)
+                        .where(RecalculationJob.id == job_id, RecalculationJob.status == "running")
+                        .values(status="completed", finished_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+                    )
+                    db.commit()
+                return
+
+            start = time.perf_counter()
+            outcomes = list(pool.map(_recalculate, [tuple(row) for row in rows], chunksize=max(1, len(rows) // (workers * 4))))
+            now = datetime.utcnow()
+
+            updates = [
+                {"id": scenario_id, "input_hash": input_hash, "results": results, "solver_version": solver_version, "results_computed_at": now}
+                for scenario_id, input_hash, results, error in outcomes if error is None
+            ]
+            errors = [error for _, _, _, error in outcomes if error is not None]
+
+            with Session(engine) as db:
+                if updates:
+                    # ORM bulk UPDATE by primary key: one executemany per chunk
+                    db.exec(update(Scenario), params=updates)
+                db.exec(
+                    update(RecalculationJob)
+                    .where(RecalculationJob.id == job_id, RecalculationJob.status == "running")
+                    .values(
+                        last_scenario_id=rows[-1][0],
+                        processed=RecalculationJob.processed + len(updates),
+                        failed=RecalculationJob.failed + len(errors),
+                        elapsed_seconds=RecalculationJob.elapsed_seconds + (time.perf_counter() - start),
+                        heartbeat_at=now,
+                        last_error=errors[-1] if errors else RecalculationJob.last_error,
+                    )
+                )
+                db.commit()
+
+def process_jobs() -> int:
+    """Runs every claimable job. Returns how many were run."""
+    ran = 0
+    while True:
+        job_id = claim_job()
+        if job_id is None:
+            return ran
+        print(f"Recalculation job {job_id} started")
+        try:
+            run_job(job_id)
+        except Exception as e:
+            print(f"Error in recalculation job {job_id}: {e}")
+            with Session(engine) as db:
+                db.exec(
+                    update(RecalculationJob)
+                    .where(RecalculationJob.id == job_id)
+                    .values(status="failed", last_error=str(e)[:500], finished_at=datetime.utcnow())
+                )
+                db.commit()
+        ran += 1
+
+def notify_recalculation_worker() -> None:
+    """Wakes the worker up so a new job starts now instead of at the next poll."""
+    if _loop is None or _wakeup is None:
+        return
+    try:
+        _loop.call_soon_threadsafe(_wakeup.set)
+    except RuntimeError:
+        pass # loop already closed
+
+async def recalculation_worker_task():
+    """Background task that runs queued (and resumes interrupted) recalculation jobs"""
+    global _wakeup, _loop
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    print("Starting Recalculation Worker Background Task...")
+    while True:
+        try:
+            await asyncio.to_thread(process_jobs)
+        except Exception as e:
+            print(f"Error in Recalculation Worker iteration: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.RECALC_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+if __name__ == "__main__":
+    # Standalone run (e.g. on a separate machine): queue a job if none is active, then run it
+    with Session(engine) as session:
+        create_job(session)
+    process_jobs()
+    with Session(engine) as session:
+        last = session.exec(select(RecalculationJob).order_by(RecalculationJob.id.desc())).first()
+        print(job_status(last) if last else "No recalculation job")
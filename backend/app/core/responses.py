@@ -0,0 +1,22 @@
+from decimal import Decimal
+from typing import Any
+
+import numpy as np
+import orjson
+from fastapi.responses import ORJSONResponse
+
+# --- Default JSON Response ---
+# orjson renders several times faster than the stdlib json used by JSONResponse, and with
+# OPT_SERIALIZE_NUMPY it takes NumPy arrays and scalars as-is (solver results often carry
+# np.float64 / np.int64). NaN and Infinity become null instead of failing the request.
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
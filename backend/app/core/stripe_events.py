@@ -0,0 +1,296 @@
+import asyncio
+import secrets
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select, update
+from app.core.config import settings
+from app.core.db import engine
+from app.core.email import enqueue_email, notify_email_sender
+from app.models import StripeEvent, StripeEventKey, User, Invite
+
+# --- Stripe Event Processing ---
+# The webhook (app/api/v1/payments.py) only verifies the signature and stores the event.
+# stripe_event_worker_task applies them in Stripe's order. Each event is applied in a single
+# transaction that also marks it processed and queues its emails, so a crash or a retried
+# delivery never applies an event twice.
+
+#
+# Ordering is per customer: while an earlier event of the same customer is still pending (e.g. waiting
+# for its retry backoff) or processing, that customer's later events are held, so a refund is never
+# applied before a retried checkout. The webhook stores each event's customer identities in
+# stripeeventkey, so "does this customer have an earlier unprocessed event" is an index lookup.
+# An event that used up its attempts becomes "failed" and releases the hold; it stays in the table
+# (with last_error) for inspection. Other customers' events are never blocked.
+
+# Events stuck in "processing" longer than this (worker crashed mid-event) are retried
+STALE_CLAIM_AFTER = timedelta(minutes=10)
+
+# Claimable events fetched per claim; more than one only matters when several workers race for them
+CLAIM_CANDIDATES = 10
+
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def notify_stripe_worker() -> None:
+    """Wakes the worker up so a new event is processed now instead of at the next poll."""
+    if _loop is None or _wakeup is None:
+        return
+    try:
+        _loop.call_soon_threadsafe(_wakeup.set)
+    except RuntimeError:
+        pass # loop already closed
+
+def _handle_checkout_completed(db: Session, event: dict) -> None:
+    session = event['data']['object']
+
+    user_id = session.get('metadata', {}).get('user_id')
+    plan = session.get('metadata', {}).get('plan')
+    interval = session.get('metadata', {}).get('interval', 'year')
+    customer_id = session.get('customer')
+
+    end_date = datetime.utcnow() + timedelta(days=30) if interval == 'month' else None
+
+    frontend_url = settings.FRONTEND_URL or "https://pumps-saas.com"
+    customer_email_to_notify = None
+    is_new_user = False
+    invite_link = None
+
+    if user_id:
+        # Logged-in user purchase
+        user = db.get(User, int(user_id))
+        if user:
+            user.stripe_customer_id = customer_id
+            user.subscription_status = "active"
+            user.subscription_tier = plan or "basic"
+            user.subscription_end_date = end_date
+            db.add(user)
+            customer_email_to_notify = user.email
+    else:
+        # Public Checkout Flow handling
+        customer_email = session.get('customer_details', {}).get('email')
+        if customer_email:
+            customer_email_to_notify = customer_email
+            user = db.exec(select(User).where(User.email == customer_email)).first()
+            if not user:
+                # Pre-create user waiting for registration
+                is_new_user = True
+                user = User(
+                    email=customer_email,
+                    hashed_password="TEMP_WAITING_REGISTRATION",
+                    role="user",
+                    is_active=False,
+                    subscription_status="active",
+                    subscription_tier=plan or "basic",
+                    subscription_end_date=end_date,
+                    stripe_customer_id=customer_id
+                )
+                db.add(user)
+                db.flush() # assigns user.id for the invite
+
+                invite_code = secrets.token_urlsafe(8)
+                invite = Invite(
+                    code=invite_code,
+                    created_by_id=user.id
+                )
+                db.add(invite)
+                invite_link = f"{frontend_url}/register?invite_code={invite_code}&email={customer_email}"
+            else:
+                # User already existed (Reactivating / Upgrading without logging in)
+                user.subscription_status = "active"
+                user.subscription_tier = plan or "basic"
+                user.subscription_end_date = end_date
+                if not user.stripe_customer_id:
+                    user.stripe_customer_id = customer_id
+                db.add(user)
+
+    # Now queue the emails based on the flags (sent after this event's transaction commits)
+    if customer_email_to_notify:
+        # 1) ALWAYS send internal Notification Email to Vendas
+        enqueue_email(
+            email_to="vendas@pumps-saas.com",
+            subject="💸 Nova Venda Realizada - Ação Automática",
+            text_content=f"O cliente {customer_email_to_notify} comprou o plano {plan}. O sistema processou a liberação.",
+            session=db
+        )
+
+        # 2) Send correct email to customer
+        if is_new_user:
+            enqueue_email(
+                email_to=customer_email_to_notify,
+                subject="Seu Acesso ao Pumps SaaS Foi Liberado!",
+                text_content=f"Bem vindo ao Pumps SaaS!\n\nSeu pagamento foi aprovado e sua assinatura {plan.capitalize()} está ativa.\n\nPara criar sua senha e entrar no aplicativo de forma segura, acesse o link de Convite exclusivo abaixo:\n{invite_link}\n\nAtenciosamente,\nEquipe Pumps SaaS",
+                session=db
+            )
+        else:
+            login_url = f"{frontend_url}/login"
+            enqueue_email(
+                email_to=customer_email_to_notify,
+                subject="Assinatura Pumps SaaS Atualizada",
+                text_content=f"Sua compra foi confirmada e sua assinatura {plan.capitalize()} está ativa!\n\nVocê já pode fazer login na plataforma para utilizar seus recursos. Acesse sua conta diretamente pelo link abaixo para entrar:\n{login_url}\n\nAtenciosamente,\nEquipe Pumps SaaS",
+                session=db
+            )
+
+def _handle_subscription_ended(db: Session, event: dict) -> None:
+    data_object = event['data']['object']
+    customer_id = data_object.get('customer')
+    customer_email = (data_object.get('billing_details') or {}).get('email') or data_object.get('receipt_email')
+
+    user = None
+
+    if customer_id:
+        user = db.exec(select(User).where(User.stripe_customer_id == customer_id)).first()
+
+    if not user and customer_email:
+        # Fallback for one-time payments where customer_id might be null
+        user = db.exec(select(User).where(User.email == customer_email)).first()
+
+    if user:
+        user.subscription_status = "expired"
+        user.subscription_end_date = datetime.utcnow()
+        user.is_active = False
+        db.add(user)
+
+        enqueue_email(
+            email_to="vendas@pumps-saas.com",
+            subject="⚠️ Assinatura Cancelada / Reembolsada",
+            text_content=f"Atenção: O sistema identificou um reembolso ou cancelamento no Stripe.\n\nO cliente {user.email} teve sua assinatura bloqueada e o acesso foi revogado automaticamente.",
+            session=db
+        )
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': _handle_checkout_completed,
+    'charge.refunded': _handle_subscription_ended,
+    'customer.subscription.deleted': _handle_subscription_ended,
+    'customer.subscription.canceled': _handle_subscription_ended,
+}
+
+def ordering_keys(payload: dict) -> set:
+    """Customer identities an event touches (Stripe customer, email, our user id): events sharing one are ordered."""
+    data_object = ((payload or {}).get('data') or {}).get('object') or {}
+    keys = set()
+    if data_object.get('customer'):
+        keys.add(f"customer:{data_object['customer']}")
+    for email in (
+        (data_object.get('customer_details') or {}).get('email'),
+        (data_object.get('billing_details') or {}).get('email'),
+        data_object.get('receipt_email'),
+    ):
+        if email:
+            keys.add(f"email:{email.strip().lower()}")
+    user_id = (data_object.get('metadata') or {}).get('user_id')
+    if user_id:
+        keys.add(f"user:{user_id}")
+    return keys
+
+def event_key_rows(event_pk: int, payload: dict) -> List[dict]:
+    """stripeeventkey rows for a stored event."""
+    return [{"event_pk": event_pk, "key": key} for key in sorted(ordering_keys(payload))]
+
+def _claim_next_event() -> Optional[int]:
+    """
+    Marks the oldest due event whose customer has no earlier pending or processing event as "processing"
+    and returns its id. The conditional UPDATE means two worker processes never apply the same event.
+    """
+    now = datetime.utcnow()
+    earlier = aliased(StripeEvent)
+    own_key = aliased(StripeEventKey)
+    earlier_key = aliased(StripeEventKey)
+    held = (
+        select(earlier.id)
+        .join(earlier_key, earlier_key.event_pk == earlier.id)
+        .join(own_key, own_key.key == earlier_key.key)
+        .where(
+            own_key.event_pk == StripeEvent.id,
+            earlier.status.in_(("pending", "processing")),
+            or_(
+                earlier.stripe_created < StripeEvent.stripe_created,
+                and_(earlier.stripe_created == StripeEvent.stripe_created, earlier.id < StripeEvent.id),
+            ),
+        )
+        .exists()
+    )
+    with Session(engine) as db:
+        db.exec(
+            update(StripeEvent)
+            .where(StripeEvent.status == "processing", StripeEvent.claimed_at < now - STALE_CLAIM_AFTER)
+            .values(status="pending")
+        )
+        candidates = db.exec(
+            select(StripeEvent.id)
+            .where(StripeEvent.status == "pending", StripeEvent.next_attempt_at <= now, ~held)
+            .order_by(StripeEvent.stripe_created, StripeEvent.id)
+            .limit(CLAIM_CANDIDATES)
+        ).all()
+        for event_pk in candidates:
+            result = db.exec(
+                update(StripeEvent)
+                .where(StripeEvent.id == event_pk, StripeEvent.status == "pending")
+                .values(status="processing", claimed_at=now)
+            )
+            if result.rowcount == 1:
+                db.commit()
+                return event_pk
+        db.commit()
+    return None
+
+def process_stripe_event(event_pk: int) -> None:
+    """Applies one claimed event. Business changes, queued emails and the "processed" mark commit together."""
+    with Session(engine) as db:
+        stored = db.get(StripeEvent, event_pk)
+        if stored is None or stored.status != "processing":
+            return
+        try:
+            handler = EVENT_HANDLERS.get(stored.type)
+            if handler:
+                handler(db, stored.payload)
+            stored.status = "processed"
+            stored.processed_at = datetime.utcnow()
+            stored.last_error = None
+            db.add(stored)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error processing Stripe event {stored.event_id}: {e}")
+            attempts = stored.attempts + 1
+            if attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+                values = {"status": "failed", "attempts": attempts, "last_error": str(e)[:500]}
+            else:
+                delay = settings.STRIPE_EVENT_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+                values = {
+                    "status": "pending",
+                    "attempts": attempts,
+                    "last_error": str(e)[:500],
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)
+                }
+            db.exec(update(StripeEvent).where(StripeEvent.id == event_pk).values(**values))
+            db.commit()
+
+def process_pending_events() -> int:
+    """Processes every due event. Returns how many were handled."""
+    handled = 0
+    while True:
+        event_pk = _claim_next_event()
+        if event_pk is None:
+            return handled
+        process_stripe_event(event_pk)
+        handled += 1
+
+async def stripe_event_worker_task():
+    """Background task that applies stored Stripe webhook events"""
+    global _wakeup, _loop
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    print("Starting Stripe Event Worker Background Task...")
+    while True:
+        try:
+            if await asyncio.to_thread(process_pending_events):
+                notify_email_sender()
+        except Exception as e:
+            print(f"Error in Stripe Event Worker iteration: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.STRIPE_EVENT_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
@@ -0,0 +1,42 @@
+import asyncio
+from datetime import datetime
+from sqlmodel import Session, update
+from app.core.config import settings
+from app.core.db import engine
+from app.core import auth_cache
+from app.models import User
+
+def expire_subscriptions(session: Session) -> int:
+    """
+    Marks every subscription past its end date as expired in a single UPDATE.
+    Returns the number of users changed.
+    """
+    result = session.exec(
+        update(User)
+        .where(
+            User.subscription_end_date != None,
+            User.subscription_end_date < datetime.utcnow(),
+            User.subscription_status != "expired"
+        )
+        .values(subscription_status="expired")
+    )
+    session.commit()
+    if result.rowcount:
+        # Bulk UPDATE bypasses the ORM flush listeners, so drop the cached principals explicitly
+        auth_cache.clear()
+    return result.rowcount
+
+async def subscription_sweeper_task():
+    """Background task that expires subscriptions on an interval instead of in the request path"""
+    print("Starting Subscription Sweeper Background Task...")
+    while True:
+        try:
+            def _sweep():
+                with Session(engine) as session:
+                    return expire_subscriptions(session)
+            expired = await asyncio.to_thread(_sweep)
+            if expired:
+                print(f"Subscription sweeper: {expired} subscriptions marked as expired")
+        except Exception as e:
+            print(f"Error in Subscription Sweeper iteration: {e}")
+        await asyncio.sleep(settings.SUBSCRIPTION_SWEEP_INTERVAL_SECONDS)
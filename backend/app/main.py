@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.responses import FastJSONResponse
 from app.api.api import api_router
 
 app = FastAPI(
@@ -8,6 +10,7 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=f"{settings.API_V1_STR}/docs",
     redoc_url=f"{settings.API_V1_STR}/redoc",
+    default_response_class=FastJSONResponse,
 )
 
 # Set all CORS enabled origins
@@ -21,6 +24,9 @@ if origins:
         allow_headers=["*"],
     )
 
+# brotli/gzip for complete responses above COMPRESSION_MIN_BYTES (streams pass through)
+app.add_middleware(CompressionMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 import time
@@ -28,6 +34,7 @@ import asyncio
 from fastapi import Request
 from sqlmodel import Session
 from app.core.db import engine
+from app.core import metrics
 from app.models import SystemLog
 
 @app.middleware("http")
@@ -36,6 +43,7 @@ async def log_kpi_middleware(request: Request, call_next):
     try:
         response = await call_next(request)
         process_time_ms = (time.time() - start_time) * 1000
+        metrics.record_request(process_time_ms, response.status_code >= 400)
         
         # Log to DB if it's a calculation or an error
         is_calc_route = "/calculate" in request.url.path
@@ -61,6 +69,7 @@ async def log_kpi_middleware(request: Request, call_next):
         return response
     except Exception as e:
         process_time_ms = (time.time() - start_time) * 1000
+        metrics.record_request(process_time_ms, True)
         db = Session(engine)
         try:
             log = SystemLog(
@@ -99,6 +108,29 @@ def on_startup():
     # Launch background task for IMAP Support email polling
     asyncio.create_task(email_poller_task())
 
+    # Launch background task that delivers the outbound email queue
+    from app.core.email import email_sender_task
+    asyncio.create_task(email_sender_task())
+
+    # Launch background task that applies stored Stripe webhook events
+    from app.core.stripe_events import stripe_event_worker_task
+    asyncio.create_task(stripe_event_worker_task())
+
+    # Launch background task for KPI counters and request metric buckets
+    asyncio.create_task(metrics.metrics_rollup_task())
+
+    # Launch background task that marks expired subscriptions in bulk
+    from app.core.subscriptions import subscription_sweeper_task
+    asyncio.create_task(subscription_sweeper_task())
+
+    # Launch background task for SystemLog rollup/retention
+    from app.core.log_retention import log_retention_task
+    asyncio.create_task(log_retention_task())
+
+    # Launch background task for bulk scenario recalculation jobs (resumes interrupted ones)
+    from app.core.recalculation import recalculation_worker_task
+    asyncio.create_task(recalculation_worker_task())
+
 @app.api_route("/", methods=["GET", "POST", "HEAD", "OPTIONS"])
 def root():
     return {"message": "Welcome to Pumps SaaS v2.0 API"}
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional, List, Any
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, JSON, UniqueConstraint, Index, func
+from app.core.codecs import CompressedJSON
 
 # --- Auth Models ---
 
@@ -50,6 +51,8 @@ class ProjectBase(SQLModel):
     description: Optional[str] = None
 
 class Project(ProjectBase, table=True):
+    # Serves the per-user listing ordered/searched by name (see projects.read_project_summaries)
+    __table_args__ = (Index("ix_project_user_id_name", "user_id", "name"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -58,6 +61,14 @@ class Project(ProjectBase, table=True):
     user: "User" = Relationship(back_populates="projects")
     scenarios: List["Scenario"] = Relationship(back_populates="project", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
+# Case-insensitive name prefix search: lower(name) LIKE 'prefix%' (text_pattern_ops so Postgres can range-scan it under any collation)
+Index(
+    "ix_project_user_id_lower_name",
+    Project.user_id,
+    func.lower(Project.name).label("lower_name"),
+    postgresql_ops={"lower_name": "text_pattern_ops"},
+)
+
 class ProjectCreate(ProjectBase):
     pass
 
@@ -66,16 +77,31 @@ class ProjectRead(ProjectBase):
     created_at: datetime
     updated_at: datetime
 
+class ProjectSummary(ProjectRead):
+    scenario_count: int = 0
+    last_scenario_at: Optional[datetime] = None
+    data_size_bytes: int = 0 # stored size of all scenario payloads
+
+class ProjectSummaryPage(SQLModel):
+    items: List[ProjectSummary] = []
+    next_cursor: Optional[str] = None
+
 # Scenario
 class ScenarioBase(SQLModel):
     name: str
-    data: dict = Field(default={}, sa_column=Column(JSON))
+    data: dict = Field(default={}, sa_column=Column(CompressedJSON)) # brotli-compressed JSON (see app/core/codecs.py)
 
 class Scenario(ScenarioBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    project_id: int = Field(foreign_key="project.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    # Last computed operating point / system curve (see app/services/scenario_results.py)
+    results: Optional[dict] = Field(default=None, sa_column=Column(CompressedJSON))
+    input_hash: Optional[str] = None # hash of the hydraulic inputs the results were computed from
+    solver_version: Optional[str] = Field(default=None, index=True)
+    results_computed_at: Optional[datetime] = None
+
     project: "Project" = Relationship(back_populates="scenarios")
 
 class ScenarioCreate(ScenarioBase):
@@ -85,10 +111,20 @@ class ScenarioRead(ScenarioBase):
     id: int
     project_id: int
     created_at: datetime
+    results: Optional[dict] = None
+    solver_version: Optional[str] = None
+    results_computed_at: Optional[datetime] = None
 
-# Project with Scenarios (for API response)
+# Scenario listing entry without the (potentially large) data payload
+class ScenarioSummary(SQLModel):
+    id: int
+    project_id: int
+    name: str
+    created_at: datetime
+
+# Project with Scenarios (for API response); full payloads come from GET /projects/scenarios/{id}
 class ProjectReadWithScenarios(ProjectRead):
-    scenarios: List[ScenarioRead] = []
+    scenarios: List[ScenarioSummary] = []
 
 # Custom Fluid
 class CustomFluidBase(SQLModel):
@@ -117,6 +153,12 @@ class PumpBase(SQLModel):
     is_global: bool = Field(default=False)
 
 class Pump(PumpBase, table=True):
+    # Catalog listing/search: scope (owner or global) then (manufacturer, model, id) keyset order
+    __table_args__ = (
+        Index("ix_pump_user_id_manufacturer_model", "user_id", "manufacturer", "model", "id"),
+        Index("ix_pump_is_global_manufacturer_model", "is_global", "manufacturer", "model", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -143,6 +185,15 @@ class PumpReadBasic(SQLModel):
     model: str
     is_global: bool
 
+class PumpSearchResult(PumpReadBasic):
+    max_flow_m3h: Optional[float] = None
+    max_head_m: Optional[float] = None
+    head_at_flow_m: Optional[float] = None # Fitted curve head at the requested flow_m3h
+
+class PumpSearchPage(SQLModel):
+    items: List[PumpSearchResult]
+    next_cursor: Optional[str] = None
+
 # --- Support Workflow Models ---
 
 class SupportTicketBase(SQLModel):
@@ -191,6 +242,83 @@ class TicketMessageRead(TicketMessageBase):
 class SupportTicketReadWithMessages(SupportTicketRead):
     messages: List[TicketMessageRead] = []
 
+class MailboxState(SQLModel, table=True):
+    # Last IMAP UID processed per folder by the support email poller (reset when UIDVALIDITY changes)
+    folder: str = Field(primary_key=True)
+    uidvalidity: int
+    last_uid: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ProcessedEmail(SQLModel, table=True):
+    # Ledger of inbound emails already stored as ticket messages (Message-ID, or a content hash when missing)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    message_key: str = Field(unique=True, index=True)
+    ticket_id: Optional[int] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+# --- Outbound Email Queue ---
+
+class OutboundEmail(SQLModel, table=True):
+    # Emails waiting to be delivered by the background sender (see app/core/email.py)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    email_to: str
+    subject: str
+    text_content: str
+    reply_to: Optional[str] = None
+    from_address: Optional[str] = None # defaults to EMAILS_FROM_NAME <EMAILS_FROM_EMAIL>
+    headers: dict = Field(default={}, sa_column=Column(JSON))
+    status: str = Field(default="pending", index=True) # "pending", "sending", "sent", "failed"
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    claimed_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
+
+# --- Stripe Events ---
+
+class StripeEvent(SQLModel, table=True):
+    # Verified webhook events, processed in order by the background worker (see app/core/stripe_events.py)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    event_id: str = Field(unique=True, index=True) # Stripe "evt_..." id: retried deliveries are ignored
+    type: str
+    payload: dict = Field(default={}, sa_column=Column(JSON))
+    stripe_created: int = Field(default=0, index=True) # Stripe's own event timestamp, used for ordering
+    status: str = Field(default="pending", index=True) # "pending", "processing", "processed", "failed"
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    claimed_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
+
+class StripeEventKey(SQLModel, table=True):
+    # Customer identities an event touches, so the worker finds a customer's earlier events with an index lookup
+    __table_args__ = (Index("ix_stripeeventkey_key_event_pk", "key", "event_pk"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    event_pk: int = Field(foreign_key="stripeevent.id", index=True)
+    key: str # "customer:cus_...", "email:..." or "user:<id>"
+
+# --- Scenario Recalculation Jobs ---
+
+class RecalculationJob(SQLModel, table=True):
+    # Admin-triggered bulk recalculation of stored scenario results (see app/core/recalculation.py)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(default="queued", index=True) # "queued", "running", "completed", "failed", "cancelled"
+    solver_version: str # results are refreshed to this version
+    last_scenario_id: int = Field(default=0) # resume cursor: every stale scenario up to this id is done
+    total: int = Field(default=0) # stale scenarios when the job started
+    processed: int = Field(default=0)
+    failed: int = Field(default=0)
+    elapsed_seconds: float = Field(default=0.0) # processing time only, summed across resumes
+    last_error: Optional[str] = None
+    created_by_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None # a running job without a recent heartbeat was interrupted
+    finished_at: Optional[datetime] = None
+
 # --- Monitoring Models ---
 
 class SystemLog(SQLModel, table=True):
@@ -199,4 +327,40 @@ class SystemLog(SQLModel, table=True):
     response_time_ms: float
     status_code: int
     error_message: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class SystemLogRollup(SQLModel, table=True):
+    # Daily aggregates of SystemLog rows removed by the retention job (see app/core/log_retention.py)
+    __table_args__ = (UniqueConstraint("bucket_start", "endpoint", "status_code"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bucket_start: datetime = Field(index=True)
+    endpoint: str
+    status_code: int
+    request_count: int = Field(default=0)
+    total_response_time_ms: float = Field(default=0.0)
+    max_response_time_ms: float = Field(default=0.0)
+
+class SystemCounter(SQLModel, table=True):
+    # Incrementally maintained totals (see app/core/metrics.py) so the KPI dashboard avoids COUNT(*) scans
+    name: str = Field(primary_key=True)
+    value: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SystemCounterDelta(SQLModel, table=True):
+    # Append-only counter changes written by user transactions; folded into SystemCounter in the background
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    delta: int
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RequestMetricBucket(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("granularity", "bucket_start"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    granularity: str = Field(default="hour") # "hour" or "day"
+    bucket_start: datetime = Field(index=True)
+    request_count: int = Field(default=0)
+    error_count: int = Field(default=0)
+    total_latency_ms: float = Field(default=0.0)
+    max_latency_ms: float = Field(default=0.0)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Literal
 
 class FluidProperties(BaseModel):
     name: str
@@ -59,6 +59,26 @@ class SystemHeadCurveRequest(BaseModel):
     flow_max_m3h: float = 100.0
     steps: int = 50
 
+    # "adaptive": refine where the curve bends until linear interpolation is within tolerance_m;
+    # `steps` is then the maximum number of points returned
+    sampling: Literal["uniform", "adaptive"] = "uniform"
+    tolerance_m: float = Field(0.05, gt=0, description="Max head interpolation error for adaptive sampling, in meters")
+
+    # Optional pump data: adds npsh_required and cavitation_margin_m (NPSHa - NPSHr) to each point
+    pump_curve_points: Optional[List[Dict[str, float]]] = None
+    speed_ratio: float = Field(1.0, description="Speed ratio (RPM_new / RPM_base)")
+    parallel_pumps: int = Field(1, description="Number of identical pumps in parallel", ge=1)
+
+class SystemCurvePoint(BaseModel):
+    flow: float
+    head: float
+    npsh_available: float
+    npsh_required: Optional[float] = None
+    cavitation_margin_m: Optional[float] = None
+
+class SystemCurveResponse(BaseModel):
+    points: List[SystemCurvePoint]
+
 class OperatingPointRequest(BaseModel):
     suction_sections: List[PipeSection]
     discharge_sections_before: List[PipeSection]
@@ -100,3 +120,108 @@ class OperatingPointResponse(BaseModel):
     natural_flow_m3h: Optional[float] = None
     head_breakdown: Optional[Dict[str, float]] = None
     is_extrapolated: bool = False
+
+class DiameterOptimizationRequest(BaseModel):
+    suction_sections: List[PipeSection]
+    discharge_sections_before: List[PipeSection]
+    discharge_parallel_sections: Dict[str, List[PipeSection]] = {} # kept at their current diameters
+    discharge_sections_after: List[PipeSection]
+    fluid: FluidProperties
+
+    static_head_m: float
+    pressure_suction_bar_g: float = Field(0.0, description="Pressure at suction tank surface (Gauge) in bar")
+    pressure_discharge_bar_g: float = Field(0.0, description="Pressure at discharge tank surface (Gauge) in bar")
+    atmospheric_pressure_bar: float = Field(1.01325, description="Local atmospheric pressure in bar")
+
+    # Design flow; defaults to the operating point of the current system with the pump curve
+    flow_m3h: Optional[float] = Field(None, gt=0, description="Design flow in m³/h")
+    # Optional pump: limits the head and, with NPSHr points, the suction losses; efficiency from its curve
+    pump_curve_points: Optional[List[Dict[str, float]]] = None
+    speed_ratio: float = Field(1.0, description="Speed ratio (RPM_new / RPM_base)")
+    parallel_pumps: int = Field(1, description="Number of identical pumps in parallel", ge=1)
+    npsh_margin_m: float = Field(0.5, ge=0, description="Required NPSHa - NPSHr margin in meters")
+
+    # Financial / Operational Params
+    efficiency_pump: float = Field(0.75, gt=0, le=1, description="Pump efficiency when the pump curve has none")
+    efficiency_motor: float = Field(0.90, gt=0, le=1)
+    hours_per_day: float = 8.0
+    days_per_year: float = 365.0
+    energy_cost_per_kwh: float = 0.75
+    lifetime_years: float = Field(20.0, gt=0)
+    discount_rate: float = Field(0.08, ge=0, description="Annual discount rate for the lifetime energy cost")
+    pipe_cost_per_m: float = Field(150.0, ge=0, description="Installed pipe cost per meter at 100 mm")
+    pipe_cost_exponent: float = Field(1.4, ge=0, description="Pipe cost ~ (D / 100 mm) ** exponent")
+
+    # Candidates: DIAMETROS_PADRAO by default
+    candidate_diameters_mm: Optional[List[float]] = None
+    min_velocity_m_s: float = Field(0.0, ge=0)
+    max_velocity_m_s: float = Field(3.0, gt=0)
+
+class DiameterChoice(BaseModel):
+    group: Literal["suction", "discharge_before", "discharge_after"]
+    index: int
+    section_id: Optional[str] = None
+    name: Optional[str] = None
+    current_diameter_mm: float
+    diameter_mm: float
+    diameter_label: Optional[str] = None
+    velocity_m_s: float
+    loss_m: float
+    capital_cost: float
+    energy_cost: float # lifetime (present value) energy cost of this section's loss
+
+class DiameterDesignCost(BaseModel):
+    total_head_m: float
+    power_kw: float
+    cost_per_year: float
+    capital_cost: float
+    energy_cost: float # present value over lifetime_years
+    total_cost: float
+    npsh_available: float
+
+class DiameterOptimizationResponse(BaseModel):
+    flow_m3h: float
+    sections: List[DiameterChoice]
+    optimized: DiameterDesignCost
+    current: DiameterDesignCost
+    savings: float
+    combinations: int
+    evaluated: int
+    used_process_pool: bool
+
+class OperatingPointUncertaintyRequest(OperatingPointRequest):
+    samples: int = Field(10000, ge=100, description="Number of perturbed systems")
+    seed: Optional[int] = None
+
+    # Uncertainty ranges; tolerances are relative (+-) and sampled uniformly
+    roughness_factor_min: float = Field(1.0, gt=0, description="Roughness multiplier range for pipe aging, sampled log-uniformly per section")
+    roughness_factor_max: float = Field(4.0, gt=0)
+    length_tolerance_pct: float = Field(5.0, ge=0, lt=100)
+    viscosity_tolerance_pct: float = Field(10.0, ge=0, lt=100)
+    # Pump curve acceptance tolerances (ISO 9906 grade 2B: flow +-8%, head +-5%)
+    pump_flow_tolerance_pct: float = Field(8.0, ge=0, lt=100)
+    pump_head_tolerance_pct: float = Field(5.0, ge=0, lt=100)
+    pump_efficiency_tolerance_pct: float = Field(5.0, ge=0, lt=100)
+
+    percentiles: List[float] = [5.0, 25.0, 50.0, 75.0, 95.0]
+
+    @field_validator('percentiles')
+    def percentiles_in_range(cls, v):
+        if not v or any(p < 0 or p > 100 for p in v): raise ValueError('Percentiles must be between 0 and 100')
+        return sorted(v)
+
+class UncertaintyBand(BaseModel):
+    nominal: Optional[float] = None # deterministic result with the nominal system
+    mean: float
+    std: float
+    percentiles: Dict[str, float] # "p5", "p50", ...
+
+class OperatingPointUncertaintyResponse(BaseModel):
+    samples: int
+    solved: int # samples with an operating point
+    flow_m3h: UncertaintyBand
+    head_m: UncertaintyBand
+    power_kw: Optional[UncertaintyBand] = None
+    npsh_margin_m: Optional[UncertaintyBand] = None
+    cavitation_probability: Optional[float] = None # share of solved samples with NPSHa < NPSHr
+    elapsed_ms: float
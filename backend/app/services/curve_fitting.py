@@ -0,0 +1,34 @@
+from typing import Dict, List, Tuple
+import numpy as np
+
+def fit_quadratic_batch(curves: List[List[Dict[str, float]]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Least-squares H = a*Q^2 + b*Q + c for every curve at once (same fit as np.polyfit(Q, H, 2)).
+    Each curve's normal equations are accumulated with bincount over the concatenated points and all
+    3x3 systems are solved in one batched call. Flows are scaled by each curve's max flow first so
+    the systems stay well conditioned. Returns (coeffs (n, 3), max_head (n,), max_flow (n,)).
+    """
+    sizes = np.array([len(points) for points in curves])
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    group = np.repeat(np.arange(len(curves)), sizes)
+    flows = np.array([p["flow"] for points in curves for p in points])
+    heads = np.array([p["head"] for points in curves for p in points])
+
+    max_flow = np.maximum.reduceat(flows, starts)
+    max_head = np.maximum.reduceat(heads, starts)
+    x = flows / max_flow[group]
+
+    n = len(curves)
+    s = [np.bincount(group, weights=x**k, minlength=n) for k in range(5)] # sums of x^0..x^4
+    t = [np.bincount(group, weights=heads * x**k, minlength=n) for k in range(3)] # sums of H*x^0..x^2
+    normal = np.stack([
+        np.stack([s[4], s[3], s[2]], axis=-1),
+        np.stack([s[3], s[2], s[1]], axis=-1),
+        np.stack([s[2], s[1], s[0]], axis=-1),
+    ], axis=1)
+    rhs = np.stack([t[2], t[1], t[0]], axis=-1)
+    scaled = np.linalg.solve(normal, rhs[..., None])[..., 0]
+
+    # Back to unscaled flow: H = a'(Q/s)^2 + b'(Q/s) + c
+    coeffs = np.column_stack([scaled[:, 0] / max_flow**2, scaled[:, 1] / max_flow, scaled[:, 2]])
+    return coeffs, max_head, max_flow
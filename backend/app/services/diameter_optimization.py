@@ -0,0 +1,203 @@
+import math
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..schemas.calculations import PipeSection, FluidProperties
+from .fluid_mechanics import darcy_weisbach_loss_array
+
+# Diameter selection as a multiple-choice problem: each section picks one candidate diameter and
+# pays capital (pipe cost x length) plus the lifetime energy of the head its loss adds at the design
+# flow. Loss decreases and capital increases monotonically with diameter, so in every section the
+# candidates smaller than the cheapest one are dominated and dropped. Without head limits the
+# problem is separable (each section keeps its cheapest candidate); head limits (pump head, NPSH)
+# couple the sections and are solved by branch and bound.
+
+def present_worth_factor(discount_rate: float, years: float) -> float:
+    """Present value of 1 per year paid for `years` years (uniform series)."""
+    if discount_rate <= 0:
+        return years
+    return (1 - (1 + discount_rate) ** -years) / discount_rate
+
+def pipe_cost_per_m(diameters_mm, cost_per_m_ref: float, exponent: float, reference_mm: float = 100.0) -> np.ndarray:
+    """Installed pipe cost per meter, cost_per_m_ref * (D / reference_mm) ** exponent."""
+    return cost_per_m_ref * (np.asarray(diameters_mm, dtype=float) / reference_mm) ** exponent
+
+def section_loss_by_diameter(section: PipeSection, flow_rate_m3h: float, fluid: FluidProperties, diameters_mm) -> Tuple[np.ndarray, np.ndarray]:
+    """Head loss and velocity of `section` at one flow for every candidate diameter at once."""
+    diameters_mm = np.asarray(diameters_mm, dtype=float)
+    losses = darcy_weisbach_loss_array(
+        flow_rate_m3h,
+        diameters_mm,
+        section.length_m,
+        section.roughness_mm,
+        sum(fitting.k * fitting.quantity for fitting in section.fittings),
+        section.equipment_loss_m,
+        fluid.nu
+    )
+    velocities = (flow_rate_m3h / 3600.0) / (math.pi * (diameters_mm / 1000.0) ** 2 / 4)
+    return losses, velocities
+
+def efficient_candidates(cost: np.ndarray, loss: np.ndarray) -> np.ndarray:
+    """
+    Indices of the candidates no cheaper candidate beats on loss, cheapest first.
+    Any other candidate is dominated: it costs more and loses at least as much head.
+    """
+    order = np.lexsort((loss, cost))
+    sorted_loss = loss[order]
+    lowest_before = np.minimum.accumulate(np.concatenate(([np.inf], sorted_loss[:-1])))
+    return order[sorted_loss < lowest_before]
+
+def _suffix_bounds(costs: Sequence[np.ndarray], usages: Sequence[np.ndarray], n_limits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per level i: the least cost and the least limit usage the sections i.. can still add."""
+    n = len(costs)
+    cost_suffix = np.zeros(n + 1)
+    usage_suffix = np.zeros((n + 1, n_limits))
+    for i in range(n - 1, -1, -1):
+        cost_suffix[i] = cost_suffix[i + 1] + costs[i].min()
+        usage_suffix[i] = usage_suffix[i + 1] + usages[i].min(axis=0)
+    return cost_suffix, usage_suffix
+
+def _branch_and_bound(
+    costs: Sequence[np.ndarray],
+    usages: Sequence[np.ndarray],
+    limits: np.ndarray,
+    start_cost: float = 0.0,
+    start_usage: Optional[np.ndarray] = None,
+    incumbent_cost: float = math.inf
+) -> Tuple[float, Optional[Tuple[int, ...]], int]:
+    """
+    Depth-first search for the cheapest choice (one candidate per level) with sum(usage) <= limits.
+    Each level's children are bounded at once: cost so far + candidate + least remaining cost must
+    beat the incumbent, and usage so far + candidate + least remaining usage must fit the limits.
+    Candidates must be sorted by cost, so the first child failing the cost bound ends the level.
+    Returns (best cost, choice or None if nothing beats incumbent_cost, children evaluated).
+    """
+    n = len(costs)
+    start_usage = np.zeros(len(limits)) if start_usage is None else start_usage
+    if n == 0:
+        return (start_cost, (), 0) if start_cost < incumbent_cost and np.all(start_usage <= limits) else (incumbent_cost, None, 0)
+    cost_suffix, usage_suffix = _suffix_bounds(costs, usages, len(limits))
+    limits = limits + 1e-9
+    best_cost, best_choice, evaluated = incumbent_cost, None, 0
+    choice = [0] * n
+
+    def visit(level: int, cost: float, usage: np.ndarray) -> None:
+        nonlocal best_cost, best_choice, evaluated
+        child_cost = cost + costs[level]
+        child_ok = child_cost + cost_suffix[level + 1] < best_cost
+        child_ok &= np.all(usage + usages[level] + usage_suffix[level + 1] <= limits, axis=1)
+        evaluated += len(child_cost)
+        children = np.flatnonzero(child_ok)
+        if level == n - 1:
+            if children.size:
+                j = children[np.argmin(child_cost[children])]
+                choice[level] = int(j)
+                best_cost, best_choice = float(child_cost[j]), tuple(choice)
+            return
+        for j in children:
+            if child_cost[j] + cost_suffix[level + 1] >= best_cost:
+                break # the incumbent improved while exploring a cheaper sibling
+            choice[level] = int(j)
+            visit(level + 1, child_cost[j], usage + usages[level][j])
+
+    visit(0, start_cost, start_usage)
+    return best_cost, best_choice, evaluated
+
+def _search_subtree(args) -> Tuple[float, Optional[Tuple[int, ...]], int]:
+    """Process pool task: branch and bound below one fixed prefix of choices."""
+    costs, usages, limits, start_cost, start_usage, incumbent_cost = args
+    return _branch_and_bound(costs, usages, limits, start_cost, start_usage, incumbent_cost)
+
+def _greedy_choice(costs: Sequence[np.ndarray], usages: Sequence[np.ndarray], limits: np.ndarray) -> Optional[List[int]]:
+    """
+    Feasible starting point for the search: from the cheapest candidates, keep upsizing the section
+    that removes the most limit violation per unit of extra cost. None if it gets stuck.
+    """
+    choice = [0] * len(costs)
+    usage = sum((u[0] for u in usages), np.zeros(len(limits)))
+    while True:
+        violation = np.clip(usage - limits, 0, None).sum()
+        if violation <= 1e-9:
+            return choice
+        best_ratio, best_level = 0.0, None
+        for level, j in enumerate(choice):
+            if j + 1 >= len(costs[level]):
+                continue
+            new_usage = usage - usages[level][j] + usages[level][j + 1]
+            gain = violation - np.clip(new_usage - limits, 0, None).sum()
+            ratio = gain / max(costs[level][j + 1] - costs[level][j], 1e-12)
+            if gain > 0 and ratio > best_ratio:
+                best_ratio, best_level = ratio, level
+        if best_level is None:
+            return None
+        j = choice[best_level]
+        usage = usage - usages[best_level][j] + usages[best_level][j + 1]
+        choice[best_level] = j + 1
+
+def search_diameters(
+    costs: Sequence[np.ndarray],
+    usages: Sequence[np.ndarray],
+    limits: Sequence[float],
+    executor: Optional[Executor] = None,
+    pool_min_combinations: int = 200_000,
+    tasks_per_worker: int = 4,
+    workers: int = 1
+) -> Dict[str, object]:
+    """
+    Cheapest combination of one candidate per section with the summed limit usage within `limits`.
+    costs[i]: (k_i,) total cost of section i's candidates, sorted ascending (see efficient_candidates)
+    usages[i]: (k_i, m) how much of each of the m limits each candidate uses (e.g. its head loss)
+    With no limits the sections are independent and each keeps its cheapest candidate.
+    Searches of at least pool_min_combinations combinations are split into subtrees (one per prefix
+    of choices) and solved on `executor`, seeded with a greedy incumbent so every subtree can prune.
+    Raises ValueError if no combination fits the limits.
+    """
+    limits = np.asarray(limits, dtype=float)
+    usages = [np.asarray(u, dtype=float).reshape(len(c), len(limits)) for c, u in zip(costs, usages)]
+    combinations = math.prod(len(c) for c in costs)
+    result = {"combinations": combinations, "evaluated": 0, "used_process_pool": False}
+
+    least_usage = sum((u.min(axis=0) for u in usages), np.zeros(len(limits)))
+    if np.any(least_usage > limits + 1e-9):
+        raise ValueError("No combination of candidate diameters satisfies the head limits.")
+    if len(limits) == 0:
+        result.update(choice=[0] * len(costs), cost=float(sum(c[0] for c in costs)), evaluated=sum(len(c) for c in costs))
+        return result
+
+    greedy = _greedy_choice(costs, usages, limits)
+    incumbent = float(sum(c[j] for c, j in zip(costs, greedy))) if greedy is not None else math.inf
+
+    if executor is None or combinations < pool_min_combinations or len(costs) < 2:
+        best_cost, best_choice, evaluated = _branch_and_bound(costs, usages, limits, incumbent_cost=incumbent)
+        prefix_choice = ()
+    else:
+        # Expand prefixes breadth-first until there is enough work to spread over the workers
+        prefixes = [((), 0.0, np.zeros(len(limits)))]
+        depth = 0
+        cost_suffix, usage_suffix = _suffix_bounds(costs, usages, len(limits))
+        while depth < len(costs) - 1 and len(prefixes) < workers * tasks_per_worker:
+            expanded = []
+            for prefix, cost, usage in prefixes:
+                for j in range(len(costs[depth])):
+                    child_cost, child_usage = cost + costs[depth][j], usage + usages[depth][j]
+                    if child_cost + cost_suffix[depth + 1] < incumbent and np.all(child_usage + usage_suffix[depth + 1] <= limits + 1e-9):
+                        expanded.append((prefix + (j,), child_cost, child_usage))
+            prefixes, depth = expanded, depth + 1
+        tail_costs, tail_usages = list(costs[depth:]), usages[depth:]
+        tasks = [(tail_costs, tail_usages, limits, cost, usage, incumbent) for _, cost, usage in prefixes]
+        best_cost, best_choice, evaluated, prefix_choice = incumbent, None, 0, ()
+        for (prefix, _, _), (cost, choice, task_evaluated) in zip(prefixes, executor.map(_search_subtree, tasks)):
+            evaluated += task_evaluated
+            if choice is not None and cost < best_cost:
+                best_cost, best_choice, prefix_choice = cost, choice, prefix
+        result["used_process_pool"] = True
+
+    if best_choice is None:
+        if greedy is None:
+            raise ValueError("No combination of candidate diameters satisfies the head limits.")
+        # Nothing beat the greedy incumbent, so it is optimal
+        best_cost, best_choice, prefix_choice = incumbent, tuple(greedy), ()
+    result.update(choice=list(prefix_choice + tuple(best_choice)), cost=float(best_cost), evaluated=evaluated)
+    return result
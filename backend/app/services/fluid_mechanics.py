@@ -88,3 +88,66 @@ def calculate_series_loss(
         total_loss += result.total_loss_m
         
     return total_loss
+
+def darcy_weisbach_loss_array(
+    flow_rate_m3h,
+    diameter_mm,
+    length_m,
+    roughness_mm,
+    k_total,
+    equipment_loss_m,
+    nu
+) -> np.ndarray:
+    """
+    Vectorized calculate_pipe_section_loss total loss. Every argument may be an array and they broadcast
+    against each other: many flows for one pipe, one flow for many candidate diameters, or one flow per
+    sampled system with its own length, roughness and viscosity.
+    Same Darcy-Weisbach / Swamee-Jain / laminar model; zero diameters give the same 1e12 m sentinel.
+    """
+    flows, diameters, length_m, roughness_mm, nu = np.broadcast_arrays(
+        np.clip(np.asarray(flow_rate_m3h, dtype=float), 0.0, None),
+        np.asarray(diameter_mm, dtype=float) / 1000.0,
+        np.asarray(length_m, dtype=float),
+        np.asarray(roughness_mm, dtype=float),
+        np.asarray(nu, dtype=float)
+    )
+    blocked = diameters <= 0
+    diameter_m = np.where(blocked, 1.0, diameters)
+    roughness_m = roughness_mm / 1000.0
+
+    area = (math.pi * diameter_m**2) / 4
+    velocity = (flows / 3600.0) / area
+    reynolds = np.divide(velocity * diameter_m, nu, out=np.zeros_like(velocity), where=nu > 0)
+
+    # Swamee-Jain above Re 4000 (for pipes with length), laminar 64/Re below
+    turbulent = reynolds > 4000
+    laminar = (reynolds > 0) & ~turbulent
+    safe_reynolds = np.where(reynolds > 0, reynolds, 1.0)
+    log_term = np.log10((roughness_m / (3.7 * diameter_m)) + (5.74 / safe_reynolds**0.9))
+    friction_factor = np.where(turbulent & (length_m > 0), 0.25 / (log_term**2), 0.0)
+    friction_factor = np.where(laminar, 64 / safe_reynolds, friction_factor)
+
+    velocity_head = velocity**2 / (2 * 9.81)
+    total_loss = friction_factor * (length_m / diameter_m) * velocity_head + k_total * velocity_head + equipment_loss_m
+    return np.where(blocked, 1e12, total_loss)
+
+def calculate_series_loss_array(
+    sections: List[PipeSection],
+    flow_rates_m3h: np.ndarray,
+    fluid: FluidProperties
+) -> np.ndarray:
+    """
+    Vectorized calculate_series_loss: total head loss of the sections in series for every flow rate at once.
+    """
+    total_loss = np.zeros_like(np.asarray(flow_rates_m3h, dtype=float))
+    for section in sections:
+        total_loss += darcy_weisbach_loss_array(
+            flow_rates_m3h,
+            section.diameter_mm,
+            section.length_m,
+            section.roughness_mm,
+            sum(fitting.k * fitting.quantity for fitting in section.fittings),
+            section.equipment_loss_m,
+            fluid.nu
+        )
+    return total_loss
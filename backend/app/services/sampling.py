@@ -0,0 +1,61 @@
+import heapq
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+
+def adaptive_sample(
+    func: Callable[[float], Optional[float]],
+    x_min: float,
+    x_max: float,
+    tolerance: float,
+    max_points: int,
+    initial_points: int = 5
+) -> Tuple[List[float], List[float], float]:
+    """
+    Samples func on [x_min, x_max], refining the interval with the largest interpolation error first.
+    The error of an interval is |f(mid) - linear interpolation at mid|; refinement stops when every
+    interval is within `tolerance` or `max_points` points are kept.
+    Points where func returns None are dropped (and their intervals are not refined).
+    Returns (xs, ys, max_error): max_error is the largest remaining midpoint error, i.e. the bound
+    for linear interpolation between the returned points. func runs at most ~2 * max_points times.
+    """
+    cache = {}
+
+    def f(x: float) -> Optional[float]:
+        if x not in cache:
+            cache[x] = func(x)
+        return cache[x]
+
+    max_points = max(int(max_points), 2)
+    if x_max <= x_min:
+        y = f(x_min)
+        return ([float(x_min)], [float(y)], 0.0) if y is not None else ([], [], 0.0)
+
+    nodes = set(float(x) for x in np.linspace(x_min, x_max, min(max(initial_points, 2), max_points)))
+    heap = []
+
+    def push(a: float, b: float) -> None:
+        m = (a + b) / 2.0
+        fa, fb = f(a), f(b)
+        if fa is None or fb is None:
+            return
+        fm = f(m)
+        if fm is None:
+            return
+        heapq.heappush(heap, (-abs(fm - (fa + fb) / 2.0), a, b, m))
+
+    ordered = sorted(nodes)
+    for a, b in zip(ordered, ordered[1:]):
+        push(a, b)
+
+    while heap and len(nodes) < max_points:
+        neg_error, a, b, m = heap[0]
+        if -neg_error <= tolerance:
+            break
+        heapq.heappop(heap)
+        nodes.add(m)
+        push(a, m)
+        push(m, b)
+
+    max_error = -heap[0][0] if heap else 0.0
+    xs = [x for x in sorted(nodes) if f(x) is not None]
+    return xs, [float(f(x)) for x in xs], float(max_error)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+from fastapi import HTTPException
+from pydantic import ValidationError
+from ..schemas.calculations import OperatingPointRequest, SystemHeadCurveRequest
+
+# Bump whenever a change in app/services or the /calculate endpoints can change saved results:
+# every scenario computed with another version is recalculated on its next read.
+SOLVER_VERSION = "2026.10.2"
+
+SYSTEM_CURVE_STEPS = 30
+
+def build_calculation_requests(data: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Builds the /calculate/operating-point and /calculate/system-curve payloads from a saved
+    scenario (the calculator store state), mirroring what the frontend posts.
+    The operating point payload is None when the scenario has no pump curve.
+    """
+    pump_curve = [{k: v for k, v in p.items() if k != "id"} for p in data.get("pump_curve") or []]
+    base_rpm = data.get("pump_base_rpm")
+    current_rpm = data.get("pump_current_rpm")
+    speed_ratio = (current_rpm / base_rpm) if (base_rpm and current_rpm) else 1.0
+    parallel_pumps = data.get("parallel_pumps") or 1
+
+    system = {
+        "suction_sections": data.get("suction_sections") or [],
+        "discharge_sections_before": data.get("discharge_sections_before") or [],
+        "discharge_parallel_sections": data.get("discharge_parallel_sections") or {},
+        "discharge_sections_after": data.get("discharge_sections_after") or [],
+        "fluid": data.get("fluid"),
+        "static_head_m": data.get("static_head", 10),
+        "pressure_suction_bar_g": data.get("pressure_suction_bar_g", 0.0),
+        "pressure_discharge_bar_g": data.get("pressure_discharge_bar_g", 0.0),
+        "atmospheric_pressure_bar": data.get("atmospheric_pressure_bar", 1.01325),
+    }
+
+    max_flow = max(p.get("flow", 0.0) for p in pump_curve) * speed_ratio * parallel_pumps * 1.2 if pump_curve else 100
+    system_curve = {**system, "flow_min_m3h": 0, "flow_max_m3h": max_flow, "steps": SYSTEM_CURVE_STEPS}
+
+    operating_point = None
+    if pump_curve:
+        # Pump data adds NPSHr and the cavitation margin to every system curve point
+        system_curve.update({"pump_curve_points": pump_curve, "speed_ratio": speed_ratio, "parallel_pumps": parallel_pumps})
+        energy_cost = data.get("energy_cost_per_kwh")
+        operating_point = {
+            **system,
+            "efficiency_motor": data.get("efficiency_motor", 0.90),
+            "hours_per_day": data.get("hours_per_day", 8.0),
+            "days_per_year": data.get("days_per_year", 365.0),
+            "energy_cost_per_kwh": energy_cost if energy_cost is not None else 0.80,
+            "pump_curve_points": pump_curve,
+            "speed_ratio": speed_ratio,
+            "parallel_pumps": parallel_pumps,
+        }
+    return operating_point, system_curve
+
+def hydraulic_input_hash(data: Dict[str, Any]) -> str:
+    """Content hash of everything the solver reads from a scenario (UI state is ignored)."""
+    try:
+        operating_point, system_curve = build_calculation_requests(data)
+        inputs = {"operating_point": operating_point, "system_curve": system_curve}
+    except Exception:
+        # Malformed blob (e.g. a null pump flow): hash it whole, it only has to change when the data does
+        inputs = {"data": data}
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _error_detail(e: Exception) -> str:
+    if isinstance(e, HTTPException):
+        return str(e.detail)
+    if isinstance(e, ValidationError):
+        return "Validation Error: " + " | ".join(f"{'.'.join(str(l) for l in err['loc'])} - {err['msg']}" for err in e.errors())
+    return str(e)
+
+def compute_scenario_results(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the operating point and system curve for a scenario. CPU-bound: call it from a worker thread.
+    Every error, including malformed scenario data, is stored in the result (like the frontend shows
+    them) instead of raised: saving or opening a scenario never fails because results can't be computed.
+    """
+    # The solver pipeline still lives in the /calculate endpoint functions
+    from app.api.v1.calculate import get_operating_point, get_system_curve
+
+    results: Dict[str, Any] = {"operating_point": None, "operating_point_error": None, "system_curve": None, "system_curve_error": None}
+    try:
+        operating_point_payload, system_curve_payload = build_calculation_requests(data)
+    except Exception as e:
+        detail = f"Invalid scenario data: {e}"
+        results.update(operating_point_error=detail, system_curve_error=detail)
+        return results
+
+    if operating_point_payload is not None:
+        try:
+            response = get_operating_point(OperatingPointRequest(**operating_point_payload))
+            results["operating_point"] = json.loads(response.model_dump_json())
+        except Exception as e:
+            results["operating_point_error"] = _error_detail(e)
+
+    try:
+        results["system_curve"] = get_system_curve(SystemHeadCurveRequest(**system_curve_payload))["points"]
+    except Exception as e:
+        results["system_curve_error"] = _error_detail(e)
+    return results
+
+def results_are_current(scenario, input_hash: Optional[str] = None) -> bool:
+    if scenario.results is None or scenario.solver_version != SOLVER_VERSION:
+        return False
+    return input_hash is None or scenario.input_hash == input_hash
+
+def refresh_scenario_results(scenario) -> bool:
+    """
+    Recomputes scenario.results unless they match the current inputs and SOLVER_VERSION.
+    Returns True if the scenario changed (the caller persists it).
+    """
+    input_hash = hydraulic_input_hash(scenario.data or {})
+    if results_are_current(scenario, input_hash):
+        return False
+    scenario.results = compute_scenario_results(scenario.data or {})
+    scenario.input_hash = input_hash
+    scenario.solver_version = SOLVER_VERSION
+    scenario.results_computed_at = datetime.utcnow()
+    return True
@@ -0,0 +1,187 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..schemas.calculations import PipeSection
+from .fluid_mechanics import darcy_weisbach_loss_array
+
+# Monte Carlo operating points: every sampled system carries its own section lengths and roughness,
+# fluid viscosity and pump curve tolerance factors, and all operating points are solved together by
+# a vectorized bracketed root search (one array evaluation of the system per iteration, not one
+# scipy root call per sample).
+
+SectionSamples = Dict[str, np.ndarray]
+
+def sample_factors(n: int, tolerance: float, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Multipliers uniform in [1 - tolerance, 1 + tolerance]; all ones without rng (the nominal system)."""
+    if rng is None or tolerance <= 0:
+        return np.ones(n)
+    return rng.uniform(1.0 - tolerance, 1.0 + tolerance, n)
+
+def sample_sections(
+    sections: List[PipeSection],
+    n: int,
+    length_tolerance: float = 0.0,
+    roughness_factor_range: Tuple[float, float] = (1.0, 1.0),
+    rng: Optional[np.random.Generator] = None
+) -> List[SectionSamples]:
+    """
+    n samples of every section: lengths within +-length_tolerance, roughness multiplied by a factor
+    drawn log-uniformly from roughness_factor_range (pipe aging: new -> used -> corroded).
+    """
+    low, high = roughness_factor_range
+    samples = []
+    for section in sections:
+        if rng is None or high <= low:
+            roughness_factor = np.full(n, low if rng is not None else 1.0)
+        else:
+            roughness_factor = np.exp(rng.uniform(np.log(low), np.log(high), n))
+        samples.append({
+            "diameter_mm": section.diameter_mm,
+            "length_m": section.length_m * sample_factors(n, length_tolerance, rng),
+            "roughness_mm": section.roughness_mm * roughness_factor,
+            "k_total": sum(fitting.k * fitting.quantity for fitting in section.fittings),
+            "equipment_loss_m": section.equipment_loss_m,
+        })
+    return samples
+
+def series_loss_samples(sections: List[SectionSamples], flows, nu, grid: bool = False) -> np.ndarray:
+    """
+    Total loss of sampled sections in series. flows: one per sample (n,), or with grid=True a flow
+    grid (g,) evaluated for every sample, giving (n, g).
+    """
+    flows = np.asarray(flows, dtype=float)
+    per_sample = (lambda values: np.asarray(values)[:, None]) if grid else np.asarray
+    total = 0.0
+    for section in sections:
+        total = total + darcy_weisbach_loss_array(
+            flows,
+            section["diameter_mm"],
+            per_sample(section["length_m"]),
+            per_sample(section["roughness_mm"]),
+            section["k_total"],
+            section["equipment_loss_m"],
+            per_sample(nu)
+        )
+    return np.broadcast_to(total, np.broadcast_shapes(flows.shape, np.shape(per_sample(nu)))).astype(float)
+
+def interp_rows(x: np.ndarray, xp: np.ndarray, fp) -> np.ndarray:
+    """np.interp row by row: x (n,), xp (n, g) increasing along each row, fp (n, g) or a shared (g,)."""
+    n, g = xp.shape
+    fp = np.broadcast_to(fp, xp.shape)
+    rows = np.arange(n)
+    # Vectorized binary search for the bracketing columns: log2(g) gathers instead of n * g comparisons
+    left, right = np.zeros(n, dtype=int), np.full(n, g - 1)
+    while np.any(right - left > 1):
+        middle = (left + right) // 2
+        go_right = xp[rows, middle] <= x
+        left = np.where(go_right, middle, left)
+        right = np.where(go_right, right, middle)
+    x0, x1 = xp[rows, left], xp[rows, right]
+    f0, f1 = fp[rows, left], fp[rows, right]
+    span = x1 - x0
+    t = np.clip(np.divide(x - x0, span, out=np.zeros(n), where=span > 0), 0.0, 1.0)
+    return f0 + t * (f1 - f0)
+
+def solve_operating_points(
+    pump_coeffs: Sequence[float],
+    head_factor: np.ndarray,
+    flow_factor: np.ndarray,
+    static_head_m: float,
+    suction: List[SectionSamples],
+    discharge_before: List[SectionSamples],
+    parallel_branches: List[List[SectionSamples]],
+    discharge_after: List[SectionSamples],
+    nu: np.ndarray,
+    max_curve_flow: float,
+    tolerance_m: float = 1e-6,
+    max_iterations: int = 60,
+    grid_points: int = 33
+) -> Dict[str, np.ndarray]:
+    """
+    Operating point of every sampled system, where the pump curve
+        H(Q) = head_factor * P(Q / flow_factor), P the quadratic with pump_coeffs (np.polyfit order)
+    meets static head + losses. Solved for all samples at once by Illinois false position on a bracket
+    where the residual changes sign. The unknown is the flow, or with parallel branches the head across
+    the parallel block: each branch's flow then comes from a per-sample table of flow vs sqrt(loss)
+    (interpolation in sqrt space is near exact for turbulent losses), so no inner flow split solve is needed.
+    Returns flow, head, suction_loss and parallel_loss arrays; samples without an operating point are NaN.
+    """
+    pump = np.poly1d(pump_coeffs)
+    n = len(head_factor)
+    series = suction + discharge_before + discharge_after
+
+    def pump_head(flows):
+        return head_factor * pump(flows / flow_factor)
+
+    # Flow where each sampled pump head falls below the static head: no operating point beyond it
+    flow_max = np.full(n, max(max_curve_flow, 1.0)) * flow_factor
+    for _ in range(20):
+        above = pump_head(flow_max) > static_head_m
+        if not above.any():
+            break
+        flow_max = np.where(above, flow_max * 2, flow_max)
+
+    if parallel_branches:
+        flow_grid = np.linspace(0.0, float(flow_max.max()), grid_points)
+        sqrt_loss_tables = [np.sqrt(series_loss_samples(branch, flow_grid, nu, grid=True)) for branch in parallel_branches]
+
+        def flows_of(block_head):
+            root = np.sqrt(np.clip(block_head, 0.0, None))
+            return sum(interp_rows(root, table, flow_grid) for table in sqrt_loss_tables)
+
+        def residual(block_head):
+            flows = flows_of(block_head)
+            return pump_head(flows) - static_head_m - series_loss_samples(series, flows, nu) - block_head
+
+        # The block head cannot exceed the highest pump head over the flow range
+        flow_range = flow_max[:, None] * np.linspace(0.0, 1.0, 65)
+        highest_head = (head_factor[:, None] * pump(flow_range / flow_factor[:, None])).max(axis=1)
+        upper = np.clip(highest_head - static_head_m, 0.0, None)
+    else:
+        def flows_of(flows):
+            return flows
+
+        def residual(flows):
+            return pump_head(flows) - static_head_m - series_loss_samples(series, flows, nu)
+
+        upper = flow_max
+
+    lower = np.zeros(n)
+    f_lower, f_upper = residual(lower), residual(upper)
+    solvable = (f_lower > 0) & (f_upper <= 0)
+    x = np.where(solvable, upper, np.nan)
+    side = np.zeros(n)
+    for _ in range(max_iterations):
+        denominator = f_upper - f_lower
+        x = np.where(solvable & (denominator != 0), (lower * f_upper - upper * f_lower) / np.where(denominator != 0, denominator, 1.0), x)
+        f = residual(np.where(solvable, x, 0.0))
+        if np.all(np.abs(f[solvable]) <= tolerance_m):
+            break
+        move_lower = f > 0
+        lower = np.where(move_lower, x, lower)
+        upper = np.where(move_lower, upper, x)
+        # Illinois: halve the residual of an endpoint kept twice in a row, so the bracket keeps shrinking from both sides
+        f_upper = np.where(move_lower, np.where(side > 0, f_upper / 2, f_upper), f)
+        f_lower = np.where(move_lower, f, np.where(side < 0, f_lower / 2, f_lower))
+        side = np.where(move_lower, 1.0, -1.0)
+
+    x = np.where(solvable, x, np.nan)
+    flows = np.where(solvable, flows_of(np.nan_to_num(x)), np.nan)
+    return {
+        "flow": flows,
+        "head": np.where(solvable, pump_head(np.nan_to_num(flows)), np.nan),
+        "suction_loss": np.where(solvable, series_loss_samples(suction, np.nan_to_num(flows), nu), np.nan),
+        "parallel_loss": x if parallel_branches else np.where(solvable, 0.0, np.nan),
+    }
+
+def percentile_band(values: np.ndarray, percentiles: Sequence[float]) -> Optional[Dict[str, object]]:
+    """Mean, standard deviation and percentiles of the finite values (None if there are none)."""
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return None
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "percentiles": {f"p{p:g}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))},
+    }
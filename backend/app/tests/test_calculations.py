@@ -115,3 +115,234 @@ def test_days_per_year_cost_calculation(water_20c):
     expected_cost = res.power_kw * 24.0 * 220.0 * 0.50
     assert res.cost_per_year == pytest.approx(expected_cost, rel=1e-4)
 
+
+def test_scenario_results_hash_and_refresh(water_20c):
+    from types import SimpleNamespace
+    from app.services.scenario_results import hydraulic_input_hash, refresh_scenario_results, SOLVER_VERSION
+
+    data = {
+        "fluid": water_20c.model_dump(),
+        "suction_sections": [],
+        "discharge_sections_before": [{"id": "a", "length_m": 100.0, "diameter_mm": 100.0, "material": "Steel", "roughness_mm": 0.046, "fittings": []}],
+        "discharge_parallel_sections": {},
+        "discharge_sections_after": [],
+        "static_head": 20.0,
+        "pump_curve": [
+            {"id": "p1", "flow": 0, "head": 40, "efficiency": 50},
+            {"id": "p2", "flow": 50, "head": 35, "efficiency": 75},
+            {"id": "p3", "flow": 100, "head": 20, "efficiency": 60}
+        ],
+        "activeView": "calc"
+    }
+
+    # UI state and point ids do not affect the hash; hydraulic inputs do
+    assert hydraulic_input_hash(data) == hydraulic_input_hash({**data, "activeView": "report", "uiTheme": "light"})
+    assert hydraulic_input_hash(data) != hydraulic_input_hash({**data, "static_head": 21.0})
+
+    scenario = SimpleNamespace(data=data, results=None, input_hash=None, solver_version=None, results_computed_at=None)
+    assert refresh_scenario_results(scenario) is True
+    assert scenario.solver_version == SOLVER_VERSION
+    assert scenario.results["operating_point"]["flow_op"] > 0
+    assert len(scenario.results["system_curve"]) == 30
+
+    # Unchanged inputs and solver version: nothing to recompute
+    assert refresh_scenario_results(scenario) is False
+
+
+def test_scenario_results_never_raise_on_malformed_data():
+    from types import SimpleNamespace
+    from app.services.scenario_results import refresh_scenario_results
+
+    malformed = [
+        {"pump_curve": [{"flow": None, "head": 40}, {"flow": 50, "head": 35}, {"flow": 100, "head": 20}]},
+        {"pump_curve": "x"},
+        {"pump_curve": [{"flow": 0, "head": 40}], "pump_base_rpm": "1750", "pump_current_rpm": "1450"},
+        {"fluid": None, "static_head": "high"},
+        {},
+    ]
+    for data in malformed:
+        scenario = SimpleNamespace(data=data, results=None, input_hash=None, solver_version=None, results_computed_at=None)
+        assert refresh_scenario_results(scenario) is True
+        assert scenario.input_hash
+        assert scenario.results["system_curve"] is None
+        assert scenario.results["system_curve_error"]
+
+
+def test_adaptive_sample_refines_near_kinks():
+    from app.services.sampling import adaptive_sample
+
+    # Flat, then a sharp bend at x=60 (like a parallel branch opening)
+    func = lambda x: 10.0 + (0.0 if x < 60 else 0.02 * (x - 60) ** 2)
+    xs, ys, max_error = adaptive_sample(func, 0.0, 100.0, tolerance=0.05, max_points=60)
+
+    assert max_error <= 0.05
+    assert len(xs) < 60
+    assert xs == sorted(xs) and xs[0] == 0.0 and xs[-1] == 100.0
+    # Points cluster where the curve bends, not in the flat part
+    assert sum(1 for x in xs if x >= 60) > sum(1 for x in xs if x < 60)
+
+    # Points the function cannot solve are dropped
+    xs, ys, _ = adaptive_sample(lambda x: None if x > 80 else x, 0.0, 100.0, tolerance=0.05, max_points=20)
+    assert max(xs) <= 80
+
+
+def test_system_curve_cavitation_margin(water_20c):
+    from app.api.v1.calculate import get_system_curve, calculate_npsha
+    from app.schemas.calculations import SystemHeadCurveRequest
+
+    suction = [PipeSection(length_m=10.0, diameter_mm=80.0, material="Steel", roughness_mm=0.046, fittings=[])]
+    req = SystemHeadCurveRequest(
+        suction_sections=suction,
+        discharge_sections_before=[],
+        discharge_sections_after=[],
+        fluid=water_20c,
+        static_head_m=10.0,
+        flow_min_m3h=0.0,
+        flow_max_m3h=100.0,
+        steps=40,
+        pump_curve_points=[
+            {"flow": 0, "head": 40, "npshr": 2.0},
+            {"flow": 50, "head": 35, "npshr": 3.0},
+            {"flow": 100, "head": 20, "npshr": 6.0}
+        ],
+        speed_ratio=0.9
+    )
+
+    points = get_system_curve(req)["points"]
+    assert len(points) == 40
+    for p in points:
+        # Same NPSHa as the scalar path; NPSHr scaled by the affinity laws
+        assert p["npsh_available"] == pytest.approx(calculate_npsha(p["flow"], suction, water_20c, 1.01325, 0.0))
+        assert p["cavitation_margin_m"] == pytest.approx(p["npsh_available"] - p["npsh_required"])
+    assert points[0]["npsh_required"] == pytest.approx(2.0 * 0.81)
+
+    # Without pump data the points only carry head and NPSHa
+    assert set(get_system_curve(req.model_copy(update={"pump_curve_points": None}))["points"][0]) == {"flow", "head", "npsh_available"}
+
+
+def test_fit_quadratic_batch_matches_polyfit():
+    import numpy as np
+    from app.services.curve_fitting import fit_quadratic_batch
+
+    rng = np.random.default_rng(7)
+    curves = []
+    for n in (3, 6, 12, 40):
+        flows = np.sort(rng.uniform(0, 3000, n))
+        heads = 120 - 1e-5 * flows**2 + rng.normal(0, 0.5, n)
+        curves.append([{"flow": float(q), "head": float(h)} for q, h in zip(flows, heads)])
+
+    coeffs, max_head, max_flow = fit_quadratic_batch(curves)
+    for i, points in enumerate(curves):
+        flows = [p["flow"] for p in points]
+        heads = [p["head"] for p in points]
+        assert coeffs[i] == pytest.approx(np.polyfit(flows, heads, 2), rel=1e-6, abs=1e-12)
+        assert max_head[i] == max(heads)
+        assert max_flow[i] == max(flows)
+
+
+def test_search_diameters_matches_brute_force(water_20c):
+    import itertools
+    import numpy as np
+    from app.services.diameter_optimization import section_loss_by_diameter, efficient_candidates, search_diameters
+
+    diameters = np.array([52.5, 62.7, 77.9, 102.3, 128.2, 154.1])
+    sections = [
+        PipeSection(length_m=length, diameter_mm=100.0, material="Steel", roughness_mm=0.045)
+        for length in (15.0, 120.0, 300.0)
+    ]
+    costs, usages = [], []
+    for section in sections:
+        losses, _ = section_loss_by_diameter(section, 60.0, water_20c, diameters)
+        total = 150.0 * (diameters / 100.0) ** 1.4 * section.length_m + 500.0 * losses
+        kept = efficient_candidates(total, losses)
+        assert np.all(np.diff(total[kept]) > 0) and np.all(np.diff(losses[kept]) < 0)
+        costs.append(total[kept])
+        usages.append(losses[kept, None])
+
+    # Unconstrained: separable, every section keeps its cheapest candidate
+    free = search_diameters(costs, [u[:, :0] for u in usages], [])
+    assert free["choice"] == [0, 0, 0]
+
+    # A binding head limit: branch and bound must find the brute-force optimum
+    limit = 0.5 * sum(u[0, 0] for u in usages)
+    result = search_diameters(costs, usages, [limit])
+    feasible = [
+        sum(c[j] for c, j in zip(costs, combo))
+        for combo in itertools.product(*[range(len(c)) for c in costs])
+        if sum(u[j, 0] for u, j in zip(usages, combo)) <= limit
+    ]
+    assert result["cost"] == pytest.approx(min(feasible))
+    assert sum(u[j, 0] for u, j in zip(usages, result["choice"])) <= limit
+
+    with pytest.raises(ValueError):
+        search_diameters(costs, usages, [0.0])
+
+
+def test_batched_operating_points_match_scalar_solver(water_20c):
+    import numpy as np
+    from app.services.uncertainty import sample_factors, sample_sections, solve_operating_points
+
+    def section(length, diameter, k=0.0):
+        return PipeSection(length_m=length, diameter_mm=diameter, material="Steel", roughness_mm=0.045,
+                           fittings=[PipeFitting(name="K", k=k)] if k else [])
+
+    suction, before, after = [section(6, 102.3, 0.7)], [section(50, 77.9, 1.2)], [section(200, 77.9, 1.0)]
+    branches = {"a": [section(40, 52.5, 2.0)], "b": [section(60, 62.7, 3.0)]}
+    coeffs = np.polyfit([0, 30, 60, 90], [60, 55, 44, 25], 2)
+
+    nominal_flows = []
+    for parallel in ({}, branches):
+        flow, head, _ = find_operating_point(suction, before, parallel, after, 15.0, water_20c, np.poly1d(coeffs))
+        ones = np.ones(1)
+        nominal = solve_operating_points(
+            coeffs, ones, ones, 15.0, sample_sections(suction, 1), sample_sections(before, 1),
+            [sample_sections(b, 1) for b in parallel.values()], sample_sections(after, 1), np.full(1, water_20c.nu), 90
+        )
+        assert nominal["flow"][0] == pytest.approx(flow, rel=1e-4)
+        assert nominal["head"][0] == pytest.approx(head, rel=1e-4)
+        nominal_flows.append(nominal["flow"][0])
+
+    # Aged pipes lose more head: every sampled operating point moves to a lower flow
+    rng = np.random.default_rng(0)
+    n = 2000
+    aged = solve_operating_points(
+        coeffs, np.ones(n), np.ones(n), 15.0, sample_sections(suction, n, 0.0, (2.0, 4.0), rng),
+        sample_sections(before, n, 0.0, (2.0, 4.0), rng), [], sample_sections(after, n, 0.0, (2.0, 4.0), rng),
+        water_20c.nu * sample_factors(n, 0.1, rng), 90
+    )
+    assert np.all(np.isfinite(aged["flow"]))
+    assert np.all(aged["flow"] < nominal_flows[0])
+
+
+def test_failed_stripe_event_does_not_stall_the_worker(monkeypatch):
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import SQLModel, Session, create_engine
+    from app.core import stripe_events
+    from app.models import StripeEvent, StripeEventKey
+
+    test_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(test_engine, tables=[StripeEvent.__table__, StripeEventKey.__table__])
+    monkeypatch.setattr(stripe_events, "engine", test_engine)
+
+    def payload(customer):
+        return {"data": {"object": {"customer": customer}}}
+
+    with Session(test_engine) as db:
+        events = [
+            StripeEvent(event_id="evt_a1", type="x", payload=payload("cus_a"), stripe_created=1, status="failed"),
+            StripeEvent(event_id="evt_a2", type="x", payload=payload("cus_a"), stripe_created=2),
+            StripeEvent(event_id="evt_b1", type="x", payload=payload("cus_b"), stripe_created=3),
+            StripeEvent(event_id="evt_b2", type="x", payload=payload("cus_b"), stripe_created=4),
+        ]
+        db.add_all(events)
+        db.flush()
+        for event in events:
+            db.add_all(StripeEventKey(**row) for row in stripe_events.event_key_rows(event.id, event.payload))
+        db.commit()
+        ids = {event.event_id: event.id for event in events}
+
+    # The failed event no longer holds its customer, and other customers are never blocked by it
+    assert stripe_events._claim_next_event() == ids["evt_a2"]
+    assert stripe_events._claim_next_event() == ids["evt_b1"]
+    # evt_b2 waits for evt_b1, which is still being processed
+    assert stripe_events._claim_next_event() is None
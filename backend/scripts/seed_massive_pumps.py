@@ -1,12 +1,14 @@
 import os
 import sys
+import json
 import numpy as np
-from sqlmodel import Session, select
+from sqlmodel import Session, select, delete
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.core.db import engine
 from app.models import User, Pump
+from app.core.pump_import import import_catalog
 
 def generate_pump_curve(bep_flow, bep_head):
     """
@@ -72,12 +74,11 @@ def seed_massive_pumps():
             return
 
         # Clear existing global pumps to avoid duplicates on re-runs
-        existing = session.exec(select(Pump).where(Pump.is_global == True)).all()
-        for p in existing:
-            session.delete(p)
+        session.exec(delete(Pump).where(Pump.is_global == True))
         session.commit()
+        user_id = user.id
 
-        count = 0
+    def catalog():
         for manufacturer, base_model in brands:
             # Generate 40 models per brand
             for i in range(40):
@@ -88,32 +89,15 @@ def seed_massive_pumps():
                     bep_flow = 250 + ((i - 20) * 150) # 250 to 3100
                     bep_head = 20 + ((i % 5) * 40) # 20 to 180
                 
-                model_name = f"{base_model} {int(bep_flow)}-{int(bep_head)}"
-                curve_points = generate_pump_curve(bep_flow, bep_head)
-                
-                pump = Pump(
-                    manufacturer=manufacturer,
-                    model=model_name,
-                    curve_points=curve_points,
-                    is_global=True,
-                    user_id=user.id
-                )
-                
-                # Pre-calculate
-                flows = [p.get('flow', 0) for p in curve_points]
-                heads = [p.get('head', 0) for p in curve_points]
-                coeffs = np.polyfit(flows, heads, 2)
-                pump.coeff_a = float(coeffs[0])
-                pump.coeff_b = float(coeffs[1])
-                pump.coeff_c = float(coeffs[2])
-                pump.max_head_m = float(max(heads))
-                pump.max_flow_m3h = float(max(flows))
+                yield json.dumps({
+                    "manufacturer": manufacturer,
+                    "model": f"{base_model} {int(bep_flow)}-{int(bep_head)}",
+                    "curve_points": generate_pump_curve(bep_flow, bep_head)
+                })
 
-                session.add(pump)
-                count += 1
-
-        session.commit()
-        print(f"Successfully seeded {count} global pumps!")
+    # Same path as POST /pumps/import: batched curve fits and bulk inserts
+    report = import_catalog(catalog(), "ndjson", user_id, is_global=True)
+    print(f"Successfully seeded {report['imported']} global pumps! ({report['failed']} failed)")
 
 if __name__ == "__main__":
     seed_massive_pumps()
@@ -34,6 +34,7 @@ export const api = {
         get: (id: number) => apiClient.get(`/projects/${id}`),
         delete: (id: number) => apiClient.delete(`/projects/${id}`),
         // Scenarios
+        getScenario: (scenarioId: number) => apiClient.get(`/projects/scenarios/${scenarioId}`),
         addScenario: (projectId: number, data: any) => apiClient.post(`/projects/${projectId}/scenarios`, data),
         deleteScenario: (scenarioId: number) => apiClient.delete(`/projects/scenarios/${scenarioId}`),
     },
@@ -45,6 +46,8 @@ export const api = {
     },
     pumps: {
         list: () => apiClient.get('/pumps/'),
+        // Indexed catalog search: { q, manufacturer, flow_m3h, head_m, cursor, limit } -> { items, next_cursor }
+        search: (params: Record<string, any>) => apiClient.get('/pumps/search', { params }),
         get: (id: number | string) => apiClient.get(`/pumps/${id}`),
         create: (data: any) => apiClient.post('/pumps/', data),
         delete: (id: number) => apiClient.delete(`/pumps/${id}`),
@@ -52,7 +55,34 @@ export const api = {
     },
     calculate: {
         operatingPoint: (data: any) => apiClient.post('/calculate/operating-point', data),
+        operatingPointUncertainty: (data: any) => apiClient.post('/calculate/operating-point/uncertainty', data),
         systemCurve: (data: any) => apiClient.post('/calculate/system-curve', data),
+        optimizeDiameters: (data: any) => apiClient.post('/calculate/optimize-diameters', data),
+        // Streams NDJSON points as the backend solves them; onPoints receives each parsed batch
+        streamSystemCurve: async (data: any, onPoints: (points: any[]) => void, signal?: AbortSignal) => {
+            const response = await fetch(`${API_BASE_URL}/calculate/system-curve/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(data),
+                signal
+            });
+            if (!response.ok || !response.body) {
+                throw new Error(`System curve stream failed: ${response.status}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop() ?? '';
+                const points = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+                if (points.length) onPoints(points);
+            }
+            if (buffer.trim()) onPoints([JSON.parse(buffer)]);
+        },
     },
     payments: {
         createCheckoutSession: (plan: string, interval: string = 'year') => apiClient.post(`/payments/create-checkout-session?plan=${plan}&interval=${interval}`),
@@ -2,9 +2,16 @@ import React, { useEffect, useState } from 'react';
 import { apiClient } from '../../api/client';
 import { Database, Droplet, Loader2 } from 'lucide-react';
 
+// Rows per request; the backend pages pumps and fluids independently with keyset cursors
+const PAGE_SIZE = 500;
+
+type ResourceKind = 'pumps' | 'fluids';
+
 export const AdminResources: React.FC = () => {
     const [resources, setResources] = useState<{ pumps: any[], fluids: any[] }>({ pumps: [], fluids: [] });
+    const [cursors, setCursors] = useState<{ pumps: number | null, fluids: number | null }>({ pumps: null, fluids: null });
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState<ResourceKind | null>(null);
 
     useEffect(() => {
         fetchResources();
@@ -12,8 +19,9 @@ export const AdminResources: React.FC = () => {
 
     const fetchResources = async () => {
         try {
-            const response = await apiClient.get('/admin/resources');
-            setResources(response.data);
+            const response = await apiClient.get('/admin/resources', { params: { limit: PAGE_SIZE } });
+            setResources({ pumps: response.data.pumps, fluids: response.data.fluids });
+            setCursors({ pumps: response.data.next_pump_cursor, fluids: response.data.next_fluid_cursor });
         } catch (error) {
             console.error(error);
         } finally {
@@ -21,6 +29,32 @@ export const AdminResources: React.FC = () => {
         }
     };
 
+    const fetchMore = async (kind: ResourceKind) => {
+        const cursor = cursors[kind];
+        if (cursor === null) return;
+        setLoadingMore(kind);
+        try {
+            const params = kind === 'pumps'
+                ? { kind, limit: PAGE_SIZE, pump_cursor: cursor }
+                : { kind, limit: PAGE_SIZE, fluid_cursor: cursor };
+            const response = await apiClient.get('/admin/resources', { params });
+            setResources(prev => ({ ...prev, [kind]: [...prev[kind], ...response.data[kind]] }));
+            setCursors(prev => ({ ...prev, [kind]: kind === 'pumps' ? response.data.next_pump_cursor : response.data.next_fluid_cursor }));
+        } catch (error) {
+            console.error(error);
+        } finally {
+            setLoadingMore(null);
+        }
+    };
+
+    const loadMoreButton = (kind: ResourceKind) => cursors[kind] !== null && (
+        <div className="px-4 py-3 border-t border-[var(--color-divider)] text-center">
+            <button className="btn btn-secondary" onClick={() => fetchMore(kind)} disabled={loadingMore === kind}>
+                {loadingMore === kind ? <Loader2 className="animate-spin h-4 w-4" /> : 'Load more'}
+            </button>
+        </div>
+    );
+
     if (loading) {
         return <div className="flex items-center justify-center h-64"><Loader2 className="animate-spin h-8 w-8 text-blue-500" /></div>;
     }
@@ -38,7 +72,7 @@ export const AdminResources: React.FC = () => {
                             Global Pump Library
                         </h3>
                         <span className="tag tag-accent">
-                            {resources.pumps.length} Curves
+                            {resources.pumps.length}{cursors.pumps !== null ? '+' : ''} Curves
                         </span>
                     </div>
                     <div className="overflow-x-auto max-h-[500px]">
@@ -68,6 +102,7 @@ export const AdminResources: React.FC = () => {
                             </tbody>
                         </table>
                     </div>
+                    {loadMoreButton('pumps')}
                 </div>
 
                 {/* Fluids Table */}
@@ -78,7 +113,7 @@ export const AdminResources: React.FC = () => {
                             Custom Fluids Library
                         </h3>
                         <span className="tag tag-accent-2">
-                            {resources.fluids.length} Fluids
+                            {resources.fluids.length}{cursors.fluids !== null ? '+' : ''} Fluids
                         </span>
                     </div>
                     <div className="overflow-x-auto max-h-[500px]">
@@ -107,6 +142,7 @@ export const AdminResources: React.FC = () => {
                             </tbody>
                         </table>
                     </div>
+                    {loadMoreButton('fluids')}
                 </div>
 
             </div>
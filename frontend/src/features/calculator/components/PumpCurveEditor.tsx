@@ -30,6 +30,7 @@ export const PumpCurveEditor: React.FC = () => {
     const [savedPumps, setSavedPumps] = useState<any[]>([]);
     const [selectedPumpId, setSelectedPumpId] = useState("");
     const [isLoadingPumps, setIsLoadingPumps] = useState(true);
+    const [pumpQuery, setPumpQuery] = useState("");
 
     // AI Select State
     const pSuction = useSystemStore(state => state.pressure_suction_bar_g);
@@ -44,15 +45,17 @@ export const PumpCurveEditor: React.FC = () => {
     const [isAutoSelecting, setIsAutoSelecting] = useState(false);
     const [aiResults, setAiResults] = useState<any[]>([]);
 
+    // Server-side search: the picker only fetches the first page of matches
     useEffect(() => {
-        loadPumps();
-    }, []);
+        const timer = setTimeout(loadPumps, 300);
+        return () => clearTimeout(timer);
+    }, [pumpQuery]);
 
     const loadPumps = async () => {
         setIsLoadingPumps(true);
         try {
-            const res = await api.pumps.list();
-            setSavedPumps(res.data);
+            const res = await api.pumps.search({ q: pumpQuery || undefined, limit: 20 });
+            setSavedPumps(res.data.items);
         } catch (error) {
             console.error("Failed to load pumps", error);
         } finally {
@@ -178,6 +181,14 @@ export const PumpCurveEditor: React.FC = () => {
             <div className="flex flex-col gap-4 border-b border-[var(--color-divider)] pb-4">
                 {/* Library Controls */}
                 <div className="flex flex-col sm:flex-row gap-2.5 items-stretch sm:items-end">
+                    <div className="sm:w-48">
+                        <Input
+                            label="Buscar Bomba"
+                            placeholder="Fabricante ou modelo"
+                            value={pumpQuery}
+                            onChange={(e) => setPumpQuery(e.target.value)}
+                        />
+                    </div>
                     <div className="flex-1">
                         <Select
                             label="Carregar Curva da Biblioteca Catálogo"
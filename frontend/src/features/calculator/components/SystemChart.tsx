@@ -11,7 +11,7 @@ import {
     ReferenceLine
 } from 'recharts';
 import { OperatingPointResult, PumpCurvePoint } from '@/types/engineering';
-import axios from 'axios';
+import { api } from '../../../api/client';
 import { useSystemStore } from '../stores/useSystemStore';
 
 interface SystemChartProps {
@@ -37,6 +37,7 @@ export const SystemChart: React.FC<SystemChartProps> = ({ pumpCurve, operatingPo
 
     // Fetch System Curve when inputs change
     useEffect(() => {
+        const controller = new AbortController();
         const fetchSystemCurve = async () => {
             try {
                 // Determine max flow based on pump curve or default
@@ -44,8 +45,9 @@ export const SystemChart: React.FC<SystemChartProps> = ({ pumpCurve, operatingPo
                     ? Math.max(...pumpCurve.map(p => p.flow)) * 1.2
                     : 100;
 
-                const API_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000/api/v1';
-                const response = await axios.post(`${API_URL}/calculate/system-curve`, {
+                // Streamed: the curve is drawn progressively as each point is solved
+                setSystemCurvePoints([]);
+                await api.calculate.streamSystemCurve({
                     suction_sections: suction,
                     discharge_sections_before: dischargeBefore,
                     discharge_parallel_sections: dischargeParallel,
@@ -61,16 +63,19 @@ export const SystemChart: React.FC<SystemChartProps> = ({ pumpCurve, operatingPo
                     flow_min_m3h: 0,
                     flow_max_m3h: maxFlow,
                     steps: 30
-                });
-                setSystemCurvePoints(response.data.points);
-            } catch (error) {
+                }, (points) => setSystemCurvePoints(prev => [...prev, ...points]), controller.signal);
+            } catch (error: any) {
+                if (error?.name === 'AbortError') return;
                 console.error("Failed to fetch system curve", error);
             }
         };
 
         // Debounce or just run? For now run.
         const timer = setTimeout(fetchSystemCurve, 500);
-        return () => clearTimeout(timer);
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
     }, [suction, dischargeBefore, dischargeParallel, dischargeAfter, fluid, staticHead, pumpCurve, pSuction, pDischarge, pAtm]);
 
     const chartData = useMemo(() => {
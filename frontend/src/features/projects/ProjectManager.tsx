@@ -14,7 +14,8 @@ interface Scenario {
     id: number;
     name: string;
     project_id: number;
-    data: any;
+    data?: any;
+    results?: any;
 }
 
 export const ProjectManager = () => {
@@ -103,11 +104,29 @@ export const ProjectManager = () => {
         }
     };
 
-    const handleLoadScenario = (scenario: Scenario) => {
-        if (scenario.data && Object.keys(scenario.data).length > 0) {
-            loadState(scenario.data);
+    const handleLoadScenario = async (scenario: Scenario) => {
+        // Listings only carry scenario metadata; fetch the full payload on demand
+        let data = scenario.data;
+        let results = scenario.results;
+        if (!data) {
+            try {
+                const res = await api.projects.getScenario(scenario.id);
+                data = res.data.data;
+                results = res.data.results;
+            } catch (error) {
+                console.error("Failed to load scenario", error);
+                return;
+            }
+        }
+        if (data && Object.keys(data).length > 0) {
+            loadState(data);
             setTimeout(() => {
-                calculateOperatingPoint();
+                // Results saved with the scenario are current for its inputs: skip the recalculation
+                if (results?.operating_point) {
+                    useSystemStore.setState({ operatingPoint: results.operating_point, calculationError: null });
+                } else {
+                    calculateOperatingPoint();
+                }
                 setActiveView('calc');
             }, 100);
             addToast(`Cenário carregado: ${scenario.name}`, 'info');